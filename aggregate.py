@@ -0,0 +1,232 @@
+import sys
+import time
+import asyncio
+import logging
+import argparse
+import numpy as np
+import grpc
+
+from common import image_pb2
+from common import generic_pb2
+from aio_client import AsyncDBClient
+import channels
+from delta_codec import DeltaDecoder
+from export import fetch_chunk, parse_time, stored_range
+
+# command line names of the Aggregate reducers
+REDUCERS = {
+    'min': generic_pb2.MIN,
+    'max': generic_pb2.MAX,
+    'mean': generic_pb2.MEAN,
+}
+REDUCER_NAMES = {reducer: name for name, reducer in REDUCERS.items()}
+
+
+# Reduces serialized ImageData rows into the per-bucket series of an Aggregate
+# response. local_server answers Aggregate with it, and aggregate() runs it on
+# the client for servers without the call. Every frame is first reduced to the
+# min, max and mean of its pixels (or of roi, (x, y, width, height)), then each
+# bucket takes the min of the mins, the max of the maxes and the mean of the
+# means. Edge filter heartbeats count with the statistics they carry unless
+# there is a roi. Rows go to add() in identifier order, so keyframe/delta
+# streams can be rebuilt.
+class Aggregator:
+    def __init__(self, bucket_seconds=60.0, start=0.0, end=0.0, reducers=(), sensor_id='', roi=None):
+        if not bucket_seconds > 0:
+            raise ValueError('bucket_seconds must be greater than 0')
+        self.reducers = list(reducers) or list(REDUCERS.values())
+        unknown = [reducer for reducer in self.reducers if reducer not in REDUCER_NAMES]
+        if unknown:
+            raise ValueError(f'unknown reducers {unknown}')
+        self.bucket_seconds = bucket_seconds
+        self.start = start
+        self.end = end
+        self.sensor_id = sensor_id
+        self.roi = roi
+        if roi is None:
+            self._region = np.s_[:, :]
+        else:
+            x, y, width, height = roi
+            self._region = np.s_[y:y + height, x:x + width]
+        self.frames = 0
+        self._decoder = DeltaDecoder()
+        self._buckets = []  # bucket number of every frame
+        self._stats = []  # (min, max, mean) of every frame
+
+    @classmethod
+    def for_request(cls, request):
+        roi = None
+        if request.roi_width and request.roi_height:
+            roi = (request.roi_x, request.roi_y, request.roi_width, request.roi_height)
+        return cls(request.bucket_seconds, request.range_start, request.range_end, request.reducers,
+                   request.sensor_id, roi)
+
+    def add(self, serialized_image):
+        image_data = image_pb2.ImageData.FromString(serialized_image)
+        identifier = image_data.identifier
+        if identifier < self.start or (self.end and identifier >= self.end):
+            return
+        if self.sensor_id and image_data.sensor_id != self.sensor_id:
+            return
+
+        if image_data.encoding == image_pb2.STATS_ONLY:
+            if self.roi is None and image_data.HasField('stats'):
+                stats = image_data.stats
+                self._add(identifier, stats.min, stats.max, stats.mean)
+            return
+
+        frame = self._decoder.decode(image_data)
+        if frame is None:
+            return  # a delta waiting for its keyframe
+        region = frame[self._region]
+        if not region.size:
+            raise ValueError(f'roi {self.roi} is outside the {frame.shape[1]}x{frame.shape[0]} frame')
+        self._add(identifier, region.min(), region.max(), region.mean())
+
+    def _add(self, identifier, low, high, mean):
+        self.frames += 1
+        self._buckets.append(int(identifier // self.bucket_seconds))
+        self._stats.append((low, high, mean))
+
+    def response(self):
+        response = generic_pb2.protobuf_aggregate_response(status=generic_pb2.SELECTED)
+        buckets = np.array(self._buckets, dtype=np.int64)
+        stats = np.array(self._stats, dtype=np.float64).reshape(-1, 3)
+        order = np.argsort(buckets, kind='stable')
+        buckets, stats = buckets[order], stats[order]
+
+        # every bucket is a run of frames, firsts are where the runs start
+        firsts = np.flatnonzero(np.diff(buckets, prepend=buckets[:1] - 1))
+        counts = np.diff(np.append(firsts, len(buckets)))
+        response.bucket_starts.extend((buckets[firsts] * self.bucket_seconds).tolist())
+        response.frame_counts.extend(counts.tolist())
+        for reducer in self.reducers:
+            if not len(firsts):
+                values = firsts
+            elif reducer == generic_pb2.MIN:
+                values = np.minimum.reduceat(stats[:, 0], firsts)
+            elif reducer == generic_pb2.MAX:
+                values = np.maximum.reduceat(stats[:, 1], firsts)
+            else:
+                values = np.add.reduceat(stats[:, 2], firsts) / counts
+            response.series.add(reducer=reducer, values=values.tolist())
+        return response
+
+
+# A response as a structured array with a start, frames and a column per reducer
+def timeline(response):
+    dtype = [('start', '<f8'), ('frames', '<u4')]
+    dtype += [(REDUCER_NAMES[series.reducer], '<f4') for series in response.series]
+    result = np.zeros(len(response.bucket_starts), dtype=dtype)
+    result['start'] = response.bucket_starts
+    result['frames'] = response.frame_counts
+    for series in response.series:
+        result[REDUCER_NAMES[series.reducer]] = series.values
+    return result
+
+
+# Selects every frame with start <= identifier < end a page at a time and
+# reduces them here, what servers without Aggregate leave us with.
+# Returns (response, bytes selected).
+async def aggregate_on_client(client, start, end, bucket_seconds, reducers, sensor_id, roi, keyspace, table,
+                              page_bytes):
+    aggregator = Aggregator(bucket_seconds, start, end, reducers, sensor_id, roi)
+    pages = asyncio.Queue()
+    counters = {'pages': 0, 'bytes': 0}
+    fetch = asyncio.create_task(fetch_chunk(client, keyspace, table, start, end, page_bytes, pages, counters))
+    try:
+        while (rows := await pages.get()) is not None:
+            for serialized_image in rows:
+                aggregator.add(serialized_image)
+        await fetch  # raise errors from the fetch
+    finally:
+        fetch.cancel()
+    return aggregator.response(), counters['bytes']
+
+
+# min, max and/or mean temperature of every bucket_seconds long bucket of
+# frames with start <= identifier < end (end 0 for no upper bound), as a
+# timeline() array. Only buckets with frames are returned. roi (x, y, width,
+# height) limits it to a region of the frame and sensor to one camera. The
+# server reduces the frames with Aggregate, servers without it (or
+# on_client=True) have every frame selected and reduced here.
+async def aggregate(client, start, end=0.0, bucket_seconds=60.0, reducers=tuple(REDUCERS), sensor=None, roi=None,
+                    keyspace='imagekeyspace', table='imagedata', on_client=False, page_bytes=1 << 20):
+    reducers = [REDUCERS[name] for name in reducers]
+    sensor_id = sensor or ''
+    began = time.monotonic()
+    response = None
+    if not on_client:
+        try:
+            response = await client.aggregate(keyspace, table, start, end, bucket_seconds, reducers,
+                                              sensor_id=sensor_id, roi=roi)
+            received = response.ByteSize()
+        except grpc.RpcError as e:
+            if e.code() != grpc.StatusCode.UNIMPLEMENTED:
+                raise
+            logging.warning('Server does not support Aggregate, selecting every frame instead')
+    if response is None:
+        response, received = await aggregate_on_client(client, start, end, bucket_seconds, reducers, sensor_id,
+                                                       roi, keyspace, table, page_bytes)
+    if response.status == generic_pb2.FAILED:
+        raise ValueError(f'Aggregate failed: {response.errs}')
+
+    logging.info(f'Aggregated {sum(response.frame_counts)} frames into {len(response.bucket_starts)} buckets '
+                 f'from {received / 1e3:.1f} kB in {time.monotonic() - began:.2f}s')
+    return timeline(response)
+
+
+# x,y,width,height
+def parse_roi(value):
+    roi = tuple(int(n) for n in value.split(','))
+    if len(roi) != 4:
+        raise argparse.ArgumentTypeError(f'{value} is not x,y,width,height')
+    return roi
+
+
+async def run(output, server_address='localhost', server_port=50051, start=None, end=None, bucket_seconds=60.0,
+              reducers=tuple(REDUCERS), sensor=None, roi=None, timeout=60.0, on_client=False, channel_factory=None):
+    async with AsyncDBClient(server_address, server_port, timeout=timeout, channels=channel_factory) as client:
+        if start is None:
+            start, _ = await stored_range(client)
+            start = start or 0.0
+        result = await aggregate(client, start, end or 0.0, bucket_seconds, reducers, sensor=sensor, roi=roi,
+                                 on_client=on_client)
+
+    fmt = ['%.3f', '%d'] + ['%.2f'] * (len(result.dtype.names) - 2)
+    np.savetxt(output, result, fmt=fmt, delimiter=',', header=','.join(result.dtype.names), comments='')
+    return result
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+
+    parser = argparse.ArgumentParser(description='Per-bucket min, max and mean temperatures of stored frames as CSV')
+    parser.add_argument('--output', default='-', help='CSV file to write, - for stdout')
+    parser.add_argument('--address', default='localhost', help='Address of the gRPC server')
+    parser.add_argument('--port', type=int, default=50051, help='Port number for the gRPC server')
+    parser.add_argument('--start', type=parse_time, help='First capture time, defaults to the oldest frame')
+    parser.add_argument('--end', type=parse_time, help='Frames captured before this, defaults to all of them')
+    parser.add_argument('--last', type=float, help='The last this many seconds instead of --start/--end')
+    parser.add_argument('--bucket', type=float, default=60.0, help='Seconds of frames in each bucket')
+    parser.add_argument('--reducers', nargs='+', choices=list(REDUCERS), default=list(REDUCERS))
+    parser.add_argument('--roi', type=parse_roi, help='Only reduce the pixels of x,y,width,height')
+    parser.add_argument('--sensor', help='Only frames from this sensor id')
+    parser.add_argument('--timeout', type=float, default=60.0, help='Deadline in seconds for each call')
+    parser.add_argument('--on-client', action='store_true',
+                        help='Select every frame and reduce them here instead of calling Aggregate')
+    channels.add_arguments(parser)
+
+    args = parser.parse_args()
+    start, end = args.start, args.end
+    if args.last is not None:
+        end = time.time()
+        start = end - args.last
+
+    try:
+        asyncio.run(run(sys.stdout if args.output == '-' else args.output, server_address=args.address,
+                        server_port=args.port, start=start, end=end, bucket_seconds=args.bucket,
+                        reducers=args.reducers, sensor=args.sensor, roi=args.roi, timeout=args.timeout,
+                        on_client=args.on_client, channel_factory=channels.from_arguments(args)))
+    except grpc.RpcError as e:
+        print(f'Error communicating with gRPC server: {e.code()} {e.details()}')
@@ -0,0 +1,155 @@
+import time
+import random
+import asyncio
+import logging
+import grpc
+
+from common import generic_pb2
+from channels import ChannelFactory, stub_cycle
+from db_stub import DBStub, METHODS
+
+# Status codes worth retrying, the server or the link is down for a moment
+RETRY_CODES = (grpc.StatusCode.UNAVAILABLE,)
+
+
+# asyncio wrapper around db_stub.DBStub on grpc.aio channels. Up to
+# max_in_flight calls run at once, every unary call gets a deadline of timeout
+# seconds and is retried with exponential backoff while the server is UNAVAILABLE.
+# With a metrics.Metrics, the latency of every successful call is observed
+# under the RPC's name. The channels are made by channels, a
+# channels.ChannelFactory (keepalive, compression, message sizes, connections).
+# The rpcs and their compression are bound once per channel, not per call.
+#
+#   async with AsyncDBClient('localhost', 50051) as client:
+#       await client.insert('imageKeyspace', [any_message])
+class AsyncDBClient:
+    def __init__(self, server_address='localhost', server_port=50051, max_in_flight=4, timeout=10.0,
+                 retries=5, backoff=0.5, max_backoff=8.0, metrics=None, channels=None):
+        if max_in_flight < 1:
+            raise ValueError('max_in_flight must be at least 1')
+        self.target = f'{server_address}:{server_port}'
+        self.max_in_flight = max_in_flight
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.metrics = metrics
+        self.channels = channels or ChannelFactory()
+        self._channels = []
+        self._stubs = None
+        self._compression = {}
+        self._slots = None
+
+    async def __aenter__(self):
+        self._channels = self.channels.open(self.target)
+        self._stubs = stub_cycle(DBStub, self._channels)
+        self._compression = {name: self.channels.call_compression(name) for name in METHODS}
+        self._slots = asyncio.Semaphore(self.max_in_flight)
+        return self
+
+    async def __aexit__(self, *exc_info):
+        for channel in self._channels:
+            await channel.close()
+
+    # Seconds to wait before retry number attempt (0 based), with jitter so
+    # several clients don't reconnect in lockstep
+    def retry_delay(self, attempt):
+        delay = min(self.backoff * 2 ** attempt, self.max_backoff)
+        return delay * random.uniform(0.5, 1.0)
+
+    # Calls the RPC name, on the next channel for every attempt. An encoded
+    # request is already serialized and goes out as it is.
+    async def _call(self, name, request, encoded=False):
+        compression = self._compression[name]
+        attempt = 0
+        while True:
+            async with self._slots:
+                stub = next(self._stubs)
+                method = stub.encoded[name] if encoded else getattr(stub, name)
+                start = time.perf_counter()
+                try:
+                    response = await method(request, timeout=self.timeout, compression=compression)
+                except grpc.aio.AioRpcError as e:
+                    if self.metrics is not None:
+                        self.metrics.count(f'{name}_errors')
+                    if e.code() not in RETRY_CODES or attempt >= self.retries:
+                        raise
+                    error = e
+                else:
+                    if self.metrics is not None:
+                        self.metrics.since(name, start)
+                    return response
+
+            # wait outside the slot so other calls can go ahead
+            delay = self.retry_delay(attempt)
+            logging.warning(f'{error.code().name} from {self.target}, retrying in {delay:.1f}s')
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def insert(self, keyspace, protobufs):
+        request = generic_pb2.protobuf_insert_request(keyspace=keyspace, protobufs=protobufs)
+        return await self._call('Insert', request)
+
+    # Sends a db_stub.InsertRequest, the upload path that skips building Any messages
+    async def insert_encoded(self, request):
+        return await self._call('Insert', request.serialize(), encoded=True)
+
+    async def select(self, keyspace, table, column='', constraint=''):
+        request = generic_pb2.protobuf_select_request(
+            keyspace=keyspace,
+            table=table,
+            column=column,
+            constraint=constraint
+        )
+        return await self._call('Select', request)
+
+    # One page of rows with start <= identifier < end (end 0 for no upper
+    # bound) in identifier order, at most limit rows or about max_bytes of them.
+    # response.has_more is set when the range has rows past this page.
+    async def select_range(self, keyspace, table, start, end=0.0, limit=0, max_bytes=0):
+        request = generic_pb2.protobuf_select_request(
+            keyspace=keyspace,
+            table=table,
+            column='identifier',
+            range_start=start,
+            range_end=end,
+            limit=limit,
+            max_bytes=max_bytes
+        )
+        return await self._call('Select', request)
+
+    # min, max and/or mean series over buckets of bucket_seconds of the frames
+    # with start <= identifier < end (end 0 for no upper bound), reduced on the
+    # server. roi is (x, y, width, height) or None for whole frames.
+    async def aggregate(self, keyspace, table, start, end=0.0, bucket_seconds=60.0, reducers=(), sensor_id='',
+                        roi=None):
+        roi_x, roi_y, roi_width, roi_height = roi or (0, 0, 0, 0)
+        request = generic_pb2.protobuf_aggregate_request(
+            keyspace=keyspace,
+            table=table,
+            range_start=start,
+            range_end=end,
+            bucket_seconds=bucket_seconds,
+            reducers=reducers,
+            sensor_id=sensor_id,
+            roi_x=roi_x,
+            roi_y=roi_y,
+            roi_width=roi_width,
+            roi_height=roi_height
+        )
+        return await self._call('Aggregate', request)
+
+    async def drop_table(self, keyspace, table):
+        request = generic_pb2.protobuf_droptable_request(keyspace=keyspace, table=table)
+        return await self._call('DropTable', request)
+
+    # Streams protobuf_select_responses as the server pushes them. Streams have
+    # no deadline and are not retried here, resubscribe with the last
+    # identifier seen to pick up where a broken stream left off.
+    def subscribe(self, keyspace, table, since_identifier=0.0):
+        request = generic_pb2.protobuf_subscribe_request(
+            keyspace=keyspace,
+            table=table,
+            since_identifier=since_identifier
+        )
+        return next(self._stubs).Subscribe(request, compression=self._compression['Subscribe'])
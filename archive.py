@@ -0,0 +1,376 @@
+import os
+import zlib
+import json
+import struct
+import numpy as np
+
+import frame_codec
+
+try:
+    import zstandard
+except ImportError:  # optional, zlib is always available
+    zstandard = None
+
+# Archives are a data file of chunks and a sidecar index, by default
+# frames.mlxa and frames.mlxa.idx
+ARCHIVE_SUFFIX = '.mlxa'
+INDEX_SUFFIX = '.idx'
+
+# Pixel column types, int16 holds hundredths of a degree like INT16_CENTI_LE frames
+PIXEL_TYPES = {
+    'float16': np.dtype('<f2'),
+    'int16': np.dtype('<i2'),
+}
+COMPRESSIONS = ('none', 'zlib', 'zstd')
+
+# File header: magic, version, pixel type and compression (indexes into
+# PIXEL_TYPES and COMPRESSIONS), frame height and width
+_HEADER = struct.Struct('<8sIBBHH')
+_MAGIC = b'MLXARCHV'
+_VERSION = 1
+
+# Chunk header: magic, frames, first and last identifier, then the stored
+# sizes of the sensor table (JSON list of the chunk's sensor ids), the
+# identifier column (<f8), the sensor column (<u2 indexes into the table)
+# and the pixel column. Every column starts on an _ALIGN boundary, so
+# uncompressed columns can be viewed in place.
+_CHUNK = struct.Struct('<4sIddIIII')
+_CHUNK_MAGIC = b'CHNK'
+_ALIGN = 64
+
+# One row of the sidecar index per chunk, sorted by identifier
+INDEX_DTYPE = np.dtype([('first', '<f8'), ('last', '<f8'), ('offset', '<u8'), ('frames', '<u4')])
+
+IDENTIFIER_DTYPE = np.dtype('<f8')
+SENSOR_DTYPE = np.dtype('<u2')
+
+
+def _aligned(position):
+    return -(-position // _ALIGN) * _ALIGN
+
+
+# Columns are compressed as planes of their values' first bytes, second bytes
+# and so on, like delta_codec does with 2-byte values. The high bytes of
+# neighbouring pixels and identifiers hardly change and compress far better
+# on their own.
+def _shuffle(column):
+    return np.ascontiguousarray(column.view(np.uint8).reshape(-1, column.dtype.itemsize).T)
+
+
+def _unshuffle(data, dtype):
+    planes = np.frombuffer(data, dtype=np.uint8).reshape(dtype.itemsize, -1)
+    return np.ascontiguousarray(planes.T).view(dtype).ravel()
+
+
+def _compressor(compression, level):
+    if compression not in COMPRESSIONS:
+        raise ValueError(f'Unknown compression {compression!r}, expected one of {list(COMPRESSIONS)}')
+    if compression == 'zstd':
+        if zstandard is None:
+            raise ValueError("zstd compression needs the 'zstandard' package")
+        return zstandard.ZstdCompressor(level=level or 3).compress
+    if compression == 'zlib':
+        return lambda data: zlib.compress(data, level or 6)
+    return bytes
+
+
+def _decompressor(compression):
+    if compression == 'zstd':
+        if zstandard is None:
+            raise ValueError("zstd archives need the 'zstandard' package")
+        return zstandard.ZstdDecompressor().decompress
+    return zlib.decompress
+
+
+# Writes frames to a columnar archive for training jobs. Frames are buffered
+# chunk_frames at a time and every full chunk is written as three columns,
+# identifiers, sensors and a (N, height, width) pixel tensor of float16 or
+# int16, each compressed on its own unless compression is 'none'. Frames have
+# to come in identifier order, like export.py fetches them, which is what
+# lets the index seek to a time. The sidecar index is written on close, a
+# reader rebuilds it from the chunk headers when it is missing or stale.
+#
+#   with ArchiveWriter('day.mlxa', pixels='int16', compression='zstd') as writer:
+#       writer.write(identifier, 'mlx0', frame)
+class ArchiveWriter:
+    def __init__(self, path, pixels='float16', compression='zlib', chunk_frames=1024, level=None,
+                 shape=frame_codec.MLX_SHAPE):
+        if pixels not in PIXEL_TYPES:
+            raise ValueError(f'Unknown pixel type {pixels!r}, expected one of {list(PIXEL_TYPES)}')
+        if chunk_frames < 1:
+            raise ValueError('chunk_frames must be at least 1')
+        self.path = path
+        self.pixels = pixels
+        self.compression = compression
+        self.shape = tuple(shape)
+        self.frames = 0
+        self._compress = _compressor(compression, level)
+        self._identifiers = np.zeros(chunk_frames, dtype=IDENTIFIER_DTYPE)
+        self._sensors = np.zeros(chunk_frames, dtype=SENSOR_DTYPE)
+        self._temperatures = np.zeros((chunk_frames,) + self.shape, dtype=np.float32)
+        self._sensor_codes = {}
+        self._buffered = 0
+        self._last = -np.inf
+        self._index = []
+        self._file = open(path, 'wb')
+        self._file.write(_HEADER.pack(_MAGIC, _VERSION, list(PIXEL_TYPES).index(pixels),
+                                      COMPRESSIONS.index(compression), *self.shape))
+        self._file.write(bytes(_aligned(_HEADER.size) - _HEADER.size))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    # The float32 slot the next frame goes into, decode straight into it and
+    # call commit(identifier, sensor_id) to keep it
+    def next_frame(self):
+        return self._temperatures[self._buffered]
+
+    def commit(self, identifier, sensor_id=''):
+        if identifier < self._last:
+            raise ValueError(f'Frame {identifier} comes before {self._last}, archives are written in identifier order')
+        self._last = identifier
+        code = self._sensor_codes.setdefault(sensor_id, len(self._sensor_codes))
+        self._identifiers[self._buffered] = identifier
+        self._sensors[self._buffered] = code
+        self._buffered += 1
+        self.frames += 1
+        if self._buffered == len(self._identifiers):
+            self.flush()
+
+    def write(self, identifier, sensor_id, frame):
+        np.copyto(self.next_frame(), np.reshape(frame, self.shape), casting='unsafe')
+        self.commit(identifier, sensor_id)
+
+    def _pixel_column(self, count):
+        temperatures = self._temperatures[:count]
+        if self.pixels == 'float16':
+            return temperatures.astype(PIXEL_TYPES['float16'])
+        scaled = np.rint(temperatures * frame_codec.INT16_CENTI_SCALE)
+        np.clip(scaled, np.iinfo(np.int16).min, np.iinfo(np.int16).max, out=scaled)
+        return scaled.astype(PIXEL_TYPES['int16'])
+
+    # Writes the buffered frames as one chunk
+    def flush(self):
+        count = self._buffered
+        if not count:
+            return
+        columns = [self._identifiers[:count], self._sensors[:count], self._pixel_column(count)]
+        if self.compression == 'none':
+            stored = [column.tobytes() for column in columns]
+        else:
+            stored = [self._compress(_shuffle(column).tobytes()) for column in columns]
+        table = json.dumps(list(self._sensor_codes)).encode()
+
+        offset = self._file.tell()
+        self._file.write(_CHUNK.pack(_CHUNK_MAGIC, count, self._identifiers[0], self._identifiers[count - 1],
+                                     len(table), *(len(data) for data in stored)))
+        self._file.write(table)
+        for data in stored:
+            self._file.write(bytes(_aligned(self._file.tell()) - self._file.tell()))
+            self._file.write(data)
+        self._index.append((self._identifiers[0], self._identifiers[count - 1], offset, count))
+        self._buffered = 0
+        self._sensor_codes = {}
+
+    def close(self):
+        if self._file.closed:
+            return
+        self.flush()
+        self._file.close()
+        write_index(self.path, np.array(self._index, dtype=INDEX_DTYPE))
+
+
+def index_path(path):
+    return path + INDEX_SUFFIX
+
+
+# Written to a temporary file and renamed, so a reader never sees half an index
+def write_index(path, index):
+    temporary = f'{index_path(path)}.{os.getpid()}.tmp'
+    with open(temporary, 'wb') as file:
+        np.save(file, index)
+    os.replace(temporary, index_path(path))
+
+
+# One chunk of an archive. The columns are only read (and decompressed) when
+# first used, so seeking only touches the identifiers. Uncompressed columns
+# are read-only views of the memory-mapped file.
+class ArchiveChunk:
+    def __init__(self, archive, offset):
+        self._archive = archive
+        magic, self.frames, self.first, self.last, table_size, *sizes = _CHUNK.unpack_from(archive._data, offset)
+        if magic != _CHUNK_MAGIC:
+            raise ValueError(f'{archive.path}: no chunk at offset {offset}')
+        start = offset + _CHUNK.size
+        self.sensors = json.loads(bytes(archive._data[start:start + table_size]))
+        position = start + table_size
+        self._columns = []
+        for size in sizes:
+            position = _aligned(position)
+            self._columns.append((position, size))
+            position += size
+        self.end = position
+        self._identifiers = self._codes = self._pixels = None
+
+    def _column(self, number, dtype, shape):
+        position, size = self._columns[number]
+        data = self._archive._data[position:position + size]
+        if self._archive.compression == 'none':
+            return data.view(dtype).reshape(shape)
+        return _unshuffle(self._archive._decompress(data), dtype).reshape(shape)
+
+    # Capture times, <f8
+    @property
+    def identifiers(self):
+        if self._identifiers is None:
+            self._identifiers = self._column(0, IDENTIFIER_DTYPE, (self.frames,))
+        return self._identifiers
+
+    # Index of every frame's sensor id in sensors
+    @property
+    def codes(self):
+        if self._codes is None:
+            self._codes = self._column(1, SENSOR_DTYPE, (self.frames,))
+        return self._codes
+
+    # Sensor id of every frame
+    @property
+    def sensor_ids(self):
+        return np.array(self.sensors, dtype=object)[self.codes]
+
+    # The stored (N, height, width) float16 or int16 pixels
+    @property
+    def pixels(self):
+        if self._pixels is None:
+            self._pixels = self._column(2, self._archive.dtype, (self.frames,) + self._archive.shape)
+        return self._pixels
+
+
+# A slice of frames from one chunk: identifiers, sensor_ids and pixels in the
+# archive's pixel type, views of the chunk where possible
+class FrameBatch:
+    def __init__(self, identifiers, sensor_ids, pixels, pixel_type):
+        self.identifiers = identifiers
+        self.sensor_ids = sensor_ids
+        self.pixels = pixels
+        self.pixel_type = pixel_type
+
+    def __len__(self):
+        return len(self.identifiers)
+
+    # The pixels as float32 degrees
+    def temperatures(self, out=None):
+        if out is None:
+            out = np.empty(self.pixels.shape, dtype=np.float32)
+        if self.pixel_type == 'int16':
+            return np.multiply(self.pixels, 1 / frame_codec.INT16_CENTI_SCALE, out=out, casting='unsafe')
+        np.copyto(out, self.pixels, casting='unsafe')
+        return out
+
+
+# Reads an archive written by ArchiveWriter. The data file is memory-mapped,
+# so only the chunks asked for are paged in.
+#
+#   with ArchiveReader('day.mlxa') as archive:
+#       for batch in archive.batches(start, end, sensor='mlx0'):
+#           train(batch.identifiers, batch.temperatures())
+class ArchiveReader:
+    def __init__(self, path):
+        self.path = path
+        self._data = np.memmap(path, dtype=np.uint8, mode='r')
+        magic, version, pixels, compression, height, width = _HEADER.unpack_from(self._data, 0)
+        if magic != _MAGIC or version != _VERSION:
+            raise ValueError(f'{path} is not a version {_VERSION} archive')
+        self.pixel_type = list(PIXEL_TYPES)[pixels]
+        self.dtype = PIXEL_TYPES[self.pixel_type]
+        self.compression = COMPRESSIONS[compression]
+        self.shape = (height, width)
+        self._decompress = _decompressor(self.compression) if self.compression != 'none' else None
+        self.index = self._load_index()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return int(self.index['frames'].sum())
+
+    # The sidecar index when it covers the whole data file, otherwise one
+    # rebuilt from the chunk headers. A chunk cut short by a crash is left out.
+    def _load_index(self):
+        try:
+            index = np.load(index_path(self.path))
+            if index.dtype == INDEX_DTYPE and (
+                    ArchiveChunk(self, int(index['offset'][-1])).end == len(self._data) if len(index)
+                    else len(self._data) <= _aligned(_HEADER.size)):
+                return index
+        except (OSError, ValueError, struct.error):
+            pass
+
+        rows = []
+        offset = _aligned(_HEADER.size)
+        while offset + _CHUNK.size <= len(self._data):
+            try:
+                chunk = ArchiveChunk(self, offset)
+            except ValueError:
+                break
+            if chunk.end > len(self._data):
+                break
+            rows.append((chunk.first, chunk.last, offset, chunk.frames))
+            offset = chunk.end
+        return np.array(rows, dtype=INDEX_DTYPE)
+
+    def chunk(self, number):
+        return ArchiveChunk(self, int(self.index['offset'][number]))
+
+    # (chunk number, row) of the first frame with identifier >= identifier,
+    # a binary search over the index and then over one chunk's identifiers.
+    # (len(index), 0) when every frame is earlier.
+    def seek(self, identifier):
+        number = int(np.searchsorted(self.index['last'], identifier, side='left'))
+        if number == len(self.index):
+            return number, 0
+        return number, int(np.searchsorted(self.chunk(number).identifiers, identifier, side='left'))
+
+    # Yields a FrameBatch per chunk of the frames with start <= identifier < end,
+    # only from sensor if given. Chunks are read one at a time as the batches are used.
+    def batches(self, start=None, end=None, sensor=None):
+        number, row = self.seek(start) if start is not None else (0, 0)
+        while number < len(self.index):
+            if end is not None and self.index['first'][number] >= end:
+                return
+            chunk = self.chunk(number)
+            stop = chunk.frames
+            if end is not None and chunk.last >= end:
+                stop = int(np.searchsorted(chunk.identifiers, end, side='left'))
+            rows = slice(row, stop)
+            if sensor is None:
+                yield FrameBatch(chunk.identifiers[rows], chunk.sensor_ids[rows], chunk.pixels[rows],
+                                 self.pixel_type)
+            elif sensor in chunk.sensors:
+                keep = np.flatnonzero(chunk.codes[rows] == chunk.sensors.index(sensor)) + row
+                if len(keep):
+                    yield FrameBatch(chunk.identifiers[keep], np.full(len(keep), sensor, dtype=object),
+                                     chunk.pixels[keep], self.pixel_type)
+            number, row = number + 1, 0
+
+    # (identifiers, temperatures) of the frames with start <= identifier < end
+    # as one float32 (N, height, width) batch
+    def load(self, start=None, end=None, sensor=None):
+        batches = list(self.batches(start, end, sensor))
+        identifiers = np.concatenate([batch.identifiers for batch in batches]) if batches else np.empty(0)
+        temperatures = np.empty((len(identifiers),) + self.shape, dtype=np.float32)
+        position = 0
+        for batch in batches:
+            batch.temperatures(out=temperatures[position:position + len(batch)])
+            position += len(batch)
+        return identifiers, temperatures
+
+    def close(self):
+        # the map is released once no view of it is left
+        self._data = None
@@ -0,0 +1,81 @@
+import asyncio
+import logging
+
+from capture_pipeline import FrameRing
+from db_stub import InsertRequest
+
+
+# Collects frames into a bounded ring and sends them as one multi-protobuf
+# Insert when either batch_size frames are waiting or the oldest waiting frame
+# is batch_interval seconds old. Frames are submitted from any thread, the
+# sender workers drain the ring as asyncio tasks on an AsyncDBClient so several
+# Inserts can be in flight at once. encode turns a queued item into a serialized
+# message, sent as an Any of type_url.
+class BatchSender:
+    def __init__(self, client, keyspace='imageKeyspace', batch_size=8, batch_interval=1.0, max_queue=256,
+                 overflow='block', workers=1, encode=None, type_url='ImageData'):
+        if batch_size < 1:
+            raise ValueError('batch_size must be at least 1')
+        self.client = client
+        self.keyspace = keyspace
+        self.batch_size = batch_size
+        self.batch_interval = batch_interval
+        self.ring = FrameRing(max_queue, overflow)
+        self.workers = workers
+        self.type_url = type_url
+        self.encode = encode or (lambda item: item)
+        self.frames_sent = 0
+        self.batches_sent = 0
+        self.error = None
+
+    @property
+    def dropped(self):
+        return self.ring.dropped
+
+    # How full the ring is, from 0 to 1
+    @property
+    def queue_fill(self):
+        return len(self.ring) / self.ring.capacity
+
+    # With the 'block' overflow policy this waits while the ring is full, so a
+    # stalled server slows capture down instead of growing memory
+    def submit(self, item):
+        if self.error is not None:
+            raise self.error
+        self.ring.put(item)
+
+    # Lets the workers send whatever is still queued and then return from run()
+    def stop(self):
+        self.ring.close()
+
+    # Runs the sender workers until stop() is called and the ring is drained
+    async def run(self):
+        try:
+            await asyncio.gather(*(self._worker() for _ in range(self.workers)))
+        except Exception as e:
+            # handed back to the capture thread on its next submit()
+            self.error = e
+            self.ring.close()
+            raise
+
+    async def _worker(self):
+        loop = asyncio.get_running_loop()
+        # reused for every batch of this worker
+        request = InsertRequest(self.keyspace, self.type_url)
+        while True:
+            # the ring is a thread-safe blocking buffer, wait on it off the event loop
+            batch = await loop.run_in_executor(None, self.ring.get_batch, self.batch_size, self.batch_interval)
+            if not batch:
+                return
+
+            try:
+                for item in batch:
+                    request.add(self.encode(item))
+                await self.client.insert_encoded(request)
+            finally:
+                request.clear()
+
+            self.frames_sent += len(batch)
+            self.batches_sent += 1
+            # lazy formatting, this runs for every batch
+            logging.debug('Sent batch of %d frames (%d total)', len(batch), self.frames_sent)
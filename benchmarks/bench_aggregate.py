@@ -0,0 +1,131 @@
+# Compares what a dashboard's per-minute min/max/mean timeline costs with
+# Aggregate against selecting every frame and reducing them on the client.
+# An in-process local_server is filled with --hours of synthetic frames at
+# --rate frames per second in each --encoding, the bytes received are then
+# scaled up to a day of history. Exits with status 1 if both ways don't give
+# the same timeline.
+#
+#   python3 benchmarks/bench_aggregate.py
+#   python3 benchmarks/bench_aggregate.py --hours 0.25 --encodings text delta
+import os
+import sys
+import time
+import asyncio
+import argparse
+import numpy as np
+from google.protobuf import any_pb2
+
+# Import the clients' modules from the repository root
+sys.path.insert(1, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import frame_codec
+import local_server
+from aggregate import aggregate
+from aio_client import AsyncDBClient
+from common import image_pb2
+from common import generic_pb2
+from delta_codec import DeltaEncoder
+from sources import SyntheticSource
+
+DAY = 24 * 3600
+ENCODINGS = list(frame_codec.ENCODINGS) + ['delta']
+
+
+def synthetic_frames(count, seed=1):
+    source = SyntheticSource('bench', mode='scene', seed=seed)
+    frames = []
+    for _ in range(count):
+        frame = [0] * 768
+        source.read_frame(frame)
+        frames.append(frame)
+    return frames
+
+
+# Inserts count frames, one every 1 / rate seconds, cycling through frames
+def fill(servicer, keyspace, encoding, frames, count, rate, start=1.7e9, batch=256):
+    pack = DeltaEncoder(30).encode if encoding == 'delta' else (
+        lambda m, f: frame_codec.encode_frame(m, f, encoding=frame_codec.ENCODINGS[encoding]))
+    for first in range(0, count, batch):
+        protobufs = []
+        for i in range(first, min(first + batch, count)):
+            image_message = image_pb2.ImageData(identifier=start + i / rate, sensor_id='bench')
+            pack(image_message, frames[i % len(frames)])
+            protobufs.append(any_pb2.Any(value=image_message.SerializeToString(), type_url='ImageData'))
+        servicer.Insert(generic_pb2.protobuf_insert_request(keyspace=keyspace, protobufs=protobufs), None)
+    return start, start + count / rate
+
+
+async def measure(port, keyspace, start, end, bucket, on_client):
+    async with AsyncDBClient('localhost', port, timeout=600.0) as client:
+        began = time.perf_counter()
+        timeline = await aggregate(client, start, end, bucket, keyspace=keyspace, on_client=on_client)
+        return timeline, time.perf_counter() - began
+
+
+# Counts the bytes of the Select and Aggregate responses sent
+class CountingServicer(local_server.LocalDBServicer):
+    def __init__(self):
+        super().__init__()
+        self.response_bytes = 0
+
+    def Select(self, request, context):
+        response = super().Select(request, context)
+        self.response_bytes += response.ByteSize()
+        return response
+
+    def Aggregate(self, request, context):
+        response = super().Aggregate(request, context)
+        self.response_bytes += response.ByteSize()
+        return response
+
+
+def human(size):
+    for unit in ('B', 'kB', 'MB', 'GB'):
+        if size < 1000 or unit == 'GB':
+            return f'{size:.1f} {unit}'
+        size /= 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Aggregate against client-side reduction of every frame')
+    parser.add_argument('--port', type=int, default=50098)
+    parser.add_argument('--hours', type=float, default=1.0, help='Hours of history stored for each encoding')
+    parser.add_argument('--rate', type=float, default=4.0, help='Frames per second, 4 is the default refresh rate')
+    parser.add_argument('--bucket', type=float, default=60.0, help='Seconds of frames in each bucket')
+    parser.add_argument('--encodings', nargs='+', choices=ENCODINGS, default=ENCODINGS)
+    args = parser.parse_args()
+
+    count = int(args.hours * 3600 * args.rate)
+    frames = synthetic_frames(256)
+    servicer = CountingServicer()
+    server, _ = local_server.serve(args.port, servicer=servicer)
+    mismatches = []
+    print(f'{count} frames ({args.hours:g} h at {args.rate:g}/s) in {args.bucket:g}s buckets, bytes scaled to a day')
+    print(f'{"encoding":<10} {"select":>10} {"aggregate":>10} {"select [s]":>11} {"aggregate [s]":>14}')
+    try:
+        for encoding in args.encodings:
+            keyspace = f'bench_{encoding}'
+            start, end = fill(servicer, keyspace, encoding, frames, count, args.rate)
+
+            results = {}
+            for on_client in (True, False):
+                servicer.response_bytes = 0
+                timeline, elapsed = asyncio.run(measure(args.port, keyspace, start, end, args.bucket, on_client))
+                results[on_client] = (timeline, elapsed, servicer.response_bytes * DAY * args.rate / count)
+            selected, aggregated = results[True], results[False]
+            print(f'{encoding:<10} {human(selected[2]):>10} {human(aggregated[2]):>10} '
+                  f'{selected[1]:>11.2f} {aggregated[1]:>14.2f}')
+
+            if not all(np.allclose(selected[0][name], aggregated[0][name]) for name in selected[0].dtype.names):
+                mismatches.append(encoding)
+            servicer.DropTable(generic_pb2.protobuf_droptable_request(keyspace=keyspace, table='imagedata'), None)
+    finally:
+        server.stop(None)
+
+    for encoding in mismatches:
+        print(f'{encoding}: Aggregate and client-side timelines differ')
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,150 @@
+# Read throughput of archive.py's columnar archives against what a training
+# job does today, selecting the stored rows one page after another and
+# parsing and decoding every ImageData. An in-process local_server is filled
+# with --frames synthetic frames from two cameras in each --encoding. Every
+# archive variant is written from the same frames and read back as float32
+# temperatures, and as the stored pixels without converting them. The last
+# column is the time of a seek to a random capture time.
+#
+#   python3 benchmarks/bench_archive.py
+#   python3 benchmarks/bench_archive.py --frames 100000 --encodings text
+import os
+import sys
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+import numpy as np
+from google.protobuf import any_pb2
+
+# Import the clients' modules from the repository root
+sys.path.insert(1, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import archive
+import frame_codec
+import local_server
+from aio_client import AsyncDBClient
+from common import image_pb2
+from common import generic_pb2
+from sources import SyntheticSource
+
+RATE = 8.0  # frames per second of each camera
+SENSORS = ('left', 'right')
+
+
+def synthetic_frames(count):
+    sources = [SyntheticSource(sensor_id, mode='scene', seed=i) for i, sensor_id in enumerate(SENSORS)]
+    frames = np.empty((count,) + frame_codec.MLX_SHAPE, dtype=np.float32)
+    frame = [0.0] * 768
+    for i in range(count):
+        sources[i % len(sources)].read_frame(frame)
+        frames[i] = np.reshape(frame, frame_codec.MLX_SHAPE)
+    identifiers = 1.7e9 + np.arange(count) / (RATE * len(SENSORS))
+    return identifiers, frames
+
+
+# Bytes of the rows inserted
+def fill(servicer, keyspace, encoding, identifiers, frames, batch=256):
+    stored = 0
+    for first in range(0, len(frames), batch):
+        protobufs = []
+        for i in range(first, min(first + batch, len(frames))):
+            image_message = image_pb2.ImageData(identifier=identifiers[i], sensor_id=SENSORS[i % len(SENSORS)])
+            frame_codec.encode_frame(image_message, frames[i].ravel().tolist(),
+                                     encoding=frame_codec.ENCODINGS[encoding])
+            protobufs.append(any_pb2.Any(value=image_message.SerializeToString(), type_url='ImageData'))
+            stored += len(protobufs[-1].value)
+        servicer.Insert(generic_pb2.protobuf_insert_request(keyspace=keyspace, protobufs=protobufs), None)
+    return stored
+
+
+# Seconds to select every row a page at a time, parse it and decode its
+# frame into one (N, 24, 32) array, like a training job without archives
+async def select_and_decode(port, keyspace, start, end, out, page_bytes=1 << 20):
+    async with AsyncDBClient('localhost', port, timeout=600.0) as client:
+        began = time.perf_counter()
+        count = 0
+        while True:
+            response = await client.select_range(keyspace, 'imagedata', start, end, max_bytes=page_bytes)
+            for serialized_image in response.protobufs:
+                image_data = image_pb2.ImageData.FromString(serialized_image)
+                frame_codec.decode_frame(image_data, out=out[count])
+                count += 1
+            if not response.has_more or not response.protobufs:
+                break
+            start = float(np.nextafter(image_data.identifier, np.inf))
+        return time.perf_counter() - began, count
+
+
+# Seconds to read every frame of the archive at path into out, as float32
+# temperatures or, for an out of the archive's pixel type, as stored
+def read_archive(path, out):
+    began = time.perf_counter()
+    count = 0
+    with archive.ArchiveReader(path) as reader:
+        for batch in reader.batches():
+            if out.dtype == np.float32:
+                batch.temperatures(out=out[count:count + len(batch)])
+            else:
+                np.copyto(out[count:count + len(batch)], batch.pixels)
+            count += len(batch)
+    return time.perf_counter() - began, count
+
+
+def seek_time(path, identifiers, repeat=200):
+    targets = [random.uniform(identifiers[0], identifiers[-1]) for _ in range(repeat)]
+    with archive.ArchiveReader(path) as reader:
+        began = time.perf_counter()
+        for target in targets:
+            reader.seek(target)
+        return (time.perf_counter() - began) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Columnar archives against Select and ParseFromString')
+    parser.add_argument('--port', type=int, default=50098)
+    parser.add_argument('--frames', type=int, default=40000)
+    parser.add_argument('--encodings', nargs='+', choices=list(frame_codec.ENCODINGS),
+                        default=list(frame_codec.ENCODINGS))
+    parser.add_argument('--chunk-frames', type=int, default=1024)
+    args = parser.parse_args()
+
+    identifiers, frames = synthetic_frames(args.frames)
+    servicer = local_server.LocalDBServicer()
+    server, _ = local_server.serve(args.port, servicer=servicer)
+    # written to once first, so page faults don't count against the first reader
+    out = frames.copy()
+    start, end = identifiers[0], float(np.nextafter(identifiers[-1], np.inf))
+
+    print(f'{args.frames} frames of {len(SENSORS)} cameras')
+    print(f'{"source":<22} {"bytes/frame":>12} {"frames/s":>10} {"raw frames/s":>13} {"seek [ms]":>10}')
+    try:
+        for encoding in args.encodings:
+            stored = fill(servicer, encoding, encoding, identifiers, frames)
+            seconds, count = asyncio.run(select_and_decode(args.port, encoding, start, end, out))
+            if count != args.frames:
+                print(f'select {encoding}: {count} of {args.frames} frames')
+            print(f'{"select " + encoding:<22} {stored / count:>12.0f} {count / seconds:>10.0f} {"-":>13} {"-":>10}')
+    finally:
+        server.stop(None)
+
+    with tempfile.TemporaryDirectory() as directory:
+        for pixels in archive.PIXEL_TYPES:
+            for compression in archive.COMPRESSIONS:
+                if compression == 'zstd' and archive.zstandard is None:
+                    continue
+                path = os.path.join(directory, f'{pixels}-{compression}.mlxa')
+                with archive.ArchiveWriter(path, pixels=pixels, compression=compression,
+                                           chunk_frames=args.chunk_frames) as writer:
+                    for i in range(args.frames):
+                        writer.write(identifiers[i], SENSORS[i % len(SENSORS)], frames[i])
+                size = os.path.getsize(path) + os.path.getsize(archive.index_path(path))
+                seconds, count = read_archive(path, out)
+                raw_seconds, _ = read_archive(path, np.ones(frames.shape, dtype=archive.PIXEL_TYPES[pixels]))
+                print(f'{"archive " + pixels + " " + compression:<22} {size / count:>12.0f} {count / seconds:>10.0f} '
+                      f'{count / raw_seconds:>13.0f} {seek_time(path, identifiers) * 1000:>10.3f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+# Compares channels.ChannelFactory settings against a bare channel with
+# gRPC's defaults over a simulated slow link (slow_link.py). Every setting
+# uploads --frames text frames with batched Inserts and then Selects all
+# --rows stored text frames in one call, larger than gRPC's default 4 MiB
+# receive limit. The gzip settings go to a second server that compresses its
+# responses too.
+#
+#   python3 benchmarks/bench_channels.py
+#   python3 benchmarks/bench_channels.py --mbit 2 --latency 150 --frames 200
+import os
+import sys
+import time
+import asyncio
+import argparse
+import grpc
+from google.protobuf import any_pb2
+
+# Import the clients' modules from the repository root
+sys.path.insert(1, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import frame_codec
+import local_server
+from aio_client import AsyncDBClient
+from channels import ChannelFactory
+from common import image_pb2
+from common import generic_pb2
+from sources import SyntheticSource
+from slow_link import SlowLink
+
+# name: (channel factory, whether the server compresses its responses)
+SETTINGS = {
+    'defaults': (ChannelFactory(keepalive=0, max_message_bytes=0, reconnect_backoff=None), False),
+    'tuned': (ChannelFactory(), False),
+    'gzip': (ChannelFactory(compression='gzip'), True),
+    'gzip x4': (ChannelFactory(compression='gzip', connections=4), True),
+}
+
+
+def text_frames(count, start, sensor_id='bench'):
+    source = SyntheticSource(sensor_id, mode='scene', seed=1)
+    frame = [0.0] * 768
+    messages = []
+    for i in range(count):
+        source.read_frame(frame)
+        image_message = image_pb2.ImageData(identifier=start + i * 0.25, sensor_id=sensor_id)
+        frame_codec.encode_frame(image_message, frame, encoding=image_pb2.TEXT)
+        messages.append(any_pb2.Any(value=image_message.SerializeToString(), type_url='ImageData'))
+    return messages
+
+
+# Seconds to insert messages in batches, max_in_flight calls at once
+async def upload(client, keyspace, messages, batch_size):
+    began = time.perf_counter()
+    await asyncio.gather(*(client.insert(keyspace, messages[i:i + batch_size])
+                           for i in range(0, len(messages), batch_size)))
+    return time.perf_counter() - began
+
+
+# (seconds, rows) of a Select of the whole table, (seconds, status name) when it failed
+async def select_all(client, keyspace):
+    began = time.perf_counter()
+    try:
+        response = await client.select(keyspace, 'imagedata')
+        return time.perf_counter() - began, len(response.protobufs)
+    except grpc.aio.AioRpcError as e:
+        return time.perf_counter() - began, e.code().name
+
+
+async def measure(port, factory, link, keyspace, messages, batch_size):
+    async with AsyncDBClient('localhost', port, timeout=600.0, retries=0, channels=factory) as client:
+        link.reset()
+        upload_time = await upload(client, f'{keyspace}_upload', messages, batch_size)
+        sent = link.bytes_up
+        link.reset()
+        select_time, rows = await select_all(client, keyspace)
+        return upload_time, sent, select_time, rows, link.bytes_down
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Channel settings against gRPC defaults over a slow link')
+    parser.add_argument('--port', type=int, default=50093, help='First of four ports used')
+    parser.add_argument('--mbit', type=float, default=8.0, help='Bandwidth of each direction in Mbit/s')
+    parser.add_argument('--latency', type=float, default=40.0, help='One-way delay in milliseconds')
+    parser.add_argument('--frames', type=int, default=400, help='Text frames uploaded')
+    parser.add_argument('--rows', type=int, default=1100, help='Text frames stored and selected at once')
+    parser.add_argument('--batch-size', type=int, default=8)
+    parser.add_argument('--settings', nargs='+', choices=list(SETTINGS), default=list(SETTINGS))
+    args = parser.parse_args()
+
+    servicer = local_server.LocalDBServicer()
+    servicer.Insert(generic_pb2.protobuf_insert_request(keyspace='bench', protobufs=text_frames(args.rows, 1.7e9)),
+                    None)
+    plain, _ = local_server.serve(args.port, servicer=servicer)
+    compressed, _ = local_server.serve(args.port + 1, servicer=servicer, compression='gzip')
+    bandwidth, latency = args.mbit * 1e6 / 8, args.latency / 1000
+    links = [SlowLink(args.port + 2, args.port, bandwidth, latency).start(),
+             SlowLink(args.port + 3, args.port + 1, bandwidth, latency).start()]
+
+    print(f'{args.mbit:g} Mbit/s, {args.latency:g} ms: upload {args.frames} text frames, select {args.rows} at once')
+    print(f'{"settings":<10} {"upload [s]":>11} {"sent":>10} {"select [s]":>11} {"received":>10} {"rows":>20}')
+    try:
+        for index, name in enumerate(args.settings):
+            factory, gzip_server = SETTINGS[name]
+            link = links[1] if gzip_server else links[0]
+            messages = text_frames(args.frames, 1.8e9 + index * args.frames, sensor_id=name)
+            upload_time, sent, select_time, rows, received = asyncio.run(measure(
+                link.listen_port, factory, link, 'bench', messages, args.batch_size))
+            print(f'{name:<10} {upload_time:>11.2f} {sent / 1e6:>8.2f}MB {select_time:>11.2f} '
+                  f'{received / 1e6:>8.2f}MB {rows:>20}')
+    finally:
+        for link in links:
+            link.stop()
+        plain.stop(None)
+        compressed.stop(None)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+# Compares the legacy comma-joined text frames against the binary pixel encodings.
+# Reports bytes on the wire (ImageData and the Any-wrapped Insert request) and
+# encode/decode time per frame.
+#
+#   python3 benchmarks/bench_codec.py --frames 2000
+import os
+import sys
+import time
+import random
+import argparse
+
+# Import the clients' modules from the repository root
+sys.path.insert(1, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import frame_codec
+from google.protobuf import any_pb2
+from common import image_pb2
+from common import generic_pb2
+
+
+# What image_client/training_client did before the pixels field existed
+def legacy_encode(image_message, frame):
+    frame_rounded = [round(n, 1) for n in frame]
+    image_message.data = frame_codec.stringify_float_list(frame_rounded, delimiter=',')
+
+
+def legacy_decode(image_data):
+    return [float(j) for j in image_data.data.split(',')]
+
+
+def measure(name, encode, decode, frames):
+    encode_time = 0.0
+    decode_time = 0.0
+    payload_bytes = 0
+    request_bytes = 0
+
+    for frame in frames:
+        start = time.perf_counter()
+        image_message = image_pb2.ImageData(identifier=time.time())
+        encode(image_message, frame)
+        serialized_image = image_message.SerializeToString()
+        encode_time += time.perf_counter() - start
+
+        request = generic_pb2.protobuf_insert_request(
+            keyspace="imageKeyspace",
+            protobufs=[any_pb2.Any(value=serialized_image, type_url="ImageData")]
+        )
+        payload_bytes += len(serialized_image)
+        request_bytes += request.ByteSize()
+
+        start = time.perf_counter()
+        image_data = image_pb2.ImageData()
+        image_data.ParseFromString(serialized_image)
+        decode(image_data)
+        decode_time += time.perf_counter() - start
+
+    n = len(frames)
+    print(f'{name:<10} {payload_bytes / n:>10.0f} {request_bytes / n:>10.0f} '
+          f'{encode_time / n * 1e6:>12.1f} {decode_time / n * 1e6:>12.1f}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Frame encoding benchmark')
+    parser.add_argument('--frames', type=int, default=1000, help='Number of synthetic frames to encode')
+    args = parser.parse_args()
+
+    # the same stand-in data image_client uses without a camera
+    frames = [[random.uniform(0.0, 100.0) for _ in range(768)] for _ in range(args.frames)]
+
+    print(f'{"encoding":<10} {"bytes":>10} {"request":>10} {"encode [us]":>12} {"decode [us]":>12}')
+    measure('legacy', legacy_encode, legacy_decode, frames)
+    for name, encoding in frame_codec.ENCODINGS.items():
+        encode = lambda image_message, frame, encoding=encoding: frame_codec.encode_frame(image_message, frame, encoding)
+        measure(name, encode, frame_codec.decode_frame, frames)
+
+
+if __name__ == '__main__':
+    main()
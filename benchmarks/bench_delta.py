@@ -0,0 +1,94 @@
+# Measures the bandwidth of keyframe/delta encoding against the per-frame
+# encodings on a synthetic sequence or a recording from image_client.py --record.
+# Also drops a share of the frames in transit to show keyframe recovery.
+#
+#   python3 benchmarks/bench_delta.py --frames 1200
+#   python3 benchmarks/bench_delta.py --recording frames.rec
+import os
+import sys
+import time
+import random
+import argparse
+import numpy as np
+
+# Import the clients' modules from the repository root
+sys.path.insert(1, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import frame_codec
+import delta_codec
+from common import image_pb2
+from replay import replay_frames
+from sources import SyntheticSource
+
+
+def synthetic_frames(count, seed):
+    source = SyntheticSource('bench', mode='scene', seed=seed)
+    frames = []
+    for _ in range(count):
+        frame = [0] * 768
+        source.read_frame(frame)
+        frames.append(np.array(frame, dtype=np.float32).reshape(frame_codec.MLX_SHAPE))
+    return frames
+
+
+def measure(name, encode, frames, text_bytes, loss, seed):
+    start = time.perf_counter()
+    messages = []
+    for i, frame in enumerate(frames):
+        image_message = image_pb2.ImageData(identifier=i, sensor_id='bench')
+        encode(image_message, frame)
+        messages.append(image_message.SerializeToString())
+    encode_time = (time.perf_counter() - start) / len(frames)
+
+    decoder = delta_codec.DeltaDecoder()
+    start = time.perf_counter()
+    max_error = 0.0
+    for frame, serialized_image in zip(frames, messages):
+        decoded = decoder.decode(image_pb2.ImageData.FromString(serialized_image))
+        max_error = max(max_error, float(np.abs(decoded - frame).max()))
+    decode_time = (time.perf_counter() - start) / len(frames)
+
+    # lose frames on the way and count how many the viewer can still show
+    rng = random.Random(seed)
+    lossy_decoder = delta_codec.DeltaDecoder()
+    received = [m for m in messages if rng.random() >= loss]
+    shown = sum(lossy_decoder.decode(image_pb2.ImageData.FromString(m)) is not None for m in received)
+
+    size = sum(len(m) for m in messages) / len(messages)
+    print(f'{name:<18} {size:>8.0f} {text_bytes / size:>8.1f}x {encode_time * 1e6:>10.1f} {decode_time * 1e6:>10.1f} '
+          f'{max_error:>9.3f} {shown / max(1, len(received)):>9.1%}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Keyframe/delta encoding bandwidth report')
+    parser.add_argument('--frames', type=int, default=1200, help='Length of the synthetic sequence')
+    parser.add_argument('--recording', help='Use the frames of an image_client.py --record file instead')
+    parser.add_argument('--sensor', help='Only use this sensor id from the recording')
+    parser.add_argument('--loss', type=float, default=0.01, help='Share of frames lost in transit for the recovery column')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    if args.recording:
+        frames = [frame.copy() for _, frame in replay_frames(args.recording, args.sensor) if frame is not None]
+    else:
+        frames = synthetic_frames(args.frames, args.seed)
+
+    text_message = image_pb2.ImageData(identifier=0, sensor_id='bench')
+    text_bytes = sum(len(frame_codec.encode_frame(text_message, f.ravel().tolist(), image_pb2.TEXT).SerializeToString())
+                     for f in frames) / len(frames)
+
+    print(f'{len(frames)} frames, {args.loss:.0%} lost in transit for the shown column')
+    print(f'{"encoding":<18} {"bytes":>8} {"vs text":>9} {"enc [us]":>10} {"dec [us]":>10} {"max err":>9} {"shown":>9}')
+    for name, encoding in frame_codec.ENCODINGS.items():
+        encode = lambda m, f, encoding=encoding: frame_codec.encode_frame(m, f.ravel().tolist(), encoding)
+        measure(name, encode, frames, text_bytes, args.loss, args.seed)
+
+    compressions = [c for c in delta_codec.COMPRESSIONS if c != 'zstd' or delta_codec.zstandard is not None]
+    for compression in compressions:
+        for interval in (10, 30, 120):
+            encoder = delta_codec.DeltaEncoder(keyframe_interval=interval, compression=compression)
+            measure(f'delta/{compression} K={interval}', encoder.encode, frames, text_bytes, args.loss, args.seed)
+
+
+if __name__ == '__main__':
+    main()
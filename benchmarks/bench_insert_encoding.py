@@ -0,0 +1,131 @@
+# Cost of turning captured frames into Insert requests, the work
+# image_client's senders do for every frame, before and after db_stub:
+#   pack    the sensor's list of floats to FLOAT32_LE bytes, through a new
+#           numpy array before, frame_codec.float32_bytes' reused one now
+#   wrap    the serialized ImageData of a batch into one request, an Any per
+#           frame and a protobuf_insert_request per batch serialized again
+#           before, a reused db_stub.InsertRequest now
+#   insert  both ways through AsyncDBClient to an in-process local_server,
+#           serialization and the call included
+# Times are microseconds per frame, heap the peak bytes of Python objects per
+# frame while building (the result included). protobuf's upb arenas aren't
+# traced, so the Any messages of before only show up in the time.
+#
+#   python3 benchmarks/bench_insert_encoding.py
+#   python3 benchmarks/bench_insert_encoding.py --batch-size 8 --batches 2000
+import os
+import sys
+import time
+import random
+import asyncio
+import argparse
+import tracemalloc
+import numpy as np
+from google.protobuf import any_pb2
+
+# Import the clients' modules from the repository root
+sys.path.insert(1, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import frame_codec
+import local_server
+from aio_client import AsyncDBClient
+from common import image_pb2
+from common import generic_pb2
+from db_stub import InsertRequest
+
+KEYSPACE = 'imageKeyspace'
+
+
+def serialized_frames(count):
+    images = []
+    for i in range(count):
+        image_message = image_pb2.ImageData(identifier=1.7e9 + i, sensor_id='mlx0')
+        frame_codec.encode_frame(image_message, [random.uniform(20.0, 35.0) for _ in range(768)])
+        images.append(image_message.SerializeToString())
+    return images
+
+
+def pack_numpy(frame):
+    return np.asarray(frame, dtype=frame_codec.FLOAT32_LE).tobytes()
+
+
+def wrap_messages(images):
+    protobufs = [any_pb2.Any(value=serialized_image, type_url='ImageData') for serialized_image in images]
+    return generic_pb2.protobuf_insert_request(keyspace=KEYSPACE, protobufs=protobufs).SerializeToString()
+
+
+def wrapper_encoded():
+    request = InsertRequest(KEYSPACE)
+
+    def wrap(images):
+        request.clear()
+        for serialized_image in images:
+            request.add(serialized_image)
+        return request.serialize()
+    return wrap
+
+
+# (us per call, peak traced bytes of a call) of fn(arg) over repeat calls
+def measure(fn, arg, repeat):
+    began = time.perf_counter()
+    for _ in range(repeat):
+        fn(arg)
+    seconds = time.perf_counter() - began
+    tracemalloc.start()
+    for _ in range(min(repeat, 200)):
+        fn(arg)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return seconds / repeat * 1e6, peak
+
+
+async def insert_rate(port, images, batch_size, batches, encoded):
+    async with AsyncDBClient('localhost', port) as client:
+        request = InsertRequest(KEYSPACE)
+        began = time.perf_counter()
+        for i in range(batches):
+            batch = images[i % (len(images) // batch_size) * batch_size:][:batch_size]
+            if encoded:
+                request.clear()
+                for serialized_image in batch:
+                    request.add(serialized_image)
+                await client.insert_encoded(request)
+            else:
+                await client.insert(KEYSPACE, [any_pb2.Any(value=serialized_image, type_url='ImageData')
+                                               for serialized_image in batch])
+        return (time.perf_counter() - began) / (batches * batch_size) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Per frame cost of building Insert requests')
+    parser.add_argument('--port', type=int, default=50096)
+    parser.add_argument('--batch-size', type=int, default=64)
+    parser.add_argument('--batches', type=int, default=500)
+    args = parser.parse_args()
+
+    frame = [random.uniform(20.0, 35.0) for _ in range(768)]
+    images = serialized_frames(args.batch_size * 8)
+    batch = images[:args.batch_size]
+    size = args.batch_size
+
+    print(f'{"per frame":<8} {"before [us]":>12} {"now [us]":>9} {"heap before [B]":>16} {"heap now [B]":>13}')
+    rows = [('pack', measure(pack_numpy, frame, 20000), measure(frame_codec.float32_bytes, frame, 20000), 1),
+            ('wrap', measure(wrap_messages, batch, 2000), measure(wrapper_encoded(), batch, 2000), size)]
+    for name, (before, before_bytes), (now, now_bytes), frames in rows:
+        print(f'{name:<8} {before / frames:>12.2f} {now / frames:>9.2f} '
+              f'{before_bytes / frames:>16.0f} {now_bytes / frames:>13.0f}')
+
+    # a server that keeps nothing, so only the calls are timed
+    servicer = local_server.LocalDBServicer()
+    servicer.Insert = lambda request, context: generic_pb2.protobuf_server_response()
+    server, _ = local_server.serve(args.port, servicer=servicer)
+    try:
+        before = asyncio.run(insert_rate(args.port, images, size, args.batches, encoded=False))
+        now = asyncio.run(insert_rate(args.port, images, size, args.batches, encoded=True))
+    finally:
+        server.stop(None)
+    print(f'{"insert":<8} {before:>12.2f} {now:>9.2f} {"-":>16} {"-":>13}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+# The adaptive refresh rate (rate_control.RateController) against fixed rates.
+# Synthetic cameras stand in for Pi/camera combinations whose buses only keep
+# up to --bus-limits (reads at faster rates fail half of the time), and an
+# in-process local_server takes the frames. Halfway through, the server gets
+# --slow-latency ms slower per call, so the batches have to grow. Every case
+# prints the frames stored per second and the share of failed reads, the
+# adaptive run also prints its rates and batch size every few seconds.
+#
+#   python3 benchmarks/bench_rate_control.py
+#   python3 benchmarks/bench_rate_control.py --duration 60 --bus-limits 2 8 32 --fixed 4 16
+import os
+import sys
+import signal
+import asyncio
+import logging
+import argparse
+
+# Import the clients' modules from the repository root
+sys.path.insert(1, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import local_server
+from aio_client import AsyncDBClient
+from capture_pipeline import REFRESH_RATES
+from metrics import Metrics
+from sources import SyntheticSource
+from uploader import frame_packer, upload
+
+
+class CountingServicer(local_server.LocalDBServicer):
+    def __init__(self):
+        super().__init__()
+        self.frames = 0
+
+    def Insert(self, request, context):
+        self.frames += len(request.protobufs)
+        return super().Insert(request, context)
+
+
+# (frames stored, read errors, frames read) of duration seconds of uploading
+def run_case(args, refresh_rate, adaptive):
+    servicer = CountingServicer()
+    server, _ = local_server.serve(args.port, servicer=servicer)
+    sources = [SyntheticSource(f'bus{limit}', refresh_rate=refresh_rate, seed=i, bus_limit=limit)
+               for i, limit in enumerate(args.bus_limits)]
+    metrics = Metrics()
+    client = AsyncDBClient('localhost', args.port, metrics=metrics)
+    rate_control = dict(min_rate='0.5', max_rate=args.max_rate, interval=args.interval, settle=2,
+                        max_latency=args.max_latency) if adaptive else None
+
+    async def timeline():
+        elapsed = 0.0
+        while True:
+            await asyncio.sleep(args.print_every)
+            elapsed += args.print_every
+            rates = '  '.join(f'{labels[0][1]} {value:>4g}' for (name, labels), value in sorted(metrics.gauges.items())
+                              if name == 'refresh_hz')
+            batch = metrics.gauges.get(('batch_size', ()), '-')
+            print(f'  {elapsed:>5.0f}s  {rates}  batch {batch}')
+
+    async def run():
+        loop = asyncio.get_running_loop()
+        # upload() stops capturing and flushes on SIGINT, like Ctrl-C
+        loop.call_later(args.duration, os.kill, os.getpid(), signal.SIGINT)
+        loop.call_later(args.duration / 2, setattr, servicer, 'latency', args.slow_latency / 1000)
+        printer = asyncio.create_task(timeline()) if adaptive else None
+        try:
+            await upload(client, sources, pack=frame_packer('float32'), batch_size=8, batch_interval=0.25,
+                         stats_interval=3600, metrics=metrics, rate_control=rate_control)
+        finally:
+            if printer is not None:
+                printer.cancel()
+
+    try:
+        asyncio.run(run())
+    finally:
+        server.stop(None)
+    getframe = metrics.histograms.get('getFrame')
+    return servicer.frames, metrics.counters.get('read_errors', 0), getframe.count if getframe else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Adaptive refresh rate against fixed rates')
+    parser.add_argument('--port', type=int, default=50097)
+    parser.add_argument('--duration', type=float, default=60.0, help='Seconds of uploading per case')
+    parser.add_argument('--bus-limits', nargs='+', choices=list(REFRESH_RATES), default=['4', '8', '16'],
+                        help='Fastest refresh rate each synthetic camera reads without errors')
+    parser.add_argument('--fixed', nargs='+', choices=list(REFRESH_RATES), default=['4', '16'],
+                        help='Fixed refresh rates to compare with')
+    parser.add_argument('--max-rate', choices=list(REFRESH_RATES), default='32')
+    parser.add_argument('--interval', type=float, default=1.0, help="Seconds between the controller's decisions")
+    parser.add_argument('--max-latency', type=float, default=0.2, help='Insert seconds above which batches grow')
+    parser.add_argument('--slow-latency', type=float, default=400.0, help='Milliseconds per call in the second half')
+    parser.add_argument('--print-every', type=float, default=4.0)
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+
+    print(f'{len(args.bus_limits)} cameras with bus limits {", ".join(args.bus_limits)} Hz, '
+          f'{args.slow_latency:g} ms per call after {args.duration / 2:g}s')
+    results = []
+    for rate in args.fixed:
+        results.append((f'fixed {rate} Hz', run_case(args, rate, adaptive=False)))
+    print('adaptive, starting at 4 Hz:')
+    results.append(('adaptive', run_case(args, '4', adaptive=True)))
+
+    print(f'{"rate":<14} {"stored/s":>9} {"failed reads":>13}')
+    for name, (stored, errors, frames) in results:
+        print(f'{name:<14} {stored / args.duration:>9.1f} {errors / max(errors + frames, 1):>13.0%}')
+
+
+if __name__ == '__main__':
+    main()
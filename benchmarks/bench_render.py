@@ -0,0 +1,98 @@
+# Frames per second and temporary allocations per frame of the training
+# client's render path, before (list parse, float64 normalize, new PIL image,
+# resize, new PhotoImage) and after (decode into a preallocated float32 frame,
+# lookup table colormap, persistent PhotoImage). PhotoImage is only included
+# when a display is available.
+#
+#   python3 benchmarks/bench_render.py --frames 500
+import os
+import sys
+import time
+import random
+import argparse
+import tracemalloc
+import numpy as np
+from PIL import Image
+
+# Import the clients' modules from the repository root
+sys.path.insert(1, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import frame_codec
+from common import image_pb2
+from frame_renderer import FrameRenderer
+
+
+def legacy_render(image_data, photo_image):
+    frame = [float(j) for j in image_data.data.split(',')]
+    thermal_data = np.array(frame).reshape((24, 32))
+    normalized_data = ((thermal_data - np.min(thermal_data)) / (np.max(thermal_data) - np.min(thermal_data)) * 255).astype('uint8')
+    thermal_image = Image.fromarray(normalized_data, mode='L')
+    thermal_image = thermal_image.resize((600, 400))
+    if photo_image is not None:
+        photo_image(thermal_image)
+
+
+def make_renderer(photo_image):
+    renderer = FrameRenderer(size=(600, 400))
+
+    def render(image_data):
+        frame_codec.decode_frame(image_data, out=renderer.frame)
+        image = renderer.render()
+        if photo_image is not None:
+            if renderer.photo is None:
+                renderer.photo = photo_image(image)
+            else:
+                renderer.photo.paste(image)
+
+    return render
+
+
+def measure(name, render, messages):
+    for image_data in messages[:10]:
+        render(image_data)
+
+    start = time.perf_counter()
+    for image_data in messages:
+        render(image_data)
+    elapsed = time.perf_counter() - start
+
+    # bytes of temporaries allocated above the steady state while rendering a frame
+    tracemalloc.start()
+    peak_bytes = 0
+    for image_data in messages[:100]:
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        render(image_data)
+        peak_bytes += tracemalloc.get_traced_memory()[1] - before
+    tracemalloc.stop()
+
+    print(f'{name:<28} {len(messages) / elapsed:>10.0f} {peak_bytes / min(100, len(messages)) / 1024:>14.1f}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Viewer render path benchmark')
+    parser.add_argument('--frames', type=int, default=500)
+    args = parser.parse_args()
+
+    frames = [[random.uniform(20.0, 40.0) for _ in range(768)] for _ in range(args.frames)]
+    text = [frame_codec.encode_frame(image_pb2.ImageData(), f, image_pb2.TEXT) for f in frames]
+    binary = [frame_codec.encode_frame(image_pb2.ImageData(), f, image_pb2.FLOAT32_LE) for f in frames]
+
+    photo_image = None
+    try:
+        import tkinter as tk
+        from PIL import ImageTk
+        # PhotoImage needs a Tk root to exist
+        tk.Tk()
+        photo_image = ImageTk.PhotoImage
+    except Exception as e:
+        print(f'No display ({e.__class__.__name__}), PhotoImage left out')
+
+    print(f'{"render path":<28} {"frames/s":>10} {"alloc KB/frame":>14}')
+    measure('before (text frames)', lambda m: legacy_render(m, photo_image), text)
+    measure('after (text frames)', make_renderer(photo_image), text)
+    measure('after (float32 frames)', make_renderer(photo_image), binary)
+
+
+if __name__ == '__main__':
+    main()
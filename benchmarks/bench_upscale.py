@@ -0,0 +1,107 @@
+# Time per frame of upscale.Upscaler against ndimage.zoom and PIL's resize at
+# several output sizes, for one frame at a time and for a batch. The last
+# column is the largest difference in degrees from PIL with the same kernel,
+# which should only be float rounding.
+#
+#   python3 benchmarks/bench_upscale.py
+#   python3 benchmarks/bench_upscale.py --sizes 320x240 1280x960 --batch 256
+import os
+import sys
+import time
+import argparse
+import numpy as np
+from PIL import Image
+from scipy import ndimage
+
+# Import the clients' modules from the repository root
+sys.path.insert(1, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import frame_codec
+import upscale
+from sources import SyntheticSource
+
+PIL_FILTERS = {
+    'bilinear': Image.BILINEAR,
+    'bicubic': Image.BICUBIC,
+    'lanczos': Image.LANCZOS,
+}
+ZOOM_ORDERS = {
+    'bilinear': 1,
+    'bicubic': 3,
+}
+
+
+def synthetic_frames(count, seed=1):
+    source = SyntheticSource('bench', mode='scene', seed=seed)
+    frame = [0.0] * 768
+    frames = np.empty((count,) + frame_codec.MLX_SHAPE, dtype=np.float32)
+    for i in range(count):
+        source.read_frame(frame)
+        frames[i] = np.reshape(frame, frame_codec.MLX_SHAPE)
+    return frames
+
+
+# Milliseconds per frame of upscale(frame) over frames
+def per_frame(upscale_frame, frames, repeat):
+    upscale_frame(frames[0])
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for frame in frames:
+            upscale_frame(frame)
+    return (time.perf_counter() - start) / (repeat * len(frames)) * 1000
+
+
+def per_frame_batch(upscaler, frames, repeat):
+    out = upscaler.apply(frames)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        upscaler.apply(frames, out=out)
+    return (time.perf_counter() - start) / (repeat * len(frames)) * 1000
+
+
+def pil_resize(frame, size, resample):
+    return np.asarray(Image.fromarray(frame, 'F').resize(size, resample))
+
+
+# WIDTHxHEIGHT
+def parse_size(value):
+    width, height = value.lower().split('x')
+    return int(width), int(height)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Upscaler against ndimage.zoom and PIL resize')
+    parser.add_argument('--sizes', nargs='+', type=parse_size, default=[(128, 96), (320, 240), (600, 400), (1280, 960)],
+                        metavar='WIDTHxHEIGHT', help='Output sizes, frames are fitted into them keeping 4:3')
+    parser.add_argument('--frames', type=int, default=32, help='Frames upscaled one at a time')
+    parser.add_argument('--batch', type=int, default=128, help='Frames in the batch')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    frames = synthetic_frames(max(args.frames, args.batch))
+    single, batch = frames[:args.frames], frames[:args.batch]
+
+    print(f'{"output":<10} {"kernel":<9} {"zoom [ms]":>10} {"PIL [ms]":>10} {"matrix [ms]":>12} '
+          f'{"batch [ms]":>11} {"vs PIL":>9}')
+    for size in args.sizes:
+        out_shape = upscale.fit(frame_codec.MLX_SHAPE, size)
+        zoom = (out_shape[0] / frame_codec.MLX_SHAPE[0], out_shape[1] / frame_codec.MLX_SHAPE[1])
+        pil_size = (out_shape[1], out_shape[0])
+        for kernel in upscale.KERNELS:
+            upscaler = upscale.Upscaler(frame_codec.MLX_SHAPE, out_shape, kernel=kernel)
+            out = np.empty(out_shape, dtype=np.float32)
+            if kernel in ZOOM_ORDERS:
+                zoom_ms = f'{per_frame(lambda f: ndimage.zoom(f, zoom, order=ZOOM_ORDERS[kernel]), single, args.repeat):.3f}'
+            else:
+                zoom_ms = '-'
+            pil_ms = per_frame(lambda f: pil_resize(f, pil_size, PIL_FILTERS[kernel]), single, args.repeat)
+            matrix_ms = per_frame(lambda f: upscaler.apply(f, out=out), single, args.repeat)
+            batch_ms = per_frame_batch(upscaler, batch, args.repeat)
+            error = max(float(np.abs(upscaler.apply(f) - pil_resize(f, pil_size, PIL_FILTERS[kernel])).max())
+                        for f in single)
+            print(f'{out_shape[1]}x{out_shape[0]:<6} {kernel:<9} {zoom_ms:>10} {pil_ms:>10.3f} {matrix_ms:>12.3f} '
+                  f'{batch_ms:>11.3f} {error:>9.1e}')
+
+
+if __name__ == '__main__':
+    main()
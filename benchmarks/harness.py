@@ -0,0 +1,237 @@
+# End-to-end benchmark of the uploader and the viewer without hardware or
+# db-manager. An in-process local_server (with --latency added to every call)
+# stands in for the database, the uploader runs uploader.upload with
+# synthetic cameras in one child process and a headless viewer subscribes in
+# another, so each one's CPU time and peak RSS are measured on their own.
+# Every encoding and batch size combination is run for --duration seconds and
+# the results are printed as JSON, to compare between commits:
+#
+#   python3 benchmarks/harness.py --output before.json
+#   git checkout other-branch
+#   python3 benchmarks/harness.py --output after.json
+#
+# The viewer decodes and renders into FrameRenderer's image but leaves out the
+# Tk PhotoImage paste, which needs a display (see bench_render.py).
+import os
+import sys
+import json
+import time
+import signal
+import asyncio
+import argparse
+import platform
+import resource
+import itertools
+import subprocess
+
+# Import the clients' modules from the repository root
+sys.path.insert(1, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import frame_codec
+from common import image_pb2
+import local_server
+from capture_pipeline import REFRESH_RATES
+
+ENCODINGS = list(frame_codec.ENCODINGS) + ['delta']
+
+
+# A camera that replays a few precomputed synthetic frames, so generating
+# frames costs next to nothing and the uploader's own work is what is measured
+class BenchSource:
+    def __init__(self, sensor_id, refresh_rate='64', frames=64):
+        from sources import SyntheticSource
+
+        source = SyntheticSource(sensor_id, refresh_rate=refresh_rate, seed=len(sensor_id))
+        self.sensor_id = sensor_id
+        self.refresh_rate = source.refresh_rate
+        self._frames = []
+        for _ in range(frames):
+            frame = [0.0] * 768
+            source.read_frame(frame)
+            self._frames.append(frame)
+        self._next = itertools.cycle(self._frames)
+
+    def read_frame(self, frame):
+        frame[:] = next(self._next)
+
+
+# Counts what reaches the server
+class CountingServicer(local_server.LocalDBServicer):
+    def __init__(self, latency=0.0):
+        super().__init__(latency)
+        self.inserts = 0
+        self.frames = 0
+        self.request_bytes = 0
+
+    def Insert(self, request, context):
+        self.inserts += 1
+        self.frames += len(request.protobufs)
+        self.request_bytes += request.ByteSize()
+        return super().Insert(request, context)
+
+
+def usage():
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime, usage.ru_maxrss
+
+
+def child_result(started, cpu_start, **values):
+    cpu, max_rss = usage()
+    elapsed = time.monotonic() - started
+    values.update(seconds=round(elapsed, 3), cpu_seconds=round(cpu - cpu_start, 3),
+                  cpu_percent=round(100 * (cpu - cpu_start) / elapsed, 1), max_rss_kb=max_rss)
+    print(json.dumps(values), flush=True)
+
+
+def uploader(args):
+    from uploader import frame_packer, upload
+    from aio_client import AsyncDBClient
+    from metrics import Metrics
+
+    sources = [BenchSource(f'bench{i}', args.refresh_rate) for i in range(args.sensors)]
+    metrics = Metrics()
+    client = AsyncDBClient('localhost', args.port, metrics=metrics)
+    pack = frame_packer(args.encoding)
+
+    started = time.monotonic()
+    cpu_start, _ = usage()
+
+    async def run():
+        # upload() stops capturing and flushes on SIGINT, like Ctrl-C
+        asyncio.get_running_loop().call_later(args.duration, os.kill, os.getpid(), signal.SIGINT)
+        await upload(client, sources, pack=pack, batch_size=args.batch_size, batch_interval=0.05,
+                     queue_size=4096, stats_interval=3600, metrics=metrics)
+
+    asyncio.run(run())
+    insert = metrics.histograms.get('Insert')
+    child_result(started, cpu_start, frames_captured=metrics.histograms['getFrame'].count,
+                 insert_p50_ms=round(float(insert.quantiles()[0]) * 1000, 2) if insert else None)
+
+
+def viewer(args):
+    from aio_client import AsyncDBClient
+    from delta_codec import DeltaDecoder
+    from frame_renderer import FrameRenderer
+    from metrics import Metrics
+
+    decoder = DeltaDecoder()
+    renderer = FrameRenderer(size=(600, 400))
+    metrics = Metrics()
+    shown = 0
+
+    started = time.monotonic()
+    cpu_start, _ = usage()
+
+    # what training_client.show_frames does for every streamed row
+    async def run():
+        nonlocal shown
+        async with AsyncDBClient('localhost', args.port) as client:
+            async for response in client.subscribe('imagekeyspace', 'imagedata'):
+                for serialized_image in response.protobufs:
+                    image_data = image_pb2.ImageData.FromString(serialized_image)
+                    if decoder.decode(image_data, out=renderer.frame) is None:
+                        continue
+                    renderer.render()
+                    metrics.observe('glass_to_glass', time.time() - image_data.identifier)
+                    shown += 1
+
+    try:
+        asyncio.run(asyncio.wait_for(run(), args.duration))
+    except asyncio.TimeoutError:
+        pass
+
+    glass = metrics.histograms.get('glass_to_glass')
+    quantiles = glass.quantiles() * 1000 if glass else [None] * 3
+    child_result(started, cpu_start, frames_shown=shown, missed_deltas=decoder.missed,
+                 glass_to_glass_p50_ms=round(float(quantiles[0]), 2) if glass else None,
+                 glass_to_glass_p99_ms=round(float(quantiles[2]), 2) if glass else None)
+
+
+def run_child(role, args, encoding, batch_size, duration):
+    command = [sys.executable, os.path.abspath(__file__), '--child', role, '--port', str(args.port),
+               '--encoding', encoding, '--batch-size', str(batch_size), '--duration', str(duration),
+               '--sensors', str(args.sensors), '--refresh-rate', args.refresh_rate]
+    return subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+
+
+def child_output(process):
+    stdout, _ = process.communicate()
+    lines = stdout.strip().splitlines()
+    if process.returncode != 0 or not lines:
+        return {'error': f'exit code {process.returncode}'}
+    return json.loads(lines[-1])
+
+
+def run_case(args, encoding, batch_size):
+    servicer = CountingServicer(latency=args.latency / 1000)
+    server, _ = local_server.serve(args.port, servicer=servicer)
+    try:
+        # the viewer subscribes before frames arrive and keeps going until the
+        # uploader's last batch is through
+        viewing = run_child('viewer', args, encoding, batch_size, args.duration + 3.0)
+        time.sleep(1.0)
+        uploading = run_child('uploader', args, encoding, batch_size, args.duration)
+        upload = child_output(uploading)
+        view = child_output(viewing)
+    finally:
+        server.stop(None)
+
+    seconds = upload.get('seconds') or args.duration
+    upload.update(frames_per_second=round(servicer.frames / seconds, 1),
+                  bytes_per_frame=round(servicer.request_bytes / max(servicer.frames, 1), 1),
+                  inserts=servicer.inserts)
+    view['frames_per_second'] = round(view.get('frames_shown', 0) / seconds, 1)
+    return {'encoding': encoding, 'batch_size': batch_size, 'uploader': upload, 'viewer': view}
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Uploader and viewer benchmark against an in-process fake server')
+    parser.add_argument('--port', type=int, default=50095)
+    parser.add_argument('--encodings', nargs='+', choices=ENCODINGS, default=ENCODINGS)
+    parser.add_argument('--batch-sizes', nargs='+', type=int, default=[1, 8, 32])
+    parser.add_argument('--duration', type=float, default=5.0, help='Seconds of uploading per case')
+    parser.add_argument('--latency', type=float, default=0.0, help='Milliseconds the fake server adds to every call')
+    parser.add_argument('--sensors', type=int, default=4, help='Synthetic cameras in the uploader')
+    parser.add_argument('--refresh-rate', choices=list(REFRESH_RATES), default='64', help='Camera refresh rate in Hz')
+    parser.add_argument('--output', help='Write the JSON here instead of stdout')
+    parser.add_argument('--child', choices=['uploader', 'viewer'], help=argparse.SUPPRESS)
+    parser.add_argument('--encoding', choices=ENCODINGS, default='float32', help=argparse.SUPPRESS)
+    parser.add_argument('--batch-size', type=int, default=8, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child == 'uploader':
+        return uploader(args)
+    if args.child == 'viewer':
+        return viewer(args)
+
+    results = []
+    for encoding, batch_size in itertools.product(args.encodings, args.batch_sizes):
+        print(f'{encoding} batch {batch_size}...', file=sys.stderr)
+        results.append(run_case(args, encoding, batch_size))
+
+    report = {
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'settings': {'duration': args.duration, 'latency_ms': args.latency, 'sensors': args.sensors,
+                     'refresh_rate': args.refresh_rate},
+        'results': results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as file:
+            file.write(text + '\n')
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    main()
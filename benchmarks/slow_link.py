@@ -0,0 +1,118 @@
+# A TCP proxy that behaves like a slow network link: every direction carries
+# at most bandwidth bytes a second and delivers them latency seconds late.
+# Point a client at the proxy's port instead of the server's:
+#
+#   python3 local_server.py --port 50051
+#   python3 benchmarks/slow_link.py --listen 50052 --target 50051 --mbit 2 --latency 100
+#   python3 training_client.py --port 50052
+import asyncio
+import argparse
+import threading
+
+CHUNK = 16 << 10
+
+
+# Copies reader to writer at bandwidth bytes a second, latency seconds late.
+# Reading is paced to the bandwidth, so TCP flow control pushes back on the
+# sender like a full link would. sent[0] counts the bytes carried.
+async def pipe(reader, writer, bandwidth, latency, sent):
+    loop = asyncio.get_running_loop()
+    in_flight = asyncio.Queue()
+
+    async def deliver():
+        while (item := await in_flight.get()) is not None:
+            due, data = item
+            await asyncio.sleep(max(0.0, due - loop.time()))
+            writer.write(data)
+            await writer.drain()
+
+    delivery = asyncio.create_task(deliver())
+    link_free = loop.time()
+    try:
+        while data := await reader.read(CHUNK):
+            # the link is busy until the last byte of data is on it
+            link_free = max(link_free, loop.time()) + len(data) / bandwidth
+            await asyncio.sleep(max(0.0, link_free - loop.time()))
+            in_flight.put_nowait((loop.time() + latency, data))
+            sent[0] += len(data)
+        in_flight.put_nowait(None)
+        await delivery
+    except (ConnectionError, asyncio.CancelledError):
+        delivery.cancel()
+        raise
+    finally:
+        writer.close()
+
+
+# The proxy on its own thread and event loop, so it can run next to a
+# blocking benchmark. bytes_up and bytes_down count what went to and came
+# from the target.
+class SlowLink:
+    def __init__(self, listen_port, target_port, bandwidth=250e3, latency=0.05, target_host='localhost'):
+        self.listen_port = listen_port
+        self.target = (target_host, target_port)
+        self.bandwidth = bandwidth
+        self.latency = latency
+        self._up = [0]
+        self._down = [0]
+        self._loop = asyncio.new_event_loop()
+        self._started = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='slow-link', daemon=True)
+
+    @property
+    def bytes_up(self):
+        return self._up[0]
+
+    @property
+    def bytes_down(self):
+        return self._down[0]
+
+    def reset(self):
+        self._up[0] = self._down[0] = 0
+
+    async def _connect(self, client_reader, client_writer):
+        try:
+            server_reader, server_writer = await asyncio.open_connection(*self.target)
+        except ConnectionError:
+            client_writer.close()
+            return
+        await asyncio.gather(pipe(client_reader, server_writer, self.bandwidth, self.latency, self._up),
+                             pipe(server_reader, client_writer, self.bandwidth, self.latency, self._down),
+                             return_exceptions=True)
+
+    def _run(self):
+        asyncio.set_event_loop(self._loop)
+        server = self._loop.run_until_complete(asyncio.start_server(self._connect, 'localhost', self.listen_port))
+        self._started.set()
+        try:
+            self._loop.run_forever()
+        finally:
+            server.close()
+
+    def start(self):
+        self._thread.start()
+        self._started.wait()
+        return self
+
+    def stop(self):
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='TCP proxy that simulates a slow network link')
+    parser.add_argument('--listen', type=int, default=50052, help='Port the clients connect to')
+    parser.add_argument('--target', type=int, default=50051, help='Port of the server')
+    parser.add_argument('--target-host', default='localhost')
+    parser.add_argument('--mbit', type=float, default=2.0, help='Bandwidth of each direction in Mbit/s')
+    parser.add_argument('--latency', type=float, default=50.0, help='One-way delay in milliseconds')
+    args = parser.parse_args()
+
+    link = SlowLink(args.listen, args.target, bandwidth=args.mbit * 1e6 / 8, latency=args.latency / 1000,
+                    target_host=args.target_host).start()
+    print(f'localhost:{args.listen} -> {args.target_host}:{args.target} at {args.mbit:g} Mbit/s, '
+          f'{args.latency:g} ms')
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        link.stop()
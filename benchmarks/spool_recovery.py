@@ -0,0 +1,124 @@
+# Crash-recovery check for the --spool store-and-forward path. Runs the
+# uploader three times against one spool file, each run as its own process
+# with a synthetic camera named after the run:
+#
+#   run1  the server is down, frames pile up in the spool, then kill -9
+#   run2  the server is up, the backlog goes out in bulk, kill -9 mid-stream
+#   run3  normal run, stopped with SIGINT
+#
+# Every run uses delta encoding, whose per-camera sequence numbers must arrive
+# without gaps, so a frame lost after it reached the spool shows up as a hole.
+# Frames a run captured but had not spooled yet when it was killed are the
+# only ones allowed to go missing.
+#
+#   python3 benchmarks/spool_recovery.py
+import os
+import sys
+import time
+import signal
+import asyncio
+import argparse
+import tempfile
+import subprocess
+
+# Import the clients' modules from the repository root
+sys.path.insert(1, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from common import image_pb2
+from common import generic_pb2
+import local_server
+from spool import Spool
+
+
+# The uploader in a child process, the way image_client.py --spool runs it
+def child(spool_path, port, sensor_id):
+    import uploader
+    from aio_client import AsyncDBClient
+    from sources import SyntheticSource
+
+    sources = [SyntheticSource(sensor_id, refresh_rate='16')]
+    client = AsyncDBClient('localhost', port, timeout=2.0, retries=2, backoff=0.2, max_backoff=0.5)
+    asyncio.run(uploader.upload(client, sources, pack=uploader.frame_packer('delta'), batch_size=4,
+                                batch_interval=0.25, spool=spool_path, spool_size=1, stats_interval=1.0))
+
+
+# Counts the resent frames the server turned away
+class CountingServicer(local_server.LocalDBServicer):
+    def __init__(self):
+        super().__init__()
+        self.duplicates = 0
+
+    def Insert(self, request, context):
+        response = super().Insert(request, context)
+        if response.status == generic_pb2.DUPLICATE_ENTRY:
+            self.duplicates += len(response.errs)
+        return response
+
+
+def start_child(spool_path, port, sensor_id, log):
+    return subprocess.Popen([sys.executable, os.path.abspath(__file__), '--child', spool_path, str(port), sensor_id],
+                            stdout=log, stderr=log)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Spool crash-recovery check')
+    parser.add_argument('--port', type=int, default=50099)
+    parser.add_argument('--child', nargs=3, metavar=('SPOOL', 'PORT', 'SENSOR'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        spool_path, port, sensor_id = args.child
+        child(spool_path, int(port), sensor_id)
+        return
+
+    workdir = tempfile.mkdtemp()
+    spool_path = os.path.join(workdir, 'frames.spool')
+    log = open(os.path.join(workdir, 'uploader.log'), 'w')
+
+    print('run1: server down, killed after 3s')
+    run1 = start_child(spool_path, args.port, 'run1', log)
+    time.sleep(3)
+    run1.kill()
+    run1.wait()
+    spool = Spool(spool_path, size=1 << 20)
+    print(f'      {spool.backlog} bytes spooled')
+    spool.release()
+
+    server, servicer = local_server.serve(args.port, servicer=CountingServicer())
+
+    print('run2: server up, killed after 1.5s')
+    run2 = start_child(spool_path, args.port, 'run2', log)
+    time.sleep(1.5)
+    run2.kill()
+    run2.wait()
+
+    print('run3: stopped with SIGINT after 2s')
+    run3 = start_child(spool_path, args.port, 'run3', log)
+    time.sleep(2)
+    run3.send_signal(signal.SIGINT)
+    run3.wait(timeout=10)
+    server.stop(None)
+
+    spool = Spool(spool_path, size=1 << 20)
+    print(f'spool left: {spool.backlog} bytes, frames dropped for room: {spool.dropped}')
+    spool.release()
+
+    sequences = {}
+    for row in servicer._table('imagekeyspace', 'imagedata').rows:
+        image_data = image_pb2.ImageData.FromString(row)
+        sequences.setdefault(image_data.sensor_id, []).append(image_data.sequence)
+
+    ok = True
+    for sensor_id in ('run1', 'run2', 'run3'):
+        stored = sorted(sequences.get(sensor_id, []))
+        missing = sorted(set(range(stored[-1] + 1)) - set(stored)) if stored else []
+        ok = ok and stored and not missing
+        print(f'{sensor_id}: {len(stored)} frames stored, {len(missing)} missing {missing[:10]}')
+    print(f'resent frames the server already had: {servicer.duplicates}')
+    print('OK' if ok else 'FAILED')
+    print(f'uploader log: {log.name}')
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
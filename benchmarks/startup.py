@@ -0,0 +1,160 @@
+# Startup time of every image_client.py action, each measured in fresh
+# processes against a time budget, and the modules each action must not
+# import. An in-process local_server stands in for the database:
+#
+#   help       python3 image_client.py --help, until it exits
+#   deleteall  until the DropTable call returned and the process exited
+#   run        with one synthetic camera, until its first Insert reaches the server
+#
+# The budgets are for a desktop machine, scale them for slower ones. Exits with
+# status 1 when an action is over its budget, imports a module it shouldn't or
+# the command line choices in image_client.py no longer match the modules.
+#
+#   python3 benchmarks/startup.py
+#   python3 benchmarks/startup.py --scale 8   # on a Raspberry Pi
+import os
+import sys
+import time
+import signal
+import argparse
+import statistics
+import threading
+import subprocess
+
+# Import the clients' modules from the repository root
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(1, ROOT)
+
+import local_server
+
+IMAGE_CLIENT = os.path.join(ROOT, 'image_client.py')
+HARDWARE = ('board', 'busio', 'adafruit_mlx90640', 'adafruit_extended_bus')
+
+# action: (budget in seconds, modules it must not import)
+ACTIONS = {
+    'help': (0.3, ('numpy', 'grpc', 'google.protobuf', 'PIL') + HARDWARE),
+    'deleteall': (0.8, ('numpy', 'PIL', 'zstandard') + HARDWARE),
+    'run': (2.0, ('PIL',) + HARDWARE),
+}
+
+
+# Notes when the first Insert arrives
+class FirstInsertServicer(local_server.LocalDBServicer):
+    def __init__(self):
+        super().__init__()
+        self.inserted = threading.Event()
+
+    def Insert(self, request, context):
+        self.inserted.set()
+        return super().Insert(request, context)
+
+
+def command(action, port, importtime=False):
+    python = [sys.executable] + (['-X', 'importtime'] if importtime else [])
+    if action == 'help':
+        return python + [IMAGE_CLIENT, '--help']
+    if action == 'deleteall':
+        return python + [IMAGE_CLIENT, '--port', str(port), '--action', 'deleteall']
+    return python + [IMAGE_CLIENT, '--port', str(port), '--action', 'run', '--synthetic', '1',
+                     '--refresh-rate', '64', '--batch-size', '1', '--stats-interval', '3600']
+
+
+# Runs action once, returns (seconds, stderr)
+def start_once(action, port, servicer, importtime=False):
+    servicer.inserted.clear()
+    started = time.perf_counter()
+    process = subprocess.Popen(command(action, port, importtime), cwd=ROOT, stdout=subprocess.DEVNULL,
+                               stderr=subprocess.PIPE, text=True)
+    if action == 'run':
+        # stderr is read on a thread, -X importtime writes more than a pipe holds
+        output = []
+        reader = threading.Thread(target=lambda: output.append(process.stderr.read()))
+        reader.start()
+        if not servicer.inserted.wait(30):
+            process.kill()
+            raise RuntimeError('run: no Insert within 30s')
+        elapsed = time.perf_counter() - started
+        process.send_signal(signal.SIGINT)
+        process.wait(timeout=10)
+        reader.join()
+        return elapsed, output[0]
+
+    _, stderr = process.communicate(timeout=30)
+    elapsed = time.perf_counter() - started
+    if process.returncode != 0:
+        raise RuntimeError(f'{action} exited with {process.returncode}: {stderr.strip()}')
+    return elapsed, stderr
+
+
+# Names of the modules in -X importtime output
+def imported_modules(stderr):
+    modules = set()
+    for line in stderr.splitlines():
+        if line.startswith('import time:') and not line.endswith('| imported package'):
+            modules.add(line.rsplit('|', 1)[1].strip())
+    return modules
+
+
+def forbidden_imports(modules, forbidden):
+    return sorted(name for name in modules if any(name == f or name.startswith(f + '.') for f in forbidden))
+
+
+def timed(command):
+    started = time.perf_counter()
+    subprocess.run(command, check=True)
+    return time.perf_counter() - started
+
+
+# The choices image_client.py lists without importing the modules they come from
+def check_choices():
+    import image_client
+    import frame_codec
+    import delta_codec
+    import sources
+
+    expected = {
+        'ENCODING_CHOICES': tuple(frame_codec.ENCODINGS) + ('delta',),
+        'COMPRESSION_CHOICES': tuple(delta_codec.COMPRESSIONS),
+        'SYNTHETIC_MODE_CHOICES': tuple(sources.SYNTHETIC_MODES),
+    }
+    return [f'image_client.{name} is {getattr(image_client, name)}, expected {choices}'
+            for name, choices in expected.items() if tuple(getattr(image_client, name)) != choices]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Startup time budget check for image_client.py')
+    parser.add_argument('--port', type=int, default=50097)
+    parser.add_argument('--repeat', type=int, default=5, help='Runs of each action, the median is compared')
+    parser.add_argument('--scale', type=float, default=1.0, help='Multiply every budget by this')
+    parser.add_argument('--actions', nargs='+', choices=list(ACTIONS), default=list(ACTIONS))
+    args = parser.parse_args()
+
+    servicer = FirstInsertServicer()
+    server, _ = local_server.serve(args.port, servicer=servicer)
+    failures = check_choices()
+    try:
+        interpreter = statistics.median(timed([sys.executable, '-c', 'pass']) for _ in range(args.repeat))
+        print(f'{"python -c pass":<10} {interpreter * 1000:7.0f} ms')
+
+        for action in args.actions:
+            budget, forbidden = ACTIONS[action]
+            budget *= args.scale
+            _, stderr = start_once(action, args.port, servicer, importtime=True)
+            imports = forbidden_imports(imported_modules(stderr), forbidden)
+            median = statistics.median(start_once(action, args.port, servicer)[0] for _ in range(args.repeat))
+
+            ok = median <= budget and not imports
+            print(f'{action:<10} {median * 1000:7.0f} ms  budget {budget * 1000:5.0f} ms  '
+                  f'{"ok" if ok else "FAILED"}' + (f'  imports {", ".join(imports)}' if imports else ''))
+            if not ok:
+                failures.append(f'{action}: {median * 1000:.0f} ms' + (f', imports {imports}' if imports else ''))
+    finally:
+        server.stop(None)
+
+    for failure in failures:
+        print(failure)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
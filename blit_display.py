@@ -0,0 +1,76 @@
+import time
+
+
+# Redraws only the thermal image with matplotlib blitting. The saved background
+# (axes, colorbar, title) is restored and the image drawn over it, a full
+# figure redraw only happens when the temperature range moved more than
+# hysteresis degrees from the one the colorbar shows.
+class BlitRenderer:
+    def __init__(self, fig, ax, image, cbar, hysteresis=0.5):
+        self.fig = fig
+        self.ax = ax
+        self.image = image
+        self.cbar = cbar
+        self.hysteresis = hysteresis
+        self.full_redraws = 0
+        self._clim = None
+        self._background = None
+        image.set_animated(True)
+
+    def draw(self, data, min_temp, max_temp):
+        self.image.set_data(data)
+
+        if (self._clim is None
+                or abs(min_temp - self._clim[0]) > self.hysteresis
+                or abs(max_temp - self._clim[1]) > self.hysteresis):
+            self._set_range(min_temp, max_temp)
+
+        canvas = self.fig.canvas
+        canvas.restore_region(self._background)
+        self.ax.draw_artist(self.image)
+        canvas.blit(self.ax.bbox)
+        canvas.flush_events()
+
+    def _set_range(self, min_temp, max_temp):
+        self._clim = (min_temp, max_temp)
+        self.image.set_clim(vmin=min_temp, vmax=max_temp)  # set bounds
+        self.cbar.set_ticks([min_temp, (min_temp + max_temp) / 2, max_temp])
+        self.cbar.set_ticklabels(['{:.1f}'.format(min_temp), '{:.1f}'.format((min_temp + max_temp) / 2), '{:.1f}'.format(max_temp)])
+
+        # the animated image is left out of a full draw, grab the background without it
+        self.fig.canvas.draw()
+        self._background = self.fig.canvas.copy_from_bbox(self.fig.bbox)
+        self.full_redraws += 1
+
+
+# Accumulates the time spent in each stage of the display loop and prints the
+# achieved frame rate with the average ms per stage every report_every seconds
+class StageTimer:
+    def __init__(self, report_every=5.0):
+        self.report_every = report_every
+        self._totals = {}
+        self._frames = 0
+        self._last = time.perf_counter()
+        self._window_start = self._last
+
+    # Start timing a frame, e.g. before reading the sensor
+    def start(self):
+        self._last = time.perf_counter()
+
+    # The stage called name just finished
+    def mark(self, name):
+        now = time.perf_counter()
+        self._totals[name] = self._totals.get(name, 0.0) + now - self._last
+        self._last = now
+
+    def frame_done(self):
+        self._frames += 1
+        elapsed = self._last - self._window_start
+        if elapsed < self.report_every:
+            return
+
+        stages = ' '.join(f'{name} {total / self._frames * 1000:.1f}ms' for name, total in self._totals.items())
+        print(f'{self._frames / elapsed:.1f} fps | {stages}')
+        self._totals = {}
+        self._frames = 0
+        self._window_start = self._last
@@ -0,0 +1,152 @@
+import collections
+import threading
+import time
+
+# What FrameRing.put does when the ring is full
+OVERFLOW_POLICIES = ('drop-oldest', 'drop-newest', 'block')
+
+# adafruit_mlx90640.RefreshRate values by their rate in Hz
+REFRESH_RATES = {'0.5': 0, '1': 1, '2': 2, '4': 3, '8': 4, '16': 5, '32': 6, '64': 7}
+
+
+# The sensor refresh rate is per subpage, a full frame needs two of them
+def frame_period(refresh_rate):
+    return 2 / (0.5 * 2 ** refresh_rate)
+
+
+# Bounded buffer between the capture thread and the sender workers. Items are
+# kept with the time they were put, so batches are timed from their oldest item.
+class FrameRing:
+    def __init__(self, capacity=256, policy='drop-oldest'):
+        if capacity < 1:
+            raise ValueError('capacity must be at least 1')
+        if policy not in OVERFLOW_POLICIES:
+            raise ValueError(f'Unknown overflow policy: {policy}')
+        self.capacity = capacity
+        self.policy = policy
+        self.dropped = 0
+        self._items = collections.deque()
+        self._closed = False
+        self._cond = threading.Condition()
+
+    def __len__(self):
+        return len(self._items)
+
+    # Returns False if the item (or the oldest queued one) was dropped
+    def put(self, item):
+        with self._cond:
+            if self._closed:
+                raise RuntimeError('put() on a closed FrameRing')
+
+            kept = True
+            if len(self._items) >= self.capacity:
+                if self.policy == 'drop-newest':
+                    self.dropped += 1
+                    return False
+                if self.policy == 'drop-oldest':
+                    self._items.popleft()
+                    self.dropped += 1
+                    kept = False
+                else:
+                    while len(self._items) >= self.capacity and not self._closed:
+                        self._cond.wait()
+
+            self._items.append((time.monotonic(), item))
+            self._cond.notify_all()
+            return kept
+
+    # Waits for at least one item, then keeps collecting until max_items are
+    # taken or the oldest queued item was put max_wait seconds ago, which an
+    # item that waited while the sender was busy may already have been.
+    # Returns an empty list once the ring is closed and drained.
+    def get_batch(self, max_items, max_wait):
+        with self._cond:
+            while True:
+                while not self._items and not self._closed:
+                    self._cond.wait()
+                if not self._items or len(self._items) >= max_items or self._closed:
+                    break
+                # another worker may have taken the oldest while this one waited
+                remaining = self._items[0][0] + max_wait - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+
+            batch = [self._items.popleft()[1] for _ in range(min(max_items, len(self._items)))]
+            self._cond.notify_all()
+            return batch
+
+    # Wakes every waiter, queued items can still be drained with get_batch
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+
+# Reads frames on its own thread and hands (identifier, sensor_id, frame) tuples
+# to submit, normally the put of a ring drained by sender workers, so a slow
+# Insert never holds up the sensor. The identifier is the capture time, taken
+# as soon as getFrame returns, which lets viewers work out glass-to-glass latency.
+class CaptureWorker:
+    def __init__(self, read_frame, submit, period=0.0, frame_size=768, sensor_id='', metrics=None):
+        self.read_frame = read_frame
+        self.submit = submit
+        self.period = period
+        self.frame_size = frame_size
+        self.sensor_id = sensor_id
+        self.metrics = metrics
+        self.captured = 0
+        self.read_errors = 0
+        self.error = None
+        self._calls = collections.deque()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f'capture-{sensor_id}', daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self, wait=True):
+        self._stop.set()
+        if wait:
+            self._thread.join()
+
+    # Runs fn on the capture thread before the next read, for changes such as
+    # a new refresh rate that must not happen in the middle of one
+    def call_soon(self, fn):
+        self._calls.append(fn)
+
+    def is_alive(self):
+        return self._thread.is_alive()
+
+    def _run(self):
+        next_frame = time.monotonic()
+        while not self._stop.is_set():
+            while self._calls:
+                self._calls.popleft()()
+            frame = [0] * self.frame_size
+            start = time.perf_counter()
+            try:
+                self.read_frame(frame)
+            except ValueError:
+                # these happen, no biggie - retry
+                self.read_errors += 1
+                if self.metrics is not None:
+                    self.metrics.count('read_errors')
+                continue
+            captured_at = time.time()
+            if self.metrics is not None:
+                self.metrics.since('getFrame', start)
+
+            self.captured += 1
+            try:
+                self.submit((captured_at, self.sensor_id, frame))
+            except Exception as e:
+                # the senders gave up, stop capturing and let the caller see why
+                if not self._stop.is_set():
+                    self.error = e
+                return
+
+            # getFrame already waits on the sensor, only sleep off what is left of the period
+            next_frame = max(next_frame + self.period, time.monotonic())
+            self._stop.wait(next_frame - time.monotonic())
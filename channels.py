@@ -0,0 +1,123 @@
+import itertools
+
+# --grpc-compression choices and the grpc.Compression member of each
+COMPRESSIONS = {
+    'none': 'NoCompression',
+    'gzip': 'Gzip',
+    'deflate': 'Deflate',
+}
+
+DEFAULT_MAX_MESSAGE_BYTES = 64 << 20
+
+
+# Makes the grpc.aio channels of every client with the same tuning, in place of
+# a bare grpc.aio.insecure_channel(target) with gRPC's defaults:
+#
+#   keepalive          seconds between HTTP/2 pings while calls are open, so a
+#                      dead link under a Subscribe stream is noticed within
+#                      keepalive + keepalive_timeout (0 turns them off). Servers
+#                      refuse pings more often than every 5 minutes unless
+#                      configured to allow them, local_server allows every 10s.
+#   max_message_bytes  largest message sent or received. gRPC only receives
+#                      4 MiB by default, which a Select of many rows goes past.
+#   compression        'gzip' or 'deflate' compresses the requests, either a
+#                      name for every call or a dict by RPC name, e.g.
+#                      {'Insert': 'gzip'}. Text frames shrink several times,
+#                      the binary encodings hardly at all.
+#   reconnect_backoff  (first, longest) seconds between attempts to reconnect
+#   connections        with more than one, calls are spread round robin over
+#                      this many channels, each with its own TCP connection.
+#                      Otherwise all channels of the process to the same target
+#                      with the same settings share one connection.
+#
+# gRPC is only imported once a channel is made, so command lines can add the
+# flags without loading it.
+class ChannelFactory:
+    def __init__(self, keepalive=300.0, keepalive_timeout=20.0, max_message_bytes=DEFAULT_MAX_MESSAGE_BYTES,
+                 compression='none', reconnect_backoff=(1.0, 30.0), connections=1):
+        if connections < 1:
+            raise ValueError('connections must be at least 1')
+        names = compression.values() if isinstance(compression, dict) else [compression]
+        unknown = [name for name in names if name not in COMPRESSIONS]
+        if unknown:
+            raise ValueError(f'unknown compression {unknown}, expected one of {list(COMPRESSIONS)}')
+        self.keepalive = keepalive
+        self.keepalive_timeout = keepalive_timeout
+        self.max_message_bytes = max_message_bytes
+        self.compression = compression
+        self.reconnect_backoff = reconnect_backoff
+        self.connections = connections
+
+    # Channel arguments, settings that are 0 or None keep gRPC's default
+    def options(self):
+        options = []
+        if self.max_message_bytes:
+            options += [('grpc.max_send_message_length', self.max_message_bytes),
+                        ('grpc.max_receive_message_length', self.max_message_bytes)]
+        if self.keepalive:
+            options += [('grpc.keepalive_time_ms', int(self.keepalive * 1000)),
+                        ('grpc.keepalive_timeout_ms', int(self.keepalive_timeout * 1000)),
+                        # keep pinging under a quiet Subscribe stream
+                        ('grpc.http2.max_pings_without_data', 0)]
+        if self.reconnect_backoff:
+            first, longest = self.reconnect_backoff
+            options += [('grpc.initial_reconnect_backoff_ms', int(first * 1000)),
+                        ('grpc.min_reconnect_backoff_ms', int(first * 1000)),
+                        ('grpc.max_reconnect_backoff_ms', int(longest * 1000))]
+        if self.connections > 1:
+            # a subchannel pool of its own gives every channel its own connection
+            options.append(('grpc.use_local_subchannel_pool', 1))
+        return options
+
+    # The compression argument for calls of the RPC name
+    def call_compression(self, name):
+        import grpc
+
+        if isinstance(self.compression, dict):
+            compression = self.compression.get(name, 'none')
+        else:
+            compression = self.compression
+        return getattr(grpc.Compression, COMPRESSIONS[compression])
+
+    # A list of connections grpc.aio channels to target
+    def open(self, target):
+        import grpc
+
+        options = self.options()
+        return [grpc.aio.insecure_channel(target, options=options) for _ in range(self.connections)]
+
+
+# Round robin over the stubs made for each of channels
+def stub_cycle(stub_class, channels):
+    return itertools.cycle([stub_class(channel) for channel in channels])
+
+
+# Options for grpc.server that take messages of max_message_bytes and let
+# clients ping every min_ping_interval seconds, even between calls
+def server_options(max_message_bytes=DEFAULT_MAX_MESSAGE_BYTES, min_ping_interval=10.0):
+    return [
+        ('grpc.max_send_message_length', max_message_bytes),
+        ('grpc.max_receive_message_length', max_message_bytes),
+        ('grpc.keepalive_permit_without_calls', 1),
+        ('grpc.http2.min_recv_ping_interval_without_data_ms', int(min_ping_interval * 1000)),
+        ('grpc.http2.max_ping_strikes', 0),
+    ]
+
+
+# The channel flags every client's command line takes
+def add_arguments(parser):
+    parser.add_argument('--keepalive', type=float, default=300.0,
+                        help='Seconds between keepalive pings on open calls, 0 turns them off')
+    parser.add_argument('--keepalive-timeout', type=float, default=20.0,
+                        help='Seconds without a ping ack before the connection is given up')
+    parser.add_argument('--grpc-compression', choices=list(COMPRESSIONS), default='none',
+                        help='Compress requests, gzip shrinks text frames several times')
+    parser.add_argument('--max-message-mb', type=int, default=DEFAULT_MAX_MESSAGE_BYTES >> 20,
+                        help='Largest message sent or received in MiB (gRPC receives 4 MiB by default)')
+    parser.add_argument('--connections', type=int, default=1, help='TCP connections to spread the calls over')
+
+
+def from_arguments(args):
+    return ChannelFactory(keepalive=args.keepalive, keepalive_timeout=args.keepalive_timeout,
+                          max_message_bytes=args.max_message_mb << 20, compression=args.grpc_compression,
+                          connections=args.connections)
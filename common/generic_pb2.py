@@ -1,6 +1,6 @@
 # -*- coding: utf-8 -*-
 # Generated by the protocol buffer compiler.  DO NOT EDIT!
-# source: generic.proto
+# source: common/generic.proto
 # Protobuf Python Version: 4.25.1
 """Generated protocol buffer code."""
 from google.protobuf import descriptor as _descriptor
@@ -15,28 +15,40 @@ _sym_db = _symbol_database.Default()
 from google.protobuf import any_pb2 as google_dot_protobuf_dot_any__pb2
 
 
-DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\rgeneric.proto\x1a\x19google/protobuf/any.proto\"T\n\x17protobuf_insert_request\x12\x10\n\x08keyspace\x18\x01 \x01(\t\x12\'\n\tprotobufs\x18\x02 \x03(\x0b\x32\x14.google.protobuf.Any\"^\n\x17protobuf_select_request\x12\x10\n\x08keyspace\x18\x01 \x01(\t\x12\r\n\x05table\x18\x02 \x01(\t\x12\x0e\n\x06\x63olumn\x18\x03 \x01(\t\x12\x12\n\nconstraint\x18\x04 \x01(\t\"q\n\x17protobuf_update_request\x12\x10\n\x08keyspace\x18\x01 \x01(\t\x12\r\n\x05table\x18\x02 \x01(\t\x12\x0e\n\x06\x63olumn\x18\x03 \x01(\t\x12\x12\n\nconstraint\x18\x04 \x01(\t\x12\x11\n\tnew_value\x18\x05 \x01(\t\"^\n\x17protobuf_delete_request\x12\x10\n\x08keyspace\x18\x01 \x01(\t\x12\r\n\x05table\x18\x02 \x01(\t\x12\x0e\n\x06\x63olumn\x18\x03 \x01(\t\x12\x12\n\nconstraint\x18\x04 \x01(\t\"=\n\x1aprotobuf_droptable_request\x12\x10\n\x08keyspace\x18\x01 \x01(\t\x12\r\n\x05table\x18\x02 \x01(\t\"\'\n\x17protobuf_error_response\x12\x0c\n\x04\x65rrs\x18\x01 \x03(\t\"?\n\x18protobuf_select_response\x12\x10\n\x08response\x18\x01 \x01(\t\x12\x11\n\tprotobufs\x18\x02 \x03(\x0c\x32\xc8\x02\n\tDBGeneric\x12<\n\x06Insert\x12\x18.protobuf_insert_request\x1a\x18.protobuf_error_response\x12=\n\x06Select\x12\x18.protobuf_select_request\x1a\x19.protobuf_select_response\x12<\n\x06Update\x12\x18.protobuf_update_request\x1a\x18.protobuf_error_response\x12<\n\x06\x44\x65lete\x12\x18.protobuf_delete_request\x1a\x18.protobuf_error_response\x12\x42\n\tDropTable\x12\x1b.protobuf_droptable_request\x1a\x18.protobuf_error_responseB\x0bZ\t../commonb\x06proto3')
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x14\x63ommon/generic.proto\x1a\x19google/protobuf/any.proto\"T\n\x17protobuf_insert_request\x12\x10\n\x08keyspace\x18\x01 \x01(\t\x12\'\n\tprotobufs\x18\x02 \x03(\x0b\x32\x14.google.protobuf.Any\"\xa8\x01\n\x17protobuf_select_request\x12\x10\n\x08keyspace\x18\x01 \x01(\t\x12\r\n\x05table\x18\x02 \x01(\t\x12\x0e\n\x06\x63olumn\x18\x03 \x01(\t\x12\x12\n\nconstraint\x18\x04 \x01(\t\x12\x13\n\x0brange_start\x18\x05 \x01(\x01\x12\x11\n\trange_end\x18\x06 \x01(\x01\x12\r\n\x05limit\x18\x07 \x01(\r\x12\x11\n\tmax_bytes\x18\x08 \x01(\x04\"q\n\x17protobuf_update_request\x12\x10\n\x08keyspace\x18\x01 \x01(\t\x12\r\n\x05table\x18\x02 \x01(\t\x12\x0e\n\x06\x63olumn\x18\x03 \x01(\t\x12\x12\n\nconstraint\x18\x04 \x01(\t\x12\x11\n\tnew_value\x18\x05 \x01(\t\"^\n\x17protobuf_delete_request\x12\x10\n\x08keyspace\x18\x01 \x01(\t\x12\r\n\x05table\x18\x02 \x01(\t\x12\x0e\n\x06\x63olumn\x18\x03 \x01(\t\x12\x12\n\nconstraint\x18\x04 \x01(\t\"=\n\x1aprotobuf_droptable_request\x12\x10\n\x08keyspace\x18\x01 \x01(\t\x12\r\n\x05table\x18\x02 \x01(\t\"W\n\x1aprotobuf_subscribe_request\x12\x10\n\x08keyspace\x18\x01 \x01(\t\x12\r\n\x05table\x18\x02 \x01(\t\x12\x18\n\x10since_identifier\x18\x03 \x01(\x01\"\xf1\x01\n\x1aprotobuf_aggregate_request\x12\x10\n\x08keyspace\x18\x01 \x01(\t\x12\r\n\x05table\x18\x02 \x01(\t\x12\x13\n\x0brange_start\x18\x03 \x01(\x01\x12\x11\n\trange_end\x18\x04 \x01(\x01\x12\x16\n\x0e\x62ucket_seconds\x18\x05 \x01(\x01\x12\x1a\n\x08reducers\x18\x06 \x03(\x0e\x32\x08.Reducer\x12\x11\n\tsensor_id\x18\x07 \x01(\t\x12\r\n\x05roi_x\x18\x08 \x01(\r\x12\r\n\x05roi_y\x18\t \x01(\r\x12\x11\n\troi_width\x18\n \x01(\r\x12\x12\n\nroi_height\x18\x0b \x01(\r\"G\n\x18protobuf_server_response\x12\x1d\n\x06status\x18\x01 \x01(\x0e\x32\r.ServerStatus\x12\x0c\n\x04\x65rrs\x18\x02 \x03(\t\"l\n\x18protobuf_select_response\x12\x1d\n\x06status\x18\x01 \x01(\x0e\x32\r.ServerStatus\x12\x0c\n\x04\x65rrs\x18\x02 \x01(\t\x12\x11\n\tprotobufs\x18\x03 \x03(\x0c\x12\x10\n\x08has_more\x18\x04 \x01(\x08\"F\n\x19protobuf_aggregate_series\x12\x19\n\x07reducer\x18\x01 \x01(\x0e\x32\x08.Reducer\x12\x0e\n\x06values\x18\x02 \x03(\x02\"\xa3\x01\n\x1bprotobuf_aggregate_response\x12\x1d\n\x06status\x18\x01 \x01(\x0e\x32\r.ServerStatus\x12\x0c\n\x04\x65rrs\x18\x02 \x01(\t\x12\x15\n\rbucket_starts\x18\x03 \x03(\x01\x12\x14\n\x0c\x66rame_counts\x18\x04 \x03(\r\x12*\n\x06series\x18\x05 \x03(\x0b\x32\x1a.protobuf_aggregate_series*d\n\x0cServerStatus\x12\x0b\n\x07\x43REATED\x10\x00\x12\x0c\n\x08SELECTED\x10\x01\x12\x0b\n\x07UPDATED\x10\x02\x12\x0b\n\x07\x44\x45LETED\x10\x03\x12\n\n\x06\x46\x41ILED\x10\x04\x12\x13\n\x0f\x44UPLICATE_ENTRY\x10\x05*%\n\x07Reducer\x12\x07\n\x03MIN\x10\x00\x12\x07\n\x03MAX\x10\x01\x12\x08\n\x04MEAN\x10\x02\x32\xdb\x03\n\tDBGeneric\x12=\n\x06Insert\x12\x18.protobuf_insert_request\x1a\x19.protobuf_server_response\x12=\n\x06Select\x12\x18.protobuf_select_request\x1a\x19.protobuf_select_response\x12=\n\x06Update\x12\x18.protobuf_update_request\x1a\x19.protobuf_server_response\x12=\n\x06\x44\x65lete\x12\x18.protobuf_delete_request\x1a\x19.protobuf_server_response\x12\x43\n\tDropTable\x12\x1b.protobuf_droptable_request\x1a\x19.protobuf_server_response\x12\x45\n\tSubscribe\x12\x1b.protobuf_subscribe_request\x1a\x19.protobuf_select_response0\x01\x12\x46\n\tAggregate\x12\x1b.protobuf_aggregate_request\x1a\x1c.protobuf_aggregate_responseB\x0bZ\t../commonb\x06proto3')
 
 _globals = globals()
 _builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, _globals)
-_builder.BuildTopDescriptorsAndMessages(DESCRIPTOR, 'generic_pb2', _globals)
+_builder.BuildTopDescriptorsAndMessages(DESCRIPTOR, 'common.generic_pb2', _globals)
 if _descriptor._USE_C_DESCRIPTORS == False:
   _globals['DESCRIPTOR']._options = None
   _globals['DESCRIPTOR']._serialized_options = b'Z\t../common'
-  _globals['_PROTOBUF_INSERT_REQUEST']._serialized_start=44
-  _globals['_PROTOBUF_INSERT_REQUEST']._serialized_end=128
-  _globals['_PROTOBUF_SELECT_REQUEST']._serialized_start=130
-  _globals['_PROTOBUF_SELECT_REQUEST']._serialized_end=224
-  _globals['_PROTOBUF_UPDATE_REQUEST']._serialized_start=226
-  _globals['_PROTOBUF_UPDATE_REQUEST']._serialized_end=339
-  _globals['_PROTOBUF_DELETE_REQUEST']._serialized_start=341
-  _globals['_PROTOBUF_DELETE_REQUEST']._serialized_end=435
-  _globals['_PROTOBUF_DROPTABLE_REQUEST']._serialized_start=437
-  _globals['_PROTOBUF_DROPTABLE_REQUEST']._serialized_end=498
-  _globals['_PROTOBUF_ERROR_RESPONSE']._serialized_start=500
-  _globals['_PROTOBUF_ERROR_RESPONSE']._serialized_end=539
-  _globals['_PROTOBUF_SELECT_RESPONSE']._serialized_start=541
-  _globals['_PROTOBUF_SELECT_RESPONSE']._serialized_end=604
-  _globals['_DBGENERIC']._serialized_start=607
-  _globals['_DBGENERIC']._serialized_end=935
+  _globals['_SERVERSTATUS']._serialized_start=1336
+  _globals['_SERVERSTATUS']._serialized_end=1436
+  _globals['_REDUCER']._serialized_start=1438
+  _globals['_REDUCER']._serialized_end=1475
+  _globals['_PROTOBUF_INSERT_REQUEST']._serialized_start=51
+  _globals['_PROTOBUF_INSERT_REQUEST']._serialized_end=135
+  _globals['_PROTOBUF_SELECT_REQUEST']._serialized_start=138
+  _globals['_PROTOBUF_SELECT_REQUEST']._serialized_end=306
+  _globals['_PROTOBUF_UPDATE_REQUEST']._serialized_start=308
+  _globals['_PROTOBUF_UPDATE_REQUEST']._serialized_end=421
+  _globals['_PROTOBUF_DELETE_REQUEST']._serialized_start=423
+  _globals['_PROTOBUF_DELETE_REQUEST']._serialized_end=517
+  _globals['_PROTOBUF_DROPTABLE_REQUEST']._serialized_start=519
+  _globals['_PROTOBUF_DROPTABLE_REQUEST']._serialized_end=580
+  _globals['_PROTOBUF_SUBSCRIBE_REQUEST']._serialized_start=582
+  _globals['_PROTOBUF_SUBSCRIBE_REQUEST']._serialized_end=669
+  _globals['_PROTOBUF_AGGREGATE_REQUEST']._serialized_start=672
+  _globals['_PROTOBUF_AGGREGATE_REQUEST']._serialized_end=913
+  _globals['_PROTOBUF_SERVER_RESPONSE']._serialized_start=915
+  _globals['_PROTOBUF_SERVER_RESPONSE']._serialized_end=986
+  _globals['_PROTOBUF_SELECT_RESPONSE']._serialized_start=988
+  _globals['_PROTOBUF_SELECT_RESPONSE']._serialized_end=1096
+  _globals['_PROTOBUF_AGGREGATE_SERIES']._serialized_start=1098
+  _globals['_PROTOBUF_AGGREGATE_SERIES']._serialized_end=1168
+  _globals['_PROTOBUF_AGGREGATE_RESPONSE']._serialized_start=1171
+  _globals['_PROTOBUF_AGGREGATE_RESPONSE']._serialized_end=1334
+  _globals['_DBGENERIC']._serialized_start=1478
+  _globals['_DBGENERIC']._serialized_end=1953
 # @@protoc_insertion_point(module_scope)
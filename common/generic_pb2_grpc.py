@@ -2,7 +2,7 @@
 """Client and server classes corresponding to protobuf-defined services."""
 import grpc
 
-import generic_pb2 as generic__pb2
+from common import generic_pb2 as common_dot_generic__pb2
 
 
 class DBGenericStub(object):
@@ -16,28 +16,38 @@ class DBGenericStub(object):
         """
         self.Insert = channel.unary_unary(
                 '/DBGeneric/Insert',
-                request_serializer=generic__pb2.protobuf_insert_request.SerializeToString,
-                response_deserializer=generic__pb2.protobuf_error_response.FromString,
+                request_serializer=common_dot_generic__pb2.protobuf_insert_request.SerializeToString,
+                response_deserializer=common_dot_generic__pb2.protobuf_server_response.FromString,
                 )
         self.Select = channel.unary_unary(
                 '/DBGeneric/Select',
-                request_serializer=generic__pb2.protobuf_select_request.SerializeToString,
-                response_deserializer=generic__pb2.protobuf_select_response.FromString,
+                request_serializer=common_dot_generic__pb2.protobuf_select_request.SerializeToString,
+                response_deserializer=common_dot_generic__pb2.protobuf_select_response.FromString,
                 )
         self.Update = channel.unary_unary(
                 '/DBGeneric/Update',
-                request_serializer=generic__pb2.protobuf_update_request.SerializeToString,
-                response_deserializer=generic__pb2.protobuf_error_response.FromString,
+                request_serializer=common_dot_generic__pb2.protobuf_update_request.SerializeToString,
+                response_deserializer=common_dot_generic__pb2.protobuf_server_response.FromString,
                 )
         self.Delete = channel.unary_unary(
                 '/DBGeneric/Delete',
-                request_serializer=generic__pb2.protobuf_delete_request.SerializeToString,
-                response_deserializer=generic__pb2.protobuf_error_response.FromString,
+                request_serializer=common_dot_generic__pb2.protobuf_delete_request.SerializeToString,
+                response_deserializer=common_dot_generic__pb2.protobuf_server_response.FromString,
                 )
         self.DropTable = channel.unary_unary(
                 '/DBGeneric/DropTable',
-                request_serializer=generic__pb2.protobuf_droptable_request.SerializeToString,
-                response_deserializer=generic__pb2.protobuf_error_response.FromString,
+                request_serializer=common_dot_generic__pb2.protobuf_droptable_request.SerializeToString,
+                response_deserializer=common_dot_generic__pb2.protobuf_server_response.FromString,
+                )
+        self.Subscribe = channel.unary_stream(
+                '/DBGeneric/Subscribe',
+                request_serializer=common_dot_generic__pb2.protobuf_subscribe_request.SerializeToString,
+                response_deserializer=common_dot_generic__pb2.protobuf_select_response.FromString,
+                )
+        self.Aggregate = channel.unary_unary(
+                '/DBGeneric/Aggregate',
+                request_serializer=common_dot_generic__pb2.protobuf_aggregate_request.SerializeToString,
+                response_deserializer=common_dot_generic__pb2.protobuf_aggregate_response.FromString,
                 )
 
 
@@ -74,33 +84,55 @@ class DBGenericServicer(object):
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def Subscribe(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def Aggregate(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
 
 def add_DBGenericServicer_to_server(servicer, server):
     rpc_method_handlers = {
             'Insert': grpc.unary_unary_rpc_method_handler(
                     servicer.Insert,
-                    request_deserializer=generic__pb2.protobuf_insert_request.FromString,
-                    response_serializer=generic__pb2.protobuf_error_response.SerializeToString,
+                    request_deserializer=common_dot_generic__pb2.protobuf_insert_request.FromString,
+                    response_serializer=common_dot_generic__pb2.protobuf_server_response.SerializeToString,
             ),
             'Select': grpc.unary_unary_rpc_method_handler(
                     servicer.Select,
-                    request_deserializer=generic__pb2.protobuf_select_request.FromString,
-                    response_serializer=generic__pb2.protobuf_select_response.SerializeToString,
+                    request_deserializer=common_dot_generic__pb2.protobuf_select_request.FromString,
+                    response_serializer=common_dot_generic__pb2.protobuf_select_response.SerializeToString,
             ),
             'Update': grpc.unary_unary_rpc_method_handler(
                     servicer.Update,
-                    request_deserializer=generic__pb2.protobuf_update_request.FromString,
-                    response_serializer=generic__pb2.protobuf_error_response.SerializeToString,
+                    request_deserializer=common_dot_generic__pb2.protobuf_update_request.FromString,
+                    response_serializer=common_dot_generic__pb2.protobuf_server_response.SerializeToString,
             ),
             'Delete': grpc.unary_unary_rpc_method_handler(
                     servicer.Delete,
-                    request_deserializer=generic__pb2.protobuf_delete_request.FromString,
-                    response_serializer=generic__pb2.protobuf_error_response.SerializeToString,
+                    request_deserializer=common_dot_generic__pb2.protobuf_delete_request.FromString,
+                    response_serializer=common_dot_generic__pb2.protobuf_server_response.SerializeToString,
             ),
             'DropTable': grpc.unary_unary_rpc_method_handler(
                     servicer.DropTable,
-                    request_deserializer=generic__pb2.protobuf_droptable_request.FromString,
-                    response_serializer=generic__pb2.protobuf_error_response.SerializeToString,
+                    request_deserializer=common_dot_generic__pb2.protobuf_droptable_request.FromString,
+                    response_serializer=common_dot_generic__pb2.protobuf_server_response.SerializeToString,
+            ),
+            'Subscribe': grpc.unary_stream_rpc_method_handler(
+                    servicer.Subscribe,
+                    request_deserializer=common_dot_generic__pb2.protobuf_subscribe_request.FromString,
+                    response_serializer=common_dot_generic__pb2.protobuf_select_response.SerializeToString,
+            ),
+            'Aggregate': grpc.unary_unary_rpc_method_handler(
+                    servicer.Aggregate,
+                    request_deserializer=common_dot_generic__pb2.protobuf_aggregate_request.FromString,
+                    response_serializer=common_dot_generic__pb2.protobuf_aggregate_response.SerializeToString,
             ),
     }
     generic_handler = grpc.method_handlers_generic_handler(
@@ -124,8 +156,8 @@ class DBGeneric(object):
             timeout=None,
             metadata=None):
         return grpc.experimental.unary_unary(request, target, '/DBGeneric/Insert',
-            generic__pb2.protobuf_insert_request.SerializeToString,
-            generic__pb2.protobuf_error_response.FromString,
+            common_dot_generic__pb2.protobuf_insert_request.SerializeToString,
+            common_dot_generic__pb2.protobuf_server_response.FromString,
             options, channel_credentials,
             insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
 
@@ -141,8 +173,8 @@ class DBGeneric(object):
             timeout=None,
             metadata=None):
         return grpc.experimental.unary_unary(request, target, '/DBGeneric/Select',
-            generic__pb2.protobuf_select_request.SerializeToString,
-            generic__pb2.protobuf_select_response.FromString,
+            common_dot_generic__pb2.protobuf_select_request.SerializeToString,
+            common_dot_generic__pb2.protobuf_select_response.FromString,
             options, channel_credentials,
             insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
 
@@ -158,8 +190,8 @@ class DBGeneric(object):
             timeout=None,
             metadata=None):
         return grpc.experimental.unary_unary(request, target, '/DBGeneric/Update',
-            generic__pb2.protobuf_update_request.SerializeToString,
-            generic__pb2.protobuf_error_response.FromString,
+            common_dot_generic__pb2.protobuf_update_request.SerializeToString,
+            common_dot_generic__pb2.protobuf_server_response.FromString,
             options, channel_credentials,
             insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
 
@@ -175,8 +207,8 @@ class DBGeneric(object):
             timeout=None,
             metadata=None):
         return grpc.experimental.unary_unary(request, target, '/DBGeneric/Delete',
-            generic__pb2.protobuf_delete_request.SerializeToString,
-            generic__pb2.protobuf_error_response.FromString,
+            common_dot_generic__pb2.protobuf_delete_request.SerializeToString,
+            common_dot_generic__pb2.protobuf_server_response.FromString,
             options, channel_credentials,
             insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
 
@@ -192,7 +224,41 @@ class DBGeneric(object):
             timeout=None,
             metadata=None):
         return grpc.experimental.unary_unary(request, target, '/DBGeneric/DropTable',
-            generic__pb2.protobuf_droptable_request.SerializeToString,
-            generic__pb2.protobuf_error_response.FromString,
+            common_dot_generic__pb2.protobuf_droptable_request.SerializeToString,
+            common_dot_generic__pb2.protobuf_server_response.FromString,
+            options, channel_credentials,
+            insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
+
+    @staticmethod
+    def Subscribe(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_stream(request, target, '/DBGeneric/Subscribe',
+            common_dot_generic__pb2.protobuf_subscribe_request.SerializeToString,
+            common_dot_generic__pb2.protobuf_select_response.FromString,
+            options, channel_credentials,
+            insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
+
+    @staticmethod
+    def Aggregate(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(request, target, '/DBGeneric/Aggregate',
+            common_dot_generic__pb2.protobuf_aggregate_request.SerializeToString,
+            common_dot_generic__pb2.protobuf_aggregate_response.FromString,
             options, channel_credentials,
             insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
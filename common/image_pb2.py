@@ -1,6 +1,6 @@
 # -*- coding: utf-8 -*-
 # Generated by the protocol buffer compiler.  DO NOT EDIT!
-# source: image.proto
+# source: common/image.proto
 # Protobuf Python Version: 4.25.1
 """Generated protocol buffer code."""
 from google.protobuf import descriptor as _descriptor
@@ -15,14 +15,18 @@ _sym_db = _symbol_database.Default()
 from google.protobuf import any_pb2 as google_dot_protobuf_dot_any__pb2
 
 
-DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x0bimage.proto\x1a\x19google/protobuf/any.proto\"-\n\tImageData\x12\x12\n\nidentifier\x18\x01 \x01(\x01\x12\x0c\n\x04\x64\x61ta\x18\x02 \x01(\tB\x0bZ\t../commonb\x06proto3')
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x12\x63ommon/image.proto\x1a\x19google/protobuf/any.proto\"H\n\nFrameStats\x12\x0b\n\x03min\x18\x01 \x01(\x02\x12\x0b\n\x03max\x18\x02 \x01(\x02\x12\x0c\n\x04mean\x18\x03 \x01(\x02\x12\x12\n\nhot_pixels\x18\x04 \x01(\r\"\xd5\x01\n\tImageData\x12\x12\n\nidentifier\x18\x01 \x01(\x01\x12\x0c\n\x04\x64\x61ta\x18\x02 \x01(\t\x12\x0e\n\x06pixels\x18\x03 \x01(\x0c\x12\r\n\x05width\x18\x04 \x01(\r\x12\x0e\n\x06height\x18\x05 \x01(\r\x12 \n\x08\x65ncoding\x18\x06 \x01(\x0e\x32\x0e.PixelEncoding\x12\x11\n\tsensor_id\x18\x07 \x01(\t\x12\x10\n\x08sequence\x18\x08 \x01(\x04\x12\x14\n\x0cquantization\x18\t \x01(\x02\x12\x1a\n\x05stats\x18\n \x01(\x0b\x32\x0b.FrameStats*\x93\x01\n\rPixelEncoding\x12\x08\n\x04TEXT\x10\x00\x12\x0e\n\nFLOAT32_LE\x10\x01\x12\x12\n\x0eINT16_CENTI_LE\x10\x02\x12\x11\n\rKEYFRAME_ZLIB\x10\x03\x12\x0e\n\nDELTA_ZLIB\x10\x04\x12\x11\n\rKEYFRAME_ZSTD\x10\x05\x12\x0e\n\nDELTA_ZSTD\x10\x06\x12\x0e\n\nSTATS_ONLY\x10\x07\x42\x0bZ\t../commonb\x06proto3')
 
 _globals = globals()
 _builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, _globals)
-_builder.BuildTopDescriptorsAndMessages(DESCRIPTOR, 'image_pb2', _globals)
+_builder.BuildTopDescriptorsAndMessages(DESCRIPTOR, 'common.image_pb2', _globals)
 if _descriptor._USE_C_DESCRIPTORS == False:
   _globals['DESCRIPTOR']._options = None
   _globals['DESCRIPTOR']._serialized_options = b'Z\t../common'
-  _globals['_IMAGEDATA']._serialized_start=42
-  _globals['_IMAGEDATA']._serialized_end=87
+  _globals['_PIXELENCODING']._serialized_start=340
+  _globals['_PIXELENCODING']._serialized_end=487
+  _globals['_FRAMESTATS']._serialized_start=49
+  _globals['_FRAMESTATS']._serialized_end=121
+  _globals['_IMAGEDATA']._serialized_start=124
+  _globals['_IMAGEDATA']._serialized_end=337
 # @@protoc_insertion_point(module_scope)
@@ -0,0 +1,115 @@
+from google.protobuf import any_pb2
+
+from common import generic_pb2
+
+SERVICE = generic_pb2.DESCRIPTOR.services_by_name['DBGeneric']
+
+# (request class, response class, server streaming) of every rpc of DBGeneric
+# by name, read from the descriptor protoc generated from proto/generic.proto.
+# Stubs bound from it can't name a message the protos don't have, like the
+# protobuf_error_response the Insert stub once expected, and pick up new rpcs
+# with the next make.
+METHODS = {
+    method.name: (getattr(generic_pb2, method.input_type.name), getattr(generic_pb2, method.output_type.name),
+                  method.server_streaming)
+    for method in SERVICE.methods
+}
+
+_LENGTH_DELIMITED = 2
+_INSERT_FIELDS = generic_pb2.protobuf_insert_request.DESCRIPTOR.fields_by_name
+_ANY_FIELDS = any_pb2.Any.DESCRIPTOR.fields_by_name
+
+
+def _varint(value):
+    out = bytearray()
+    while value > 0x7f:
+        out.append(value & 0x7f | 0x80)
+        value >>= 7
+    out.append(value)
+    return bytes(out)
+
+
+def _tag(field):
+    return _varint(field.number << 3 | _LENGTH_DELIMITED)
+
+
+# Tag and length of a string or bytes field, nothing for an empty one like protobuf leaves it out
+def _field(field, value):
+    return _tag(field) + _varint(len(value)) + value if value else b''
+
+
+# Every DBGeneric rpc bound to channel once, as attributes like on
+# generic_pb2_grpc.DBGenericStub, with the serializers of their messages.
+# encoded holds the unary rpcs again for requests that are already bytes in
+# wire format (see InsertRequest), those are sent as they are.
+#
+#   stub = DBStub(channel)
+#   response = await stub.Select(generic_pb2.protobuf_select_request(keyspace='imageKeyspace', table='imagedata'))
+#   response = await stub.encoded['Insert'](request.serialize())
+class DBStub:
+    def __init__(self, channel):
+        self.encoded = {}
+        for name, (request_class, response_class, streaming) in METHODS.items():
+            path = f'/{SERVICE.full_name}/{name}'
+            if streaming:
+                setattr(self, name, channel.unary_stream(path, request_serializer=request_class.SerializeToString,
+                                                         response_deserializer=response_class.FromString))
+                continue
+            setattr(self, name, channel.unary_unary(path, request_serializer=request_class.SerializeToString,
+                                                    response_deserializer=response_class.FromString))
+            self.encoded[name] = channel.unary_unary(path, response_deserializer=response_class.FromString)
+
+
+# A protobuf_insert_request written straight in wire format, for the upload
+# hot path. Each frame costs an Any header of a few bytes in front of its
+# serialized ImageData, where building an Any message per frame and a request
+# message per batch and serializing them again took several times as long
+# (benchmarks/bench_insert_encoding.py). The bytes parse to the same message
+# as protobuf_insert_request(keyspace=keyspace, protobufs=[Any(...), ...]).
+# A sender keeps one and clear()s it after every batch, the keyspace and
+# type_url are only encoded once.
+#
+#   request = InsertRequest('imageKeyspace')
+#   for serialized_image in batch:
+#       request.add(serialized_image)
+#   response = await client.insert_encoded(request)
+#   request.clear()
+class InsertRequest:
+    def __init__(self, keyspace, type_url='ImageData'):
+        self.keyspace = keyspace
+        self.type_url = type_url
+        self._keyspace = _field(_INSERT_FIELDS['keyspace'], keyspace.encode())
+        self._any_tag = _tag(_INSERT_FIELDS['protobufs'])
+        self._type_url = _field(_ANY_FIELDS['type_url'], type_url.encode())
+        self._value_tag = _tag(_ANY_FIELDS['value'])
+        self._parts = [self._keyspace]
+        self._count = 0
+        # the headers in front of values of each length, frames of one encoding mostly share one
+        self._headers = {}
+
+    def __len__(self):
+        return self._count
+
+    # Appends one serialized message as an Any of type_url
+    def add(self, value):
+        header = self._headers.get(len(value))
+        if header is None:
+            header = self._header(len(value))
+        self._parts += (header, value)
+        self._count += 1
+
+    def _header(self, length):
+        if len(self._headers) >= 1024:
+            self._headers.clear()
+        value_header = self._value_tag + _varint(length)
+        any_length = len(self._type_url) + len(value_header) + length
+        header = self._any_tag + _varint(any_length) + self._type_url + value_header
+        self._headers[length] = header
+        return header
+
+    def clear(self):
+        del self._parts[1:]
+        self._count = 0
+
+    def serialize(self):
+        return b''.join(self._parts)
@@ -0,0 +1,142 @@
+import zlib
+import numpy as np
+
+import frame_codec
+from common import image_pb2
+
+try:
+    import zstandard
+except ImportError:  # optional, zlib is always available
+    zstandard = None
+
+COMPRESSIONS = ('zlib', 'zstd')
+
+# (keyframe, delta) encodings for each compression
+STREAM_ENCODINGS = {
+    'zlib': (image_pb2.KEYFRAME_ZLIB, image_pb2.DELTA_ZLIB),
+    'zstd': (image_pb2.KEYFRAME_ZSTD, image_pb2.DELTA_ZSTD),
+}
+KEYFRAME_ENCODINGS = (image_pb2.KEYFRAME_ZLIB, image_pb2.KEYFRAME_ZSTD)
+DELTA_ENCODINGS = (image_pb2.DELTA_ZLIB, image_pb2.DELTA_ZSTD)
+ZSTD_ENCODINGS = (image_pb2.KEYFRAME_ZSTD, image_pb2.DELTA_ZSTD)
+
+INT16_LE = np.dtype('<i2')
+UINT16_LE = np.dtype('<u2')
+INT16_MIN = np.iinfo(INT16_LE).min
+INT16_MAX = np.iinfo(INT16_LE).max
+
+
+# 16-bit values are stored low bytes first, then high bytes. The high bytes of
+# neighbouring pixels are nearly all the same, which compresses far better than
+# interleaved little-endian pairs.
+def _shuffle(values):
+    return values.view(np.uint8).reshape(-1, 2).T.tobytes()
+
+
+def _unshuffle(data, dtype):
+    planes = np.frombuffer(data, dtype=np.uint8).reshape(2, -1)
+    return np.ascontiguousarray(planes.T).view(dtype).ravel()
+
+
+# Deltas are zigzag coded (0, -1, 1, -2, ... -> 0, 1, 2, 3, ...) so small
+# negative changes don't fill the high bytes with 0xff
+def _zigzag(values):
+    return ((values << 1) ^ (values >> 31)).astype(UINT16_LE)
+
+
+def _unzigzag(values):
+    values = values.astype(np.int32)
+    return (values >> 1) ^ -(values & 1)
+
+
+# Keyframe-plus-delta encoder for one sensor's frames. Every keyframe_interval
+# frames a full frame of temperatures (in quantization steps) is sent, the ones
+# in between only carry the change from the previous frame. Both are int16 and
+# compressed. Deltas are taken against the quantized frame the decoder will
+# have, so quantization error never accumulates.
+class DeltaEncoder:
+    def __init__(self, keyframe_interval=30, quantization=0.1, compression='zlib', level=None):
+        if keyframe_interval < 1:
+            raise ValueError('keyframe_interval must be at least 1')
+        if compression not in COMPRESSIONS:
+            raise ValueError(f'Unknown compression: {compression}')
+        if compression == 'zstd' and zstandard is None:
+            raise ValueError("zstd compression needs the 'zstandard' package")
+        self.keyframe_interval = keyframe_interval
+        self.quantization = quantization
+        self.keyframe_encoding, self.delta_encoding = STREAM_ENCODINGS[compression]
+        if compression == 'zstd':
+            self._compress = zstandard.ZstdCompressor(level=level or 3).compress
+        else:
+            self._compress = lambda data: zlib.compress(data, level or 6)
+        self.sequence = 0
+        self._reference = None
+        self._since_keyframe = 0
+
+    # The next frame will be a keyframe, e.g. after frames were lost on the way
+    def force_keyframe(self):
+        self._reference = None
+
+    def encode(self, image_message, frame, shape=frame_codec.MLX_SHAPE):
+        steps = np.rint(np.asarray(frame, dtype=np.float32).reshape(shape) / self.quantization).astype(np.int32)
+
+        keyframe = self._reference is None or self._since_keyframe >= self.keyframe_interval
+        values = steps if keyframe else steps - self._reference
+        if not keyframe and (values.min() < INT16_MIN or values.max() > INT16_MAX):
+            keyframe, values = True, steps
+        np.clip(values, INT16_MIN, INT16_MAX, out=values)
+
+        image_message.height, image_message.width = shape
+        image_message.encoding = self.keyframe_encoding if keyframe else self.delta_encoding
+        image_message.sequence = self.sequence
+        image_message.quantization = self.quantization
+        packed = values.astype(INT16_LE) if keyframe else _zigzag(values)
+        image_message.pixels = self._compress(_shuffle(packed))
+
+        self._reference = steps
+        self._since_keyframe = 1 if keyframe else self._since_keyframe + 1
+        self.sequence += 1
+        return image_message
+
+
+# Rebuilds frames from KEYFRAME/DELTA messages, keeping one reference frame per
+# sensor_id. A delta whose predecessor never arrived can't be rebuilt, decode
+# returns None for it (and every following delta) until the next keyframe.
+# Messages in the other encodings are passed through frame_codec.decode_frame.
+class DeltaDecoder:
+    def __init__(self):
+        self.missed = 0
+        self._streams = {}  # sensor_id -> (sequence, reference steps)
+        self._zstd = zstandard.ZstdDecompressor() if zstandard is not None else None
+
+    def decode(self, image_data, out=None):
+        encoding = image_data.encoding
+        if encoding not in KEYFRAME_ENCODINGS and encoding not in DELTA_ENCODINGS:
+            return frame_codec.decode_frame(image_data, out=out)
+
+        stream = self._streams.get(image_data.sensor_id)
+        if encoding in DELTA_ENCODINGS and (stream is None or image_data.sequence != stream[0] + 1):
+            # lost the frame this delta builds on, wait for the next keyframe
+            self._streams.pop(image_data.sensor_id, None)
+            self.missed += 1
+            return None
+
+        shape = frame_codec.frame_shape(image_data)
+        data = self._decompress(encoding, image_data.pixels)
+        if encoding in KEYFRAME_ENCODINGS:
+            reference = _unshuffle(data, INT16_LE).reshape(shape).astype(np.int32)
+        else:
+            reference = stream[1]
+            reference += _unzigzag(_unshuffle(data, UINT16_LE)).reshape(shape)
+
+        self._streams[image_data.sensor_id] = (image_data.sequence, reference)
+        if out is None:
+            out = np.empty(shape, dtype=np.float32)
+        return np.multiply(reference, image_data.quantization, out=out, casting='unsafe')
+
+    def _decompress(self, encoding, payload):
+        if encoding in ZSTD_ENCODINGS:
+            if self._zstd is None:
+                raise ValueError("zstd frames need the 'zstandard' package")
+            return self._zstd.decompress(payload)
+        return zlib.decompress(payload)
@@ -5,13 +5,23 @@ import numpy as np
 import adafruit_mlx90640
 import matplotlib.pyplot as plt
 from scipy import ndimage
+import thermal
+import upscale
+import rate_control
+from blit_display import BlitRenderer, StageTimer
 
 plt.style.use('dark_background')
 fahrenheit = True #Values displayed as fahrenheit. If false will display celsius
+fast_renderer = True #Blit only the image, upscaled with interpolation. If false will redraw the whole figure every frame
+interpolation = 'bilinear' #Upscaling kernel of the fast renderer: 'bilinear', 'bicubic' or 'lanczos'
+adaptive_rate = True #Step the refresh rate down while frames fail to read and back up once they don't
 
 i2c = busio.I2C(board.SCL, board.SDA, frequency=400000)  # setup I2C
 mlx = adafruit_mlx90640.MLX90640(i2c)  # begin MLX90640 with I2C comm
-mlx.refresh_rate = adafruit_mlx90640.RefreshRate.REFRESH_32_HZ  # set refresh rate
+mlx.refresh_rate = adafruit_mlx90640.RefreshRate.REFRESH_32_HZ  # set refresh rate, the highest one with adaptive_rate
+# drawing sets the pace of this loop, so only read errors step the rate down
+camera_rate = rate_control.CameraRate(mlx.refresh_rate, max_rate=mlx.refresh_rate, slow_fraction=0)
+reads = [0, 0]  # frames read, read errors
 mlx_shape = (24, 32)  # mlx90640 shape
 
 mlx_interp_val = 10  # interpolate # on each dimension
@@ -27,20 +37,44 @@ else:
 
 plt.title("L3Harris Clinic Team - Thermal Image Client View", color='white', fontweight='bold', fontsize=20)  # Our Team Name
 
+frame = np.zeros(mlx_shape[0] * mlx_shape[1])
+frame_converted = np.zeros(mlx_shape[0] * mlx_shape[1])
+
+timer = StageTimer()  # prints fps and ms per stage
+if fast_renderer:
+    upscaler = upscale.Upscaler(mlx_shape, mlx_interp_shape, kernel=interpolation)  # interpolation matrices worked out once
+    data_interp = np.zeros(mlx_interp_shape, dtype=np.float32)
+    renderer = BlitRenderer(fig, ax, therm1, cbar, hysteresis=0.5)  # redraw the colorbar when the range moves this much
+    plt.show(block=False)
+    plt.pause(0.001)
+
 def plot_update():
-    frame = np.zeros(mlx_shape[0]*mlx_shape[1])
+    timer.start()
     try:
         mlx.getFrame(frame)  # read mlx90640
     except ValueError:
+        reads[1] += 1
         return
+    reads[0] += 1
+    timer.mark('getFrame')
 
     if fahrenheit:
-        frame_fahrenheit = celsius_to_fahrenheit(frame)    
-        data_array = np.fliplr(np.reshape(frame_fahrenheit, mlx_shape))  # reshape, flip data
+        thermal.celsius_to_fahrenheit(frame, out=frame_converted)
+        data_array = thermal.orient(thermal.as_frames(frame_converted, mlx_shape))  # reshape, flip data
     else:
-        data_array = np.fliplr(np.reshape(frame, mlx_shape))
+        data_array = thermal.orient(thermal.as_frames(frame, mlx_shape))
+    timer.mark('convert')
+
+    if fast_renderer:
+        upscaler.apply(data_array, out=data_interp)  # interpolate
+        timer.mark('upscale')
+        renderer.draw(data_interp, data_interp.min(), data_interp.max())
+        timer.mark('draw')
+        timer.frame_done()
+        return
 
     data_array = ndimage.zoom(data_array, mlx_interp_val)  # interpolate
+    timer.mark('upscale')
     therm1.set_array(data_array)  # set data
     
     min_temp = np.min(data_array)
@@ -51,14 +85,21 @@ def plot_update():
     cbar.set_ticklabels(['{:.1f}'.format(min_temp), '{:.1f}'.format((min_temp + max_temp) / 2), '{:.1f}'.format(max_temp)])
 
     plt.pause(0.001)  # required
-    
-def celsius_to_fahrenheit(value):
-    return value * 1.8 + 32
+    timer.mark('draw')
+    timer.frame_done()
 
+next_rate_check = time.monotonic() + 5
 while True:
+    if adaptive_rate and time.monotonic() >= next_rate_check:
+        next_rate_check += 5
+        rate = camera_rate.update(*reads)
+        if rate is not None:
+            print(f"Refresh rate {rate_control.rate_hz(rate):g} Hz ({camera_rate.reason})")
+            mlx.refresh_rate = rate
     try:
         plot_update()  # update plot
-        time.sleep(0.1)
+        if not fast_renderer:
+            time.sleep(0.1)
         # print(f"Time: {time.time()}")
     except ValueError:
         continue
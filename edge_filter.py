@@ -0,0 +1,123 @@
+import math
+import collections
+import numpy as np
+
+# Statistics of one frame, in degrees Celsius
+FrameStatistics = collections.namedtuple('FrameStatistics', ['min', 'max', 'mean', 'hot_pixels'])
+
+
+# Decides on the camera which frames are worth uploading. Every frame gets
+# cheap vectorized statistics (min, max, mean and the count of pixels above
+# hot_threshold), and a full frame is only sent when an event fires:
+#
+#   first    the first frame
+#   hot      hot_pixels or more pixels are above hot_threshold. Every frame is
+#            sent until the hottest pixel drops hysteresis degrees below it.
+#   change   min, max or mean moved more than change_threshold degrees since
+#            the last frame sent
+#   refresh  refresh_interval seconds passed since the last frame sent
+#
+# Between events only a stats-only heartbeat goes out, at most one every
+# heartbeat_interval seconds. One filter per camera, check() runs on its
+# capture thread.
+class EdgeFilter:
+    def __init__(self, hot_threshold=40.0, hot_pixels=1, change_threshold=1.0, hysteresis=1.0,
+                 heartbeat_interval=1.0, refresh_interval=60.0, frame_size=768):
+        self.hot_threshold = hot_threshold
+        self.hot_pixels = hot_pixels
+        self.change_threshold = change_threshold
+        self.hysteresis = hysteresis
+        self.heartbeat_interval = heartbeat_interval
+        self.refresh_interval = refresh_interval
+        self.frames = 0
+        self.heartbeats = 0
+        self.events = collections.Counter()
+        # bytes of what was sent, counted by the uploader's serialize
+        self.frame_bytes = 0
+        self.heartbeat_bytes = 0
+        self._frame = np.empty(frame_size, dtype=np.float32)
+        self._above = np.empty(frame_size, dtype=bool)
+        self._reference = None  # statistics of the last frame sent
+        self._hot = False
+        self._last_sent = -math.inf
+        self._last_heartbeat = -math.inf
+
+    # Frames sent in full
+    @property
+    def uploaded(self):
+        return sum(self.events.values())
+
+    def statistics(self, frame):
+        self._frame[:] = frame
+        np.greater(self._frame, self.hot_threshold, out=self._above)
+        return FrameStatistics(float(self._frame.min()), float(self._frame.max()), float(self._frame.mean()),
+                               int(np.count_nonzero(self._above)))
+
+    # Returns (statistics, True) when the frame captured at identifier should
+    # be sent in full, (statistics, False) for a heartbeat and None when
+    # nothing needs to be sent
+    def check(self, frame, identifier):
+        stats = self.statistics(frame)
+        self.frames += 1
+        event = self._event(stats, identifier)
+        if event is not None:
+            self.events[event] += 1
+            self._reference = stats
+            self._last_sent = self._last_heartbeat = identifier
+            return stats, True
+        if identifier - self._last_heartbeat >= self.heartbeat_interval:
+            self.heartbeats += 1
+            self._last_heartbeat = identifier
+            return stats, False
+        return None
+
+    def _event(self, stats, now):
+        if self._hot:
+            self._hot = stats.max > self.hot_threshold - self.hysteresis
+        else:
+            self._hot = stats.hot_pixels >= self.hot_pixels
+        if self._hot:
+            return 'hot'
+
+        reference = self._reference
+        if reference is None:
+            return 'first'
+        change = max(abs(stats.min - reference.min), abs(stats.max - reference.max),
+                     abs(stats.mean - reference.mean))
+        if change > self.change_threshold:
+            return 'change'
+        if now - self._last_sent >= self.refresh_interval:
+            return 'refresh'
+        return None
+
+    # Wraps a CaptureWorker's submit: (identifier, sensor_id, frame) items
+    # become (identifier, sensor_id, frame or None for a heartbeat, statistics)
+    # and frames that don't need to be sent are left out
+    def filtered(self, submit):
+        def submit_filtered(item):
+            identifier, sensor_id, frame = item
+            decision = self.check(frame, identifier)
+            if decision is not None:
+                stats, full = decision
+                submit((identifier, sensor_id, frame if full else None, stats))
+
+        return submit_filtered
+
+
+# One line on what the filters of all cameras left out
+def summary(filters):
+    frames = sum(f.frames for f in filters)
+    uploaded = sum(f.uploaded for f in filters)
+    heartbeats = sum(f.heartbeats for f in filters)
+    frame_bytes = sum(f.frame_bytes for f in filters)
+    heartbeat_bytes = sum(f.heartbeat_bytes for f in filters)
+    events = sum((f.events for f in filters), collections.Counter())
+    if not frames:
+        return 'edge filter: no frames yet'
+
+    # bytes every frame would have taken in full, from the frames that were
+    full_bytes = frames * frame_bytes / uploaded if uploaded else 0
+    saved = 1 - (frame_bytes + heartbeat_bytes) / full_bytes if full_bytes else 0
+    reasons = ', '.join(f'{event} {count}' for event, count in sorted(events.items()))
+    return (f'edge filter: {uploaded} of {frames} frames sent ({reasons}), {heartbeats} heartbeats, '
+            f'{1 - (uploaded + heartbeats) / frames:.0%} fewer records, {saved:.0%} fewer bytes')
@@ -0,0 +1,237 @@
+import math
+import time
+import asyncio
+import logging
+import argparse
+import datetime
+import numpy as np
+from numpy.lib import format as npy_format
+import grpc
+
+from common import image_pb2
+import frame_codec
+from aio_client import AsyncDBClient
+import channels
+from delta_codec import DeltaDecoder
+from archive import ARCHIVE_SUFFIX, PIXEL_TYPES, ArchiveWriter
+from archive import COMPRESSIONS as ARCHIVE_COMPRESSIONS
+
+# One exported frame: the capture time it was stored under and its temperatures
+FRAME_DTYPE = np.dtype([('identifier', '<f8'), ('frame', '<f4', frame_codec.MLX_SHAPE)])
+
+
+# Writes frames to a .npy file of FRAME_DTYPE records as they arrive, without
+# knowing how many there will be. The header is written with a length of 0 and
+# rewritten on close, numpy pads it so the new length always fits.
+class FrameFileWriter:
+    def __init__(self, path, buffer_frames=256):
+        self.path = path
+        self.frames = 0
+        self._file = open(path, 'wb')
+        self._header_size = self._write_header()
+        self._buffer = np.zeros(buffer_frames, dtype=FRAME_DTYPE)
+        self._buffered = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _write_header(self):
+        self._file.seek(0)
+        npy_format.write_array_header_1_0(self._file, {
+            'descr': npy_format.dtype_to_descr(FRAME_DTYPE),
+            'fortran_order': False,
+            'shape': (self.frames,),
+        })
+        return self._file.tell()
+
+    # The (24, 32) float32 slot the next frame goes into, decode straight into
+    # it and call commit(identifier) to keep it. Like ArchiveWriter.commit it
+    # takes the sensor id, which .npy exports don't keep.
+    def next_frame(self):
+        return self._buffer['frame'][self._buffered]
+
+    def commit(self, identifier, sensor_id=None):
+        self._buffer['identifier'][self._buffered] = identifier
+        self._buffered += 1
+        self.frames += 1
+        if self._buffered == len(self._buffer):
+            self.flush()
+
+    def write(self, identifier, frame):
+        np.copyto(self.next_frame(), frame, casting='unsafe')
+        self.commit(identifier)
+
+    def flush(self):
+        self._file.write(self._buffer[:self._buffered].tobytes())
+        self._buffered = 0
+
+    def close(self):
+        if self._file.closed:
+            return
+        self.flush()
+        end = self._file.tell()
+        if self._write_header() != self._header_size:
+            raise RuntimeError(f'{self.path}: header of {self.frames} frames does not fit')
+        self._file.seek(end)
+        self._file.close()
+
+
+# The exported frames memory-mapped, frames['frame'] is a (N, 24, 32) view
+def open_frames(path):
+    return np.load(path, mmap_mode='r')
+
+
+# An archive.ArchiveWriter for .mlxa paths, a FrameFileWriter for anything else
+def open_writer(path, pixels='float16', archive_compression='zlib', chunk_frames=1024):
+    if path.endswith(ARCHIVE_SUFFIX):
+        return ArchiveWriter(path, pixels=pixels, compression=archive_compression, chunk_frames=chunk_frames)
+    return FrameFileWriter(path)
+
+
+# Puts the rows of [start, end) on pages one page at a time, then None
+async def fetch_chunk(client, keyspace, table, start, end, page_bytes, pages, counters):
+    try:
+        while True:
+            response = await client.select_range(keyspace, table, start, end, max_bytes=page_bytes)
+            counters['pages'] += 1
+            counters['bytes'] += sum(len(row) for row in response.protobufs)
+            if response.protobufs:
+                await pages.put(response.protobufs)
+            if not response.has_more or not response.protobufs:
+                return
+
+            # carry on just past the last identifier on this page
+            last = image_pb2.ImageData.FromString(response.protobufs[-1]).identifier
+            start = float(np.nextafter(last, np.inf))
+    finally:
+        await pages.put(None)
+
+
+# Exports every frame with start <= identifier < end to a .npy file, or to
+# a columnar archive (see archive.py) for .mlxa paths, with the pixels stored
+# as pixels and compressed with archive_compression. The range is fetched as
+# chunks of chunk seconds, in_flight of them at once, each paged with Selects
+# of about page_bytes. Pages are decoded in identifier order, so keyframe/delta
+# streams are rebuilt the same way a live viewer would.
+async def export(client, path, start, end, chunk=60.0, page_bytes=1 << 20, in_flight=4, sensor=None,
+                 keyspace='imagekeyspace', table='imagedata', pixels='float16', archive_compression='zlib'):
+    chunks = max(0, math.ceil((end - start) / chunk))
+    queues = []
+    tasks = []
+    counters = {'pages': 0, 'bytes': 0}
+    decoder = DeltaDecoder()
+    began = time.monotonic()
+
+    # chunks are started as the ones before them are written, so only
+    # in_flight of them are ever buffered
+    def chunk_range(index):
+        chunk_start = start + index * chunk
+        return chunk_start, min(chunk_start + chunk, end)
+
+    def start_chunks(upto):
+        while len(tasks) < min(upto, chunks):
+            queues.append(asyncio.Queue())
+            tasks.append(asyncio.create_task(fetch_chunk(
+                client, keyspace, table, *chunk_range(len(tasks)), page_bytes, queues[-1], counters)))
+
+    try:
+        with open_writer(path, pixels, archive_compression) as writer:
+            for index in range(chunks):
+                start_chunks(index + in_flight)
+                chunk_start, chunk_end = chunk_range(index)
+                while (rows := await queues[index].get()) is not None:
+                    for serialized_image in rows:
+                        image_data = image_pb2.ImageData.FromString(serialized_image)
+                        # servers without range support answer every chunk with the whole
+                        # table, keep only this chunk's rows so none is written twice
+                        if not chunk_start <= image_data.identifier < chunk_end:
+                            continue
+                        if sensor is not None and image_data.sensor_id != sensor:
+                            continue
+                        if decoder.decode(image_data, out=writer.next_frame()) is not None:
+                            writer.commit(image_data.identifier, image_data.sensor_id)
+                await tasks[index]  # raise errors from the fetch
+    finally:
+        for task in tasks:
+            task.cancel()
+
+    elapsed = time.monotonic() - began
+    logging.info(f'Exported {writer.frames} frames to {path} from {counters["pages"]} pages, '
+                 f'{counters["bytes"] / 1e6:.1f} MB in {elapsed:.1f}s '
+                 f'({writer.frames / max(elapsed, 1e-9):.0f} frames/s), {decoder.missed} waiting on a keyframe')
+    return writer.frames
+
+
+# Identifiers of the first and last stored frames, None when the table is empty
+async def stored_range(client, keyspace='imagekeyspace', table='imagedata'):
+    first = await client.select_range(keyspace, table, 0.0, limit=1)
+    if not first.protobufs:
+        return None, None
+    last = await client.select(keyspace, table, column='identifier', constraint='MAX')
+    return (image_pb2.ImageData.FromString(first.protobufs[0]).identifier,
+            image_pb2.ImageData.FromString(last.protobufs[-1]).identifier)
+
+
+async def run(path, server_address='localhost', server_port=50051, start=None, end=None, chunk=60.0,
+              page_bytes=1 << 20, in_flight=4, timeout=30.0, sensor=None, channel_factory=None, pixels='float16',
+              archive_compression='zlib'):
+    async with AsyncDBClient(server_address, server_port, max_in_flight=in_flight, timeout=timeout,
+                             channels=channel_factory) as client:
+        # an open ended range stops at the frames actually stored, so no
+        # Selects are spent on empty time before or after them
+        if start is None or end is None:
+            first, last = await stored_range(client)
+            if first is None:
+                logging.info('No frames stored')
+                first = last = 0.0
+            start = first if start is None else start
+            end = float(np.nextafter(last, np.inf)) if end is None else end
+        return await export(client, path, start, end, chunk=chunk, page_bytes=page_bytes, in_flight=in_flight,
+                            sensor=sensor, pixels=pixels, archive_compression=archive_compression)
+
+
+# Unix seconds or an ISO 8601 date and time (local time unless it has an offset)
+def parse_time(value):
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.datetime.fromisoformat(value).timestamp()
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+
+    parser = argparse.ArgumentParser(description='Export stored frames to a memory-mapped .npy file or an archive')
+    parser.add_argument('output', help='.npy file or .mlxa archive to write, play it back with replay.py')
+    parser.add_argument('--address', default='localhost', help='Address of the gRPC server')
+    parser.add_argument('--port', type=int, default=50051, help='Port number for the gRPC server')
+    parser.add_argument('--start', type=parse_time, help='First capture time to export, defaults to the oldest frame')
+    parser.add_argument('--end', type=parse_time, help='Export frames captured before this, defaults to the newest frame')
+    parser.add_argument('--last', type=float, help='Export the last this many seconds instead of --start/--end')
+    parser.add_argument('--chunk', type=float, default=60.0, help='Seconds of frames fetched by each parallel range')
+    parser.add_argument('--page-bytes', type=int, default=1 << 20, help='Size of each Select page in bytes')
+    parser.add_argument('--in-flight', type=int, default=4, help='Ranges fetched at once')
+    parser.add_argument('--timeout', type=float, default=30.0, help='Deadline in seconds for each Select')
+    parser.add_argument('--sensor', help='Only export frames from this sensor id')
+    parser.add_argument('--pixels', choices=list(PIXEL_TYPES), default='float16',
+                        help='Pixel type of .mlxa archives, int16 holds hundredths of a degree')
+    parser.add_argument('--archive-compression', choices=ARCHIVE_COMPRESSIONS, default='zlib',
+                        help="Compression of .mlxa archives, zstd needs the 'zstandard' package")
+    channels.add_arguments(parser)
+
+    args = parser.parse_args()
+    start, end = args.start, args.end
+    if args.last is not None:
+        end = time.time()
+        start = end - args.last
+
+    try:
+        asyncio.run(run(args.output, server_address=args.address, server_port=args.port, start=start, end=end,
+                        chunk=args.chunk, page_bytes=args.page_bytes, in_flight=args.in_flight,
+                        timeout=args.timeout, sensor=args.sensor, channel_factory=channels.from_arguments(args),
+                        pixels=args.pixels, archive_compression=args.archive_compression))
+    except grpc.RpcError as e:
+        print(f'Error communicating with gRPC server: {e.code()} {e.details()}')
@@ -0,0 +1,119 @@
+import bisect
+import struct
+import threading
+import collections
+import numpy as np
+
+# ImageData.identifier is field 1, a double: tag byte 0x09 then 8 little-endian bytes
+_IDENTIFIER_TAG = 0x09
+_IDENTIFIER = struct.Struct('<d')
+
+
+# The identifier of a serialized ImageData without parsing it, None when it
+# isn't the first field. protobuf writes fields in field number order, so it
+# leads every row our clients and db-manager serialize, unless it is 0.
+def peek_identifier(serialized_image):
+    if len(serialized_image) > _IDENTIFIER.size and serialized_image[0] == _IDENTIFIER_TAG:
+        return _IDENTIFIER.unpack_from(serialized_image, 1)[0]
+    return None
+
+
+# A frame the viewer already decoded and rendered
+CachedFrame = collections.namedtuple('CachedFrame', ['identifier', 'sensor_id', 'frame', 'image', 'nbytes'])
+
+
+# Bounded LRU cache of decoded frames and their rendered images by identifier.
+# The least recently used frames are evicted once there are more than
+# max_frames of them or they take more than max_bytes. Besides lookups by
+# identifier, before() and after() step through the cached frames in capture
+# order for scrubbing back through recent history. Safe to share between the
+# viewer's threads.
+class FrameCache:
+    def __init__(self, max_frames=256, max_bytes=64 << 20):
+        if max_frames < 1:
+            raise ValueError('max_frames must be at least 1')
+        self.max_frames = max_frames
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = collections.OrderedDict()  # identifier -> CachedFrame, least recently used first
+        self._identifiers = []  # sorted
+        self._spare = None  # the last evicted frame, its arrays are reused
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, identifier):
+        return identifier in self._entries
+
+    # The cached frame for identifier or None, counted as a hit or a miss
+    def get(self, identifier):
+        with self._lock:
+            entry = self._entries.get(identifier)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end(identifier)
+            return entry
+
+    # Keeps copies of frame and image under identifier. The copies go into the
+    # arrays of the last evicted frame when they fit, so a full cache doesn't
+    # allocate a new image for every frame.
+    def put(self, identifier, sensor_id, frame, image):
+        with self._lock:
+            if identifier in self._entries:
+                self._spare = self._remove(identifier)
+            frame, image = self._copy(frame, image)
+            nbytes = frame.nbytes + image.nbytes
+            self._entries[identifier] = CachedFrame(identifier, sensor_id, frame, image, nbytes)
+            bisect.insort(self._identifiers, identifier)
+            self.nbytes += nbytes
+            # the newest frame stays even when it alone is over max_bytes
+            while len(self._entries) > 1 and (len(self._entries) > self.max_frames or self.nbytes > self.max_bytes):
+                self._spare = self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _copy(self, frame, image):
+        spare, self._spare = self._spare, None
+        if (spare is None or (spare.frame.shape, spare.frame.dtype) != (frame.shape, frame.dtype)
+                or (spare.image.shape, spare.image.dtype) != (image.shape, image.dtype)):
+            return frame.copy(), image.copy()
+        np.copyto(spare.frame, frame)
+        np.copyto(spare.image, image)
+        return spare.frame, spare.image
+
+    def _remove(self, identifier):
+        entry = self._entries.pop(identifier)
+        del self._identifiers[bisect.bisect_left(self._identifiers, identifier)]
+        self.nbytes -= entry.nbytes
+        return entry
+
+    # The newest cached frame captured before identifier, None if there is none
+    def before(self, identifier):
+        with self._lock:
+            index = bisect.bisect_left(self._identifiers, identifier)
+            return self._touch(self._identifiers[index - 1]) if index > 0 else None
+
+    # The oldest cached frame captured after identifier, None if there is none
+    def after(self, identifier):
+        with self._lock:
+            index = bisect.bisect_right(self._identifiers, identifier)
+            return self._touch(self._identifiers[index]) if index < len(self._identifiers) else None
+
+    # The newest cached frame captured at or before upto (of sensor_id, if
+    # given), None if there is none
+    def latest(self, upto=None, sensor_id=None):
+        with self._lock:
+            index = len(self._identifiers) if upto is None else bisect.bisect_right(self._identifiers, upto)
+            for identifier in reversed(self._identifiers[:index]):
+                if sensor_id is None or self._entries[identifier].sensor_id == sensor_id:
+                    return self._touch(identifier)
+            return None
+
+    def _touch(self, identifier):
+        self._entries.move_to_end(identifier)
+        return self._entries[identifier]
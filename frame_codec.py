@@ -0,0 +1,101 @@
+import threading
+import numpy as np
+
+from common import image_pb2
+
+MLX_SHAPE = (24, 32)  # mlx90640 shape (height, width)
+
+# command line names for the pixel encodings in image.proto
+ENCODINGS = {
+    'text': image_pb2.TEXT,
+    'float32': image_pb2.FLOAT32_LE,
+    'int16': image_pb2.INT16_CENTI_LE,
+}
+
+FLOAT32_LE = np.dtype('<f4')
+INT16_LE = np.dtype('<i2')
+INT16_CENTI_SCALE = 100  # int16 values are hundredths of a degree
+
+# FLOAT32_LE arrays of each frame length that float32_bytes converts into, per thread
+_float32_buffers = threading.local()
+
+
+# FLOAT32_LE bytes of frame. The lists the sensors fill are converted into a
+# buffer that is kept for the next frame, so the bytes returned are the only
+# new allocation, where np.asarray made a new array for every frame first.
+def float32_bytes(frame):
+    if not isinstance(frame, list):
+        return np.asarray(frame, dtype=FLOAT32_LE).tobytes()
+    buffers = _float32_buffers.__dict__
+    buffer = buffers.get(len(frame))
+    if buffer is None:
+        buffer = buffers[len(frame)] = np.empty(len(frame), dtype=FLOAT32_LE)
+    buffer[:] = frame
+    return buffer.tobytes()
+
+
+# Packs a frame of temperatures into an ImageData message.
+# TEXT keeps the old comma-joined string so servers and viewers that only know
+# the data field keep working while we migrate to the binary pixels field.
+def encode_frame(image_message, frame, encoding=image_pb2.FLOAT32_LE, shape=MLX_SHAPE):
+    image_message.height, image_message.width = shape
+    image_message.encoding = encoding
+
+    if encoding == image_pb2.TEXT:
+        # round the floats to save space
+        frame_rounded = [round(n, 1) for n in frame]
+        image_message.data = stringify_float_list(frame_rounded, delimiter=',')
+    elif encoding == image_pb2.FLOAT32_LE:
+        image_message.pixels = float32_bytes(frame)
+    elif encoding == image_pb2.INT16_CENTI_LE:
+        scaled = np.rint(np.asarray(frame, dtype=np.float32) * INT16_CENTI_SCALE)
+        np.clip(scaled, np.iinfo(INT16_LE).min, np.iinfo(INT16_LE).max, out=scaled)
+        image_message.pixels = scaled.astype(INT16_LE).tobytes()
+    else:
+        raise ValueError(f'Unknown pixel encoding: {encoding}')
+
+    return image_message
+
+
+# Unpacks the pixels of an ImageData message into a (height, width) float32 array.
+# FLOAT32_LE frames are a read-only view over the message bytes (no copy), the
+# other encodings produce a new array unless one is passed in with out.
+# STATS_ONLY heartbeats have no pixels and decode to None.
+def decode_frame(image_data, out=None):
+    if image_data.encoding == image_pb2.STATS_ONLY:
+        return None
+    shape = frame_shape(image_data)
+
+    if image_data.encoding == image_pb2.FLOAT32_LE:
+        frame = np.frombuffer(image_data.pixels, dtype=FLOAT32_LE).reshape(shape)
+        if out is None:
+            return frame
+        np.copyto(out, frame)
+        return out
+
+    if image_data.encoding == image_pb2.INT16_CENTI_LE:
+        scaled = np.frombuffer(image_data.pixels, dtype=INT16_LE).reshape(shape)
+        if out is None:
+            out = np.empty(shape, dtype=np.float32)
+        return np.multiply(scaled, 1 / INT16_CENTI_SCALE, out=out, casting='unsafe')
+
+    if image_data.encoding != image_pb2.TEXT:
+        raise ValueError(f'Pixel encoding {image_data.encoding} needs a delta_codec.DeltaDecoder')
+
+    # legacy TEXT frames only fill in the data string
+    frame = np.fromstring(image_data.data, dtype=np.float32, sep=',').reshape(shape)
+    if out is None:
+        return frame
+    np.copyto(out, frame)
+    return out
+
+
+# Frames from older clients have no width/height set, those are always mlx90640 sized
+def frame_shape(image_data):
+    if image_data.width and image_data.height:
+        return (image_data.height, image_data.width)
+    return MLX_SHAPE
+
+
+def stringify_float_list(float_list, delimiter=','):
+    return delimiter.join(map(str, float_list))
@@ -0,0 +1,102 @@
+import numpy as np
+from PIL import Image
+
+import frame_codec
+import thermal
+import upscale
+from thermal import COLORMAPS, colormap_lut
+
+# 'nearest' or one of the upscale.KERNELS
+INTERPOLATIONS = ('nearest',) + tuple(upscale.KERNELS)
+
+
+# Turns (24, 32) temperature frames into a colormapped size image without
+# allocating per frame. Frames can be decoded straight into renderer.frame, all
+# the intermediate arrays and the output image are created once up front and
+# the Tk PhotoImage is pasted into instead of being recreated. The frame keeps
+# the sensor's aspect ratio, centered on black. 'nearest' interpolation
+# upscales the colormapped pixels, the others upscale the temperatures with
+# an upscale.Upscaler and colormap every output pixel.
+class FrameRenderer:
+    def __init__(self, size=(600, 400), shape=frame_codec.MLX_SHAPE, colormap='gray', interpolation='nearest'):
+        out_width, out_height = size
+        self.size = size
+        self.interpolation = interpolation
+        self.lut = colormap_lut(colormap)
+
+        # where the frame goes in the image
+        fit_height, fit_width = upscale.fit(shape, size)
+        top, left = (out_height - fit_height) // 2, (out_width - fit_width) // 2
+        self._region = np.s_[top:top + fit_height, left:left + fit_width]
+        self._fills = (fit_height, fit_width) == (out_height, out_width)
+
+        self.frame = np.empty(shape, dtype=np.float32)
+        self._low = np.empty((1, 1), dtype=np.float32)
+        self._high = np.empty((1, 1), dtype=np.float32)
+        if interpolation == 'nearest':
+            levels_shape = shape
+            self._upscaler = upscale.NearestUpscaler(shape, (fit_height, fit_width))
+            self._frame_colors = np.empty(shape + (4,), dtype=np.uint8)
+        else:
+            levels_shape = (fit_height, fit_width)
+            self._upscaler = upscale.Upscaler(shape, levels_shape, kernel=interpolation)
+        self._scaled = np.empty(levels_shape, dtype=np.float32)
+        self._index = np.empty(levels_shape, dtype=np.intp)
+        # the upscaled colors, copied into the region when there are borders around it
+        self._colors = None if self._fills else np.empty((fit_height, fit_width, 4), dtype=np.uint8)
+
+        # the PIL image shares the RGBA buffer, writing the buffer redraws the image
+        self.rgba = self.blank()
+        self.image = Image.frombuffer('RGBA', size, self.rgba, 'raw', 'RGBA', 0, 1)
+        self.photo = None
+
+    # A new black (height, width, 4) image to render into
+    def blank(self):
+        out_width, out_height = self.size
+        rgba = np.zeros((out_height, out_width, 4), dtype=np.uint8)
+        rgba[..., 3] = 255
+        return rgba
+
+    # Colormaps frame (or renderer.frame when it was decoded in place) into
+    # renderer.image, or into out, a blank() image
+    def render(self, frame=None, out=None):
+        if frame is not None and frame is not self.frame:
+            np.copyto(self.frame, np.reshape(frame, self.frame.shape), casting='unsafe')
+        rgba = self.rgba if out is None else out
+        colors = rgba if self._fills else self._colors
+
+        # Normalize the data to be in the range [0, 255] for the lookup table
+        thermal.frame_range(self.frame, low=self._low, high=self._high)
+        if self.interpolation == 'nearest':
+            thermal.normalize(self.frame, out=self._scaled, low=self._low, high=self._high)
+            thermal.colormap(self._scaled, self.lut, out=self._frame_colors, index=self._index)
+            # upscale the colors rather than the temperatures, one uint32 per pixel
+            self._upscaler.apply(self._frame_colors.view(np.uint32)[..., 0], out=colors.view(np.uint32)[..., 0])
+        else:
+            # the kernels overshoot the frame's range a little, the colormap clips those pixels
+            self._upscaler.apply(self.frame, out=self._scaled)
+            thermal.normalize(self._scaled, out=self._scaled, low=self._low, high=self._high)
+            thermal.colormap(self._scaled, self.lut, out=colors, index=self._index)
+
+        if colors is not rgba:
+            rgba[self._region] = colors
+        return self.image if out is None else out
+
+    # Renders into a persistent ImageTk.PhotoImage shown by a Tk label
+    def show(self, label, frame=None):
+        self.render(frame)
+        self._paste(label)
+
+    # Shows a copy of an earlier rgba again without rendering it
+    def show_rgba(self, label, rgba):
+        np.copyto(self.rgba, rgba)
+        self._paste(label)
+
+    def _paste(self, label):
+        from PIL import ImageTk
+
+        if self.photo is None:
+            self.photo = ImageTk.PhotoImage(self.image)
+            label.configure(image=self.photo)
+        else:
+            self.photo.paste(self.image)
@@ -0,0 +1,60 @@
+import threading
+
+
+# Hands the newest frame from one writer thread to one reader thread without
+# locks. It holds three buffers made by make(): the writer fills back() and
+# publish()es it, the reader acquire()s the newest published one. Frames the
+# reader didn't get to in time are simply overwritten, and the writer never
+# writes the buffer that is published or being read.
+#
+# Publishing is one assignment of a (version, index, tag) tuple, which is
+# atomic under the GIL. The reader marks the buffer it is about to read and
+# checks that it was still the newest afterwards, so the writer can't pick it
+# as its next back buffer in between.
+#
+#   writer                                 reader
+#   decode(out=slot.back())                latest = slot.acquire(seen)
+#   slot.publish(identifier)               if latest: seen, buffer, tag = latest
+class LatestFrameSlot:
+    def __init__(self, make):
+        self.buffers = [make() for _ in range(3)]
+        self._latest = (0, None, None)  # version, buffer index, tag
+        self._writing = 0
+        self._reading = None
+        self._ready = threading.Event()
+
+    # The buffer the writer fills next
+    def back(self):
+        return self.buffers[self._writing]
+
+    # Makes back() the newest frame, with tag (e.g. its identifier)
+    def publish(self, tag=None):
+        self._latest = (self._latest[0] + 1, self._writing, tag)
+        # the next frame goes to the buffer that is neither published nor being
+        # read. _reading is read once, the reader may change it in between and
+        # a buffer it marks after this was no longer the newest, which
+        # acquire() notices and retries.
+        reading = self._reading
+        self._writing = next(i for i in range(3) if i != self._writing and i != reading)
+        self._ready.set()
+
+    # (version, buffer, tag) of the newest frame if it is newer than version
+    # seen, otherwise None. The buffer stays the reader's until the next acquire.
+    def acquire(self, seen=0):
+        while True:
+            latest = self._latest
+            if latest[0] == seen:
+                return None
+            self._reading = latest[1]
+            if self._latest is latest:
+                return latest[0], self.buffers[latest[1]], latest[2]
+
+    # acquire() that waits up to timeout seconds for a newer frame
+    def wait(self, seen=0, timeout=None):
+        latest = self.acquire(seen)
+        if latest is None:
+            self._ready.clear()
+            latest = self.acquire(seen)
+            if latest is None and self._ready.wait(timeout):
+                latest = self.acquire(seen)
+        return latest
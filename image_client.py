@@ -1,107 +1,72 @@
-import sys
-import grpc
 import argparse
-from PIL import Image # This is Pillow from Ubuntu Dockerfile
-import board
-import busio
-import adafruit_mlx90640
 import logging
-import time
-import random
 
-logging.basicConfig(level=logging.DEBUG)
-
-# Camera Setup
-# set frequency in boot/config.txt not in script
-i2c = busio.I2C(board.SCL, board.SDA)
-mlx = adafruit_mlx90640.MLX90640(i2c)
-logging.info(f"MLX addr detected on I2C {[hex(i) for i in mlx.serial_number]}")
-
-
-# if using higher refresh rates yields a 'too many retries' exception,
-# try decreasing this value to work with certain pi/camera combinations
-mlx.refresh_rate = adafruit_mlx90640.RefreshRate.REFRESH_4_HZ
-
-# Change directory to Routes so we can import the protobufs
-current_directory = sys.path[0]
-routes_directory = current_directory + '/common'
-sys.path.insert(1, routes_directory)
-
-from google.protobuf import any_pb2
-import image_pb2
-import image_pb2_grpc
-import generic_pb2
-import generic_pb2_grpc
-
-def run(server_address='localhost', server_port=50051):
-    # Connect to the gRPC server
-    with grpc.insecure_channel(f'{server_address}:{server_port}') as channel:
-        # Create a stub (client)
-        stub = generic_pb2_grpc.DBGenericStub(channel)
-
-        while True:
-            frame = [0] * 768
-
-            # This aquires thermal image from the mlx90640
-            try:
-                mlx.getFrame(frame)
-            except ValueError:
-                # these happen, no biggie - retry
-                continue
-
-            # #  __________
-            # # Use this code to replace try block above if you don't have the thermal camera
-            # for f in range(len(frame)):
-            #     frame[f] = random.uniform(0.0,100.0)
-            # # __________
-
-            # Create an instance of the ImageData message
-            image_message = image_pb2.ImageData()
-            image_message.identifier = time.time()
-
-            # add list of floats into long string and round the floats to save space            
-            frame_rounded = [round(n, 1) for n in frame]
-            image_message.data = stringify_float_list(frame_rounded, delimiter=',')
-
-            # Serialize the ImageData message to bytes
-            serialized_image = image_message.SerializeToString()
-
-            # Create an Any message to hold the serialized ImageData message
-            any_message = any_pb2.Any(value=serialized_image, type_url="ImageData")
-
-            # Create a request to send to the server
-            request = generic_pb2.protobuf_insert_request(
-                keyspace="imageKeyspace",
-                protobufs=[any_message]
-            )
-
-            # Send the request to the server
-            response = stub.Insert(request)
-
-            # Handle the response as needed
-            logging.info(f'Request: {image_message.identifier}')
-            time.sleep(1)
-
-def stringify_float_list(float_list, delimiter=','):
-    return delimiter.join(map(str, float_list))
+from capture_pipeline import OVERFLOW_POLICIES, REFRESH_RATES
+import channels
+
+logging.basicConfig(level=logging.INFO)
+
+# Choices for the command line, kept here so that --help doesn't import
+# numpy, protobuf and the codecs just to list them. They are the keys
+# of frame_codec.ENCODINGS plus 'delta', delta_codec.COMPRESSIONS and
+# sources.SYNTHETIC_MODES, benchmarks/startup.py checks that they still match.
+ENCODING_CHOICES = ('text', 'float32', 'int16', 'delta')
+COMPRESSION_CHOICES = ('zlib', 'zstd')
+SYNTHETIC_MODE_CHOICES = ('scene', 'uniform')
+
+def run(server_address='localhost', server_port=50051, encoding='float32', batch_size=8, batch_interval=1.0,
+        refresh_rate='4', queue_size=256, overflow='drop-oldest', senders=1, max_in_flight=4, timeout=10.0,
+        sensors=None, synthetic=0, synthetic_mode='scene', keyframe_interval=30, compression='zlib', record=None,
+        stats_interval=10.0, spool=None, spool_size=64, prometheus_file=None, prometheus_port=None,
+        edge_filter=None, channel_factory=None, rate_control=None):
+    # Only the run action pays for numpy, gRPC and the codecs, and the cameras
+    # are only opened here
+    import asyncio
+    from aio_client import AsyncDBClient
+    from metrics import Metrics
+    from uploader import frame_packer, open_sources, upload
+    from edge_filter import EdgeFilter
+
+    # Camera Setup
+    # set frequency in boot/config.txt not in script
+    sources = open_sources(sensors, synthetic, synthetic_mode, refresh_rate)
+    pack = frame_packer(encoding, keyframe_interval, compression)
+    if encoding == 'delta' and senders > 1:
+        # every delta needs the frame before it, parallel senders could
+        # store them out of order and viewers would wait for a keyframe
+        logging.warning(f'--encoding delta sends frames in order, using 1 sender instead of {senders}')
+        senders = 1
+
+    metrics = Metrics()
+    if prometheus_port:
+        metrics.serve_prometheus(prometheus_port)
+
+    # edge_filter holds the EdgeFilter settings, every camera gets its own filter
+    make_filter = None
+    if edge_filter is not None:
+        make_filter = lambda: EdgeFilter(**edge_filter)
+
+    client = AsyncDBClient(server_address, server_port, max_in_flight=max_in_flight, timeout=timeout, metrics=metrics,
+                           channels=channel_factory)
+    asyncio.run(upload(client, sources, pack=pack, batch_size=batch_size, batch_interval=batch_interval,
+                       queue_size=queue_size, overflow=overflow, senders=senders, record=record,
+                       stats_interval=stats_interval, spool=spool, spool_size=spool_size, metrics=metrics,
+                       prometheus_file=prometheus_file, edge_filter=make_filter, rate_control=rate_control))
 
 # Deletes the entire table in the database
-def dropTable(server_address='localhost', server_port=50051):
-    # Connect to the gRPC server
-    with grpc.insecure_channel(f'{server_address}:{server_port}') as channel:
-        # Create a stub (client) for the generic service
-        stub = generic_pb2_grpc.DBGenericStub(channel)
+def dropTable(server_address='localhost', server_port=50051, channel_factory=None):
+    import asyncio
+    from aio_client import AsyncDBClient
 
-        # Create a delete request
-        droptable_request = generic_pb2.protobuf_droptable_request(
-            keyspace="imagekeyspace",
-            table="imagedata"
-        )
+    async def drop():
+        # Connect to the gRPC server
+        async with AsyncDBClient(server_address, server_port, channels=channel_factory) as client:
+            # Send the delete request
+            response = await client.drop_table(keyspace="imagekeyspace", table="imagedata")
+            # Check if response.errs is not empty
+            handle_errors(response.errs)
 
-        # Send the delete request
-        response = stub.DropTable(droptable_request)
-        # Check if response.errs is not empty
-        handle_errors(response.errs)
+    asyncio.run(drop())
 
 def handle_errors(errors):
     if errors != []:
@@ -113,13 +78,91 @@ if __name__ == '__main__':
     parser.add_argument('--address', default='localhost', help='Address of the gRPC server')
     parser.add_argument('--port', type=int, default=50051, help='Port number for the gRPC server')
     parser.add_argument('--action', choices=['run', 'deleteall'], help='Action to perform')
+    parser.add_argument('--encoding', choices=ENCODING_CHOICES, default='float32',
+                        help="Pixel encoding for frames, use 'text' for servers that only read the legacy data string")
+    parser.add_argument('--keyframe-interval', type=int, default=30,
+                        help="With --encoding delta, send a full frame every this many frames")
+    parser.add_argument('--compression', choices=COMPRESSION_CHOICES, default='zlib',
+                        help="Compression of --encoding delta frames, zstd needs the 'zstandard' package")
+    parser.add_argument('--record', metavar='PATH', help='Also append every frame sent to this file for replay.py')
+    parser.add_argument('--spool', metavar='PATH',
+                        help='Keep frames in this ring file until they are stored, retrying through server outages')
+    parser.add_argument('--spool-size', type=int, default=64,
+                        help='Size of the --spool file in MiB, the oldest frames are dropped when it is full')
+    parser.add_argument('--batch-size', type=int, default=8, help='Send an Insert once this many frames are queued')
+    parser.add_argument('--batch-interval', type=float, default=1.0,
+                        help='Send an Insert once the oldest queued frame is this many seconds old')
+    parser.add_argument('--refresh-rate', choices=list(REFRESH_RATES), default='4',
+                        help='Sensor refresh rate in Hz, the starting rate with --adaptive-rate')
+    parser.add_argument('--adaptive-rate', action='store_true',
+                        help='Step the refresh rates and batches to what the cameras and the server keep up with')
+    parser.add_argument('--min-refresh-rate', choices=list(REFRESH_RATES), default='0.5',
+                        help='With --adaptive-rate, the lowest refresh rate in Hz')
+    parser.add_argument('--max-refresh-rate', choices=list(REFRESH_RATES), default='16',
+                        help='With --adaptive-rate, the highest refresh rate in Hz')
+    parser.add_argument('--rate-interval', type=float, default=5.0,
+                        help='With --adaptive-rate, seconds between decisions')
+    parser.add_argument('--max-insert-latency', type=float, default=0.5,
+                        help='With --adaptive-rate, mean seconds per Insert above which uploads count as congested')
+    parser.add_argument('--max-batch-size', type=int, default=64,
+                        help='With --adaptive-rate, the largest batch uploads may grow to')
+    parser.add_argument('--queue-size', type=int, default=256, help='Frames buffered between capture and the senders')
+    parser.add_argument('--overflow', choices=OVERFLOW_POLICIES, default='drop-oldest',
+                        help='What to do with a new frame when the buffer is full')
+    parser.add_argument('--senders', type=int, default=1,
+                        help='Number of sender workers draining the buffer, always 1 with --encoding delta')
+    parser.add_argument('--max-in-flight', type=int, default=4, help='Most Insert calls in flight at once')
+    parser.add_argument('--timeout', type=float, default=10.0, help='Deadline in seconds for each Insert')
+    parser.add_argument('--sensor', action='append', metavar='NAME[:BUS[:ADDRESS[:RATE]]]',
+                        help='Camera to capture from, repeat for more than one (default: one on the board I2C pins)')
+    parser.add_argument('--synthetic', type=int, default=0, help='Number of synthetic cameras to add, for load testing')
+    parser.add_argument('--synthetic-mode', choices=SYNTHETIC_MODE_CHOICES, default='scene',
+                        help="Synthetic frames: a drifting warm 'scene' or 'uniform' random noise")
+    parser.add_argument('--stats-interval', type=float, default=10.0,
+                        help='Seconds between the frame count and stage timing summary lines')
+    parser.add_argument('--prometheus-file', metavar='PATH',
+                        help='Rewrite this file with the stage timings in Prometheus text format every summary')
+    parser.add_argument('--prometheus-port', type=int, help='Serve the stage timings for Prometheus on this port')
+    parser.add_argument('--edge-filter', action='store_true',
+                        help='Only send full frames on a change or a hot spot and stats-only heartbeats in between')
+    parser.add_argument('--hot-threshold', type=float, default=40.0,
+                        help='With --edge-filter, pixels above this many degrees C count as hot')
+    parser.add_argument('--hot-pixels', type=int, default=1,
+                        help='With --edge-filter, send every frame while this many pixels are hot')
+    parser.add_argument('--change-threshold', type=float, default=1.0,
+                        help='With --edge-filter, send a frame once min, max or mean moved this many degrees')
+    parser.add_argument('--hysteresis', type=float, default=1.0,
+                        help='With --edge-filter, a hot spot ends once no pixel is within this many degrees of it')
+    parser.add_argument('--heartbeat-interval', type=float, default=1.0,
+                        help='With --edge-filter, seconds between stats-only heartbeats of an unchanged scene')
+    parser.add_argument('--refresh-interval', type=float, default=60.0,
+                        help='With --edge-filter, send a full frame at least this often in seconds')
+    parser.add_argument('--verbose', action='store_true', help='Log every batch sent')
+    channels.add_arguments(parser)
 
     args = parser.parse_args()
+    if args.verbose:
+        logging.getLogger().setLevel(logging.DEBUG)
 
     if args.action == 'run':
-        run(server_address=args.address, server_port=args.port)
+        run(server_address=args.address, server_port=args.port, encoding=args.encoding,
+            batch_size=args.batch_size, batch_interval=args.batch_interval, refresh_rate=args.refresh_rate,
+            queue_size=args.queue_size, overflow=args.overflow, senders=args.senders,
+            max_in_flight=args.max_in_flight, timeout=args.timeout, sensors=args.sensor,
+            synthetic=args.synthetic, synthetic_mode=args.synthetic_mode, keyframe_interval=args.keyframe_interval,
+            compression=args.compression, record=args.record, spool=args.spool, spool_size=args.spool_size,
+            stats_interval=args.stats_interval, prometheus_file=args.prometheus_file,
+            prometheus_port=args.prometheus_port,
+            edge_filter=dict(hot_threshold=args.hot_threshold, hot_pixels=args.hot_pixels,
+                             change_threshold=args.change_threshold, hysteresis=args.hysteresis,
+                             heartbeat_interval=args.heartbeat_interval,
+                             refresh_interval=args.refresh_interval) if args.edge_filter else None,
+            channel_factory=channels.from_arguments(args),
+            rate_control=dict(min_rate=args.min_refresh_rate, max_rate=args.max_refresh_rate,
+                              interval=args.rate_interval, max_latency=args.max_insert_latency,
+                              max_batch=args.max_batch_size) if args.adaptive_rate else None)
     elif args.action == 'deleteall':
-        dropTable(server_address=args.address, server_port=args.port)
+        dropTable(server_address=args.address, server_port=args.port, channel_factory=channels.from_arguments(args))
     else:
         print("Invalid action. Please specify either 'run' or 'deleteall'.")
     
@@ -0,0 +1,217 @@
+import time
+import bisect
+import logging
+import threading
+import argparse
+from concurrent import futures
+import grpc
+
+from common import image_pb2
+from common import generic_pb2
+from common import generic_pb2_grpc
+from aggregate import Aggregator
+from channels import COMPRESSIONS, DEFAULT_MAX_MESSAGE_BYTES, server_options
+
+# Message classes the stand-in knows how to read an identifier from, by table name
+MESSAGE_TYPES = {
+    'imagedata': image_pb2.ImageData,
+}
+
+
+# Rows of one table kept sorted by identifier
+class _Table:
+    def __init__(self):
+        self.identifiers = []
+        self.rows = []
+
+    def insert(self, identifier, row):
+        index = bisect.bisect_left(self.identifiers, identifier)
+        if index < len(self.identifiers) and self.identifiers[index] == identifier:
+            return False
+        self.identifiers.insert(index, identifier)
+        self.rows.insert(index, row)
+        return True
+
+    # Rows with an identifier greater than since
+    def after(self, since):
+        return self.rows[bisect.bisect_right(self.identifiers, since):]
+
+    # Rows with start <= identifier < end (end 0 for no upper bound)
+    def between(self, start, end):
+        first = bisect.bisect_left(self.identifiers, start)
+        last = bisect.bisect_left(self.identifiers, end) if end else len(self.identifiers)
+        return self.rows[first:last]
+
+    # One page of rows with start <= identifier < end (end 0 for no upper
+    # bound), ends after limit rows or max_bytes. Returns (rows, has_more).
+    def page(self, start, end, limit=0, max_bytes=0):
+        first = bisect.bisect_left(self.identifiers, start)
+        last = bisect.bisect_left(self.identifiers, end) if end else len(self.identifiers)
+        if limit:
+            last_page = min(last, first + limit)
+        else:
+            last_page = last
+
+        rows = []
+        size = 0
+        for row in self.rows[first:last_page]:
+            if rows and max_bytes and size + len(row) > max_bytes:
+                break
+            rows.append(row)
+            size += len(row)
+        return rows, first + len(rows) < last
+
+
+# In-memory stand-in for the db-manager server so the clients can be run and
+# tested without Cassandra. Keyspace and table names are case-insensitive like
+# they are in the real database, the table is named after the Any type_url.
+# Aggregate is answered by reducing the stored frames in Python.
+# latency seconds are added to every call and every streamed response, to
+# stand in for a remote server or a slow network.
+class LocalDBServicer(generic_pb2_grpc.DBGenericServicer):
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self._tables = {}
+        self._changed = threading.Condition()
+
+    def _delay(self):
+        if self.latency > 0:
+            time.sleep(self.latency)
+
+    def _table(self, keyspace, table, create=False):
+        key = (keyspace.lower(), table.lower())
+        if create and key not in self._tables:
+            self._tables[key] = _Table()
+        return self._tables.get(key)
+
+    def Insert(self, request, context):
+        self._delay()
+        errs = []
+        duplicates = 0
+        with self._changed:
+            for any_message in request.protobufs:
+                table_name = any_message.type_url.rsplit('/', 1)[-1].lower()
+                message_type = MESSAGE_TYPES.get(table_name)
+                if message_type is None:
+                    errs.append(f'unknown type {any_message.type_url}')
+                    continue
+                identifier = message_type.FromString(any_message.value).identifier
+                if not self._table(request.keyspace, table_name, create=True).insert(identifier, any_message.value):
+                    errs.append(f'duplicate identifier {identifier}')
+                    duplicates += 1
+            self._changed.notify_all()
+
+        # DUPLICATE_ENTRY when every row turned away was already stored, so
+        # clients can tell resent rows from failed ones without the errs wording
+        if not errs:
+            status = generic_pb2.CREATED
+        elif duplicates == len(errs):
+            status = generic_pb2.DUPLICATE_ENTRY
+        else:
+            status = generic_pb2.FAILED
+        return generic_pb2.protobuf_server_response(status=status, errs=errs)
+
+    # Supports the queries the clients make: every row, constraint='MAX' for the
+    # latest one, or a page of an identifier range
+    def Select(self, request, context):
+        self._delay()
+        with self._changed:
+            table = self._table(request.keyspace, request.table)
+            rows = table.rows if table is not None else []
+
+            if request.range_start or request.range_end or request.limit or request.max_bytes:
+                if request.constraint:
+                    return generic_pb2.protobuf_select_response(
+                        status=generic_pb2.FAILED, errs='constraint and range can not be combined')
+                if table is None:
+                    return generic_pb2.protobuf_select_response(status=generic_pb2.SELECTED)
+                rows, has_more = table.page(request.range_start, request.range_end, request.limit, request.max_bytes)
+                return generic_pb2.protobuf_select_response(status=generic_pb2.SELECTED, protobufs=rows,
+                                                            has_more=has_more)
+
+            if request.constraint == 'MAX':
+                rows = rows[-1:]
+            elif request.constraint:
+                return generic_pb2.protobuf_select_response(
+                    status=generic_pb2.FAILED, errs=f'unsupported constraint {request.constraint}')
+
+            return generic_pb2.protobuf_select_response(status=generic_pb2.SELECTED, protobufs=rows)
+
+    # Reduces a range of frames to per-bucket series with aggregate.Aggregator
+    def Aggregate(self, request, context):
+        self._delay()
+        try:
+            aggregator = Aggregator.for_request(request)
+            with self._changed:
+                table = self._table(request.keyspace, request.table)
+                rows = table.between(request.range_start, request.range_end) if table is not None else []
+            # Inserts carry on while the rows are reduced
+            for row in rows:
+                aggregator.add(row)
+        except ValueError as e:
+            return generic_pb2.protobuf_aggregate_response(status=generic_pb2.FAILED, errs=str(e))
+        return aggregator.response()
+
+    def DropTable(self, request, context):
+        self._delay()
+        with self._changed:
+            self._tables.pop((request.keyspace.lower(), request.table.lower()), None)
+        return generic_pb2.protobuf_server_response(status=generic_pb2.DELETED)
+
+    def Subscribe(self, request, context):
+        since = request.since_identifier
+        if since == 0:
+            # start at the latest stored row
+            with self._changed:
+                table = self._table(request.keyspace, request.table)
+                latest = table.rows[-1:] if table is not None else []
+                if latest:
+                    since = table.identifiers[-1]
+            if latest:
+                self._delay()
+                yield generic_pb2.protobuf_select_response(status=generic_pb2.SELECTED, protobufs=latest)
+
+        while context.is_active():
+            with self._changed:
+                table = self._table(request.keyspace, request.table)
+                rows = table.after(since) if table is not None else []
+                if not rows:
+                    # wake up now and then to notice cancelled streams
+                    self._changed.wait(timeout=1.0)
+                    continue
+                since = table.identifiers[-1]
+
+            self._delay()
+            yield generic_pb2.protobuf_select_response(status=generic_pb2.SELECTED, protobufs=rows)
+
+
+# Starts a gRPC server backed by a LocalDBServicer (or servicer), returns
+# (server, servicer). Responses are compressed with compression, a
+# channels.COMPRESSIONS name.
+def serve(server_port=50051, max_workers=10, latency=0.0, servicer=None, compression='none',
+          max_message_bytes=DEFAULT_MAX_MESSAGE_BYTES):
+    servicer = servicer or LocalDBServicer(latency=latency)
+    server = grpc.server(futures.ThreadPoolExecutor(max_workers=max_workers),
+                         options=server_options(max_message_bytes),
+                         compression=getattr(grpc.Compression, COMPRESSIONS[compression]))
+    generic_pb2_grpc.add_DBGenericServicer_to_server(servicer, server)
+    server.add_insecure_port(f'[::]:{server_port}')
+    server.start()
+    return server, servicer
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+
+    parser = argparse.ArgumentParser(description='Local in-memory stand-in for the db-manager gRPC server')
+    parser.add_argument('--port', type=int, default=50051, help='Port number for the gRPC server')
+    parser.add_argument('--latency', type=float, default=0.0, help='Milliseconds added to every call')
+    parser.add_argument('--compression', choices=list(COMPRESSIONS), default='none', help='Compress responses')
+    parser.add_argument('--max-message-mb', type=int, default=DEFAULT_MAX_MESSAGE_BYTES >> 20,
+                        help='Largest message sent or received in MiB')
+    args = parser.parse_args()
+
+    server, _ = serve(server_port=args.port, latency=args.latency / 1000, compression=args.compression,
+                      max_message_bytes=args.max_message_mb << 20)
+    logging.info(f'Local DB server listening on port {args.port}')
+    server.wait_for_termination()
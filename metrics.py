@@ -0,0 +1,154 @@
+import os
+import time
+import asyncio
+import logging
+import threading
+import numpy as np
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+# The last window samples of one stage in a preallocated ring, percentiles are
+# only worked out when a summary is asked for. Samples observed from several
+# threads at the same moment can overwrite each other, which is fine for a
+# rolling view and keeps observe() to a few attribute updates.
+class RollingHistogram:
+    def __init__(self, window=1024):
+        self._samples = np.zeros(window)
+        self._next = 0
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, value):
+        self._samples[self._next] = value
+        self._next = (self._next + 1) % len(self._samples)
+        self.count += 1
+        self.total += value
+
+    # Values at QUANTILES of the samples in the window, None before the first one
+    def quantiles(self, quantiles=QUANTILES):
+        samples = self._samples[:min(self.count, len(self._samples))]
+        if not len(samples):
+            return None
+        return np.quantile(samples, quantiles)
+
+
+# Per stage timings (getFrame, serialize, Insert, Select, decode, render, ...)
+# and counters for one process. Stages are timed with time.perf_counter, so
+# they are monotonic, except glass_to_glass which compares the capture
+# time in ImageData.identifier with this machine's clock.
+#
+#   start = time.perf_counter()
+#   mlx.getFrame(frame)
+#   metrics.since('getFrame', start)
+class Metrics:
+    def __init__(self, window=1024, prefix='thermal'):
+        self.window = window
+        self.prefix = prefix
+        self.histograms = {}
+        self.counters = {}
+        # (name, labels): value of every gauge
+        self.gauges = {}
+        self._started = time.monotonic()
+
+    def observe(self, stage, seconds):
+        histogram = self.histograms.get(stage)
+        if histogram is None:
+            histogram = self.histograms.setdefault(stage, RollingHistogram(self.window))
+        histogram.observe(seconds)
+
+    # Observes the time since start (a time.perf_counter value) and returns
+    # now, so consecutive stages can be chained
+    def since(self, stage, start):
+        now = time.perf_counter()
+        self.observe(stage, now - start)
+        return now
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    # Sets a gauge, labels tell apart the gauges of one name, e.g. sensor='mlx0'
+    def set_gauge(self, name, value, **labels):
+        self.gauges[name, tuple(sorted(labels.items()))] = value
+
+    # One line with p50/p95/p99 in ms of every stage and the counters' rates
+    def summary(self):
+        elapsed = max(time.monotonic() - self._started, 1e-9)
+        parts = []
+        for stage, histogram in list(self.histograms.items()):
+            quantiles = histogram.quantiles()
+            if quantiles is not None:
+                p50, p95, p99 = quantiles * 1000
+                parts.append(f'{stage} {p50:.1f}/{p95:.1f}/{p99:.1f}ms')
+        for name, value in list(self.counters.items()):
+            parts.append(f'{name} {value} ({value / elapsed:.1f}/s)')
+        for (name, labels), value in list(self.gauges.items()):
+            label = ','.join(str(text) for _, text in labels)
+            parts.append(f'{name}[{label}] {value:g}' if labels else f'{name} {value:g}')
+        return 'p50/p95/p99 ' + ' | '.join(parts) if parts else 'no samples yet'
+
+    # Prometheus text exposition format: a summary per stage, a counter per count
+    # and a gauge per gauge name
+    def prometheus_text(self):
+        lines = [f'# TYPE {self.prefix}_stage_seconds summary']
+        for stage, histogram in list(self.histograms.items()):
+            quantiles = histogram.quantiles()
+            if quantiles is None:
+                continue
+            for quantile, value in zip(QUANTILES, quantiles):
+                lines.append(f'{self.prefix}_stage_seconds{{stage="{stage}",quantile="{quantile}"}} {value:.6f}')
+            lines.append(f'{self.prefix}_stage_seconds_sum{{stage="{stage}"}} {histogram.total:.6f}')
+            lines.append(f'{self.prefix}_stage_seconds_count{{stage="{stage}"}} {histogram.count}')
+        for name, value in list(self.counters.items()):
+            lines.append(f'# TYPE {self.prefix}_{name}_total counter')
+            lines.append(f'{self.prefix}_{name}_total {value}')
+        typed = set()
+        for (name, labels), value in sorted(list(self.gauges.items())):
+            if name not in typed:
+                typed.add(name)
+                lines.append(f'# TYPE {self.prefix}_{name} gauge')
+            label = ','.join(f'{key}="{text}"' for key, text in labels)
+            lines.append(f'{self.prefix}_{name}{{{label}}} {value:g}' if labels else f'{self.prefix}_{name} {value:g}')
+        return '\n'.join(lines) + '\n'
+
+    # For node_exporter's textfile collector. Written to a temporary file and
+    # renamed, so a scrape never sees half a file.
+    def write_prometheus(self, path):
+        temporary = f'{path}.{os.getpid()}.tmp'
+        with open(temporary, 'w') as file:
+            file.write(self.prometheus_text())
+        os.replace(temporary, path)
+
+    # Serves prometheus_text() on http://0.0.0.0:port/metrics from a daemon thread
+    def serve_prometheus(self, port):
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = metrics.prometheus_text().encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer(('', port), Handler)
+        threading.Thread(target=server.serve_forever, name='metrics', daemon=True).start()
+        return server
+
+
+# Logs metrics.summary() (with extra() in front, if given) and rewrites the
+# Prometheus file every interval seconds, until cancelled
+async def report(metrics, interval=10.0, prometheus_file=None, extra=None):
+    while True:
+        await asyncio.sleep(interval)
+        line = metrics.summary()
+        if extra is not None:
+            line = f'{extra()} | {line}'
+        logging.info(line)
+        if prometheus_file:
+            metrics.write_prometheus(prometheus_file)
@@ -0,0 +1,247 @@
+import time
+import asyncio
+import logging
+
+from capture_pipeline import REFRESH_RATES, frame_period
+
+
+# Hz of an adafruit_mlx90640.RefreshRate value, per subpage like the names in REFRESH_RATES
+def rate_hz(rate):
+    return 0.5 * 2 ** rate
+
+
+# Steps one camera's refresh rate between min_rate and max_rate (RefreshRate
+# values) from what it managed over each interval. The rate goes down a step
+# when more than max_error_rate of the getFrame calls failed, when fewer than
+# slow_fraction of the frames the rate promises arrived because the bus can't
+# keep up, or when the caller says the pipeline behind the camera is
+# congested. It goes up a step after settle healthy intervals in a row.
+# Intervals are stretched until they hold at least min_frames frames, so slow
+# rates are judged over enough of them.
+# A rate the camera itself failed at is only tried again after backing off,
+# 4 * settle intervals at first and twice as long after each further failure,
+# so a camera close to its limit doesn't flap between two rates.
+#
+#   camera = CameraRate(mlx.refresh_rate, max_rate=REFRESH_RATES['32'])
+#   rate = camera.update(frames_read, read_errors)
+#   if rate is not None:
+#       mlx.refresh_rate = rate
+class CameraRate:
+    def __init__(self, rate, min_rate=REFRESH_RATES['0.5'], max_rate=REFRESH_RATES['16'], max_error_rate=0.05,
+                 slow_fraction=0.5, settle=3, max_backoff=64, min_frames=4):
+        if min_rate > max_rate:
+            raise ValueError('min_rate must not be above max_rate')
+        self.rate = min(max(rate, min_rate), max_rate)
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.max_error_rate = max_error_rate
+        self.slow_fraction = slow_fraction
+        self.settle = settle
+        self.max_backoff = max_backoff
+        self.min_frames = min_frames
+        # why the last change was made, for the log
+        self.reason = ''
+        self._healthy = 0
+        self._ceiling = None
+        self._backoff = 4 * settle
+        self._wait = 0
+        self._last = None
+        self._resume = 0.0
+
+    # Takes the running totals of frames read and read errors and returns the
+    # new rate when it changed, None otherwise. After a change, the frame
+    # still being read at the old rate is left out of the next interval.
+    def update(self, frames, errors, congested=False, healthy=True, now=None):
+        now = time.monotonic() if now is None else now
+        if self._last is None or now < self._resume:
+            self._last = (frames, errors, now)
+            return None
+        last = self._last
+        seconds = now - last[2]
+        expected = seconds / frame_period(self.rate)
+        if expected < self.min_frames:
+            return None
+        self._last = (frames, errors, now)
+
+        frames, errors = frames - last[0], errors - last[1]
+        reads = frames + errors
+        error_rate = errors / reads if reads else 0.0
+
+        if error_rate > self.max_error_rate:
+            return self._fail(f'{error_rate:.0%} of reads failed', now)
+        if frames < self.slow_fraction * expected:
+            return self._fail(f'{frames / seconds:.1f} of {1 / frame_period(self.rate):g} frames/s', now)
+        if congested:
+            return self._step(self.rate - 1, 'pipeline congested', now)
+
+        if not healthy:
+            self._healthy = 0
+            return None
+        self._healthy += 1
+        self._wait = max(0, self._wait - 1)
+        if self._ceiling == self.rate and self._healthy >= self.settle:
+            # the rate that failed before held up this time
+            self._ceiling = None
+            self._backoff = 4 * self.settle
+        if self._healthy < self.settle or self.rate >= self.max_rate:
+            return None
+        if self._ceiling == self.rate + 1 and self._wait:
+            return None
+        return self._step(self.rate + 1, f'{self._healthy} healthy intervals', now)
+
+    # The camera couldn't keep up at this rate, back off before trying it again
+    def _fail(self, reason, now):
+        if self._ceiling == self.rate:
+            self._backoff = min(self._backoff * 2, self.max_backoff)
+        self._ceiling = self.rate
+        self._wait = self._backoff
+        return self._step(self.rate - 1, reason, now)
+
+    def _step(self, rate, reason, now):
+        self._healthy = 0
+        rate = min(max(rate, self.min_rate), self.max_rate)
+        if rate == self.rate:
+            return None
+        self._resume = now + frame_period(self.rate)
+        self._last = None
+        self.rate = rate
+        self.reason = reason
+        return rate
+
+
+# Finds the highest frame rate the cameras and the upload sustain, every
+# interval seconds while the uploader runs. Each camera's refresh rate is
+# stepped by its own CameraRate from its CaptureWorker's frames and read
+# errors. The upload side is judged by the sender's queue fill, dropped
+# frames and the mean Insert latency over the interval (from metrics, which
+# the client has to share):
+#   - the queue above high_water, drops, or Inserts slower than max_latency
+#     double the sender's batch_size and batch_interval, up to max_batch and
+#     max_interval, so fewer and larger Inserts carry the same frames.
+#   - once the batches are at their largest, a queue above high_water or
+#     drops step the fastest cameras down. Slow Inserts alone don't, a server
+#     that is slow but keeps up doesn't get faster with fewer frames.
+#   - the cameras only step up while the queue stays below low_water without
+#     drops. Once Inserts also take under half of max_latency for settle
+#     intervals, the batches shrink back towards their starting size.
+# While a SpoolSender's sends fail the server is down, which says nothing
+# about capacity, so nothing changes.
+#
+# The decisions are counted in metrics as rate_increases, rate_decreases and
+# batch_resizes, and the refresh_hz of every sensor, batch_size and
+# batch_interval are kept as gauges. Rate changes are handed to the capture
+# threads, so the sensor is never reconfigured in the middle of a getFrame.
+class RateController:
+    def __init__(self, sources, captures, sender, metrics, min_rate='0.5', max_rate='16', interval=5.0,
+                 max_error_rate=0.05, high_water=0.5, low_water=0.1, max_latency=0.5, max_batch=64,
+                 max_interval=8.0, settle=3):
+        self.sources = sources
+        self.captures = captures
+        self.sender = sender
+        self.metrics = metrics
+        self.interval = interval
+        self.high_water = high_water
+        self.low_water = low_water
+        self.max_latency = max_latency
+        self.max_batch = max(max_batch, sender.batch_size)
+        self.max_interval = max(max_interval, sender.batch_interval)
+        self.settle = settle
+        self.cameras = [CameraRate(source.refresh_rate, REFRESH_RATES[min_rate], REFRESH_RATES[max_rate],
+                                   max_error_rate=max_error_rate, settle=settle)
+                        for source in sources]
+        self._base_batch = (sender.batch_size, sender.batch_interval)
+        self._healthy = 0
+        self._dropped = sender.dropped
+        self._failed_sends = getattr(sender, 'failed_sends', 0)
+        self._inserts = (0, 0.0)
+        self._latency = None
+        for source, capture, camera in zip(sources, captures, self.cameras):
+            if camera.rate != source.refresh_rate:
+                self._apply(source, capture, camera.rate)
+            self.metrics.set_gauge('refresh_hz', rate_hz(camera.rate), sensor=source.sensor_id)
+        self._batch_gauges()
+
+    # Mean seconds per Insert since the last call, the last mean again when
+    # no Insert finished since (large batches can take longer than an
+    # interval), None before the first one
+    def _insert_latency(self):
+        histogram = self.metrics.histograms.get('Insert')
+        if histogram is None:
+            return None
+        count, total = self._inserts
+        if histogram.count > count:
+            self._inserts = (histogram.count, histogram.total)
+            self._latency = (histogram.total - total) / (histogram.count - count)
+        return self._latency
+
+    def _batch_gauges(self):
+        self.metrics.set_gauge('batch_size', self.sender.batch_size)
+        self.metrics.set_gauge('batch_interval', self.sender.batch_interval)
+
+    def _resize_batches(self, batch_size, batch_interval, reason):
+        if (batch_size, batch_interval) == (self.sender.batch_size, self.sender.batch_interval):
+            return
+        logging.info(f'Batches of {self.sender.batch_size} frames/{self.sender.batch_interval:g}s -> '
+                     f'{batch_size}/{batch_interval:g}s ({reason})')
+        self.sender.batch_size, self.sender.batch_interval = batch_size, batch_interval
+        self.metrics.count('batch_resizes')
+        self._batch_gauges()
+
+    # Sets the sensor's rate between two reads of the capture thread
+    def _apply(self, source, capture, rate):
+        def change():
+            source.refresh_rate = rate
+            capture.period = frame_period(rate)
+        capture.call_soon(change)
+
+    # One round of decisions, normally called by run()
+    def update(self, now=None):
+        sender = self.sender
+        fill = sender.queue_fill
+        dropped, self._dropped = sender.dropped - self._dropped, sender.dropped
+        failed_sends = getattr(sender, 'failed_sends', 0)
+        failed, self._failed_sends = failed_sends > self._failed_sends, failed_sends
+        latency = self._insert_latency()
+        if failed:
+            self._healthy = 0
+            return
+
+        slow = latency is not None and latency > self.max_latency
+        congested = fill > self.high_water or dropped > 0
+        healthy = fill < self.low_water and not dropped
+        base_size, base_interval = self._base_batch
+        if (congested or slow) and sender.batch_size < self.max_batch:
+            self._healthy = 0
+            self._resize_batches(min(sender.batch_size * 2, self.max_batch),
+                                 min(sender.batch_interval * 2, self.max_interval),
+                                 f'Insert {latency * 1000:.0f}ms' if slow else f'queue {fill:.0%}, {dropped} dropped')
+            # see what the larger batches do before slowing the cameras down
+            congested = False
+        elif healthy and (latency is None or latency < self.max_latency / 2):
+            self._healthy += 1
+            if self._healthy >= self.settle and sender.batch_size > base_size:
+                self._healthy = 0
+                self._resize_batches(max(sender.batch_size // 2, base_size),
+                                     max(sender.batch_interval / 2, base_interval), 'uploads keep up')
+        else:
+            self._healthy = 0
+
+        fastest = max(camera.rate for camera in self.cameras)
+        for source, capture, camera in zip(self.sources, self.captures, self.cameras):
+            before = camera.rate
+            rate = camera.update(capture.captured, capture.read_errors,
+                                 congested=congested and camera.rate == fastest, healthy=healthy, now=now)
+            if rate is None:
+                continue
+            logging.info(f'{source.sensor_id}: {rate_hz(before):g} Hz -> {rate_hz(rate):g} Hz ({camera.reason})')
+            self.metrics.count('rate_increases' if rate > before else 'rate_decreases')
+            self.metrics.set_gauge('refresh_hz', rate_hz(rate), sensor=source.sensor_id)
+            self._apply(source, capture, rate)
+
+    # Calls update() every interval seconds until cancelled
+    async def run(self):
+        for camera, capture in zip(self.cameras, self.captures):
+            camera.update(capture.captured, capture.read_errors)
+        while True:
+            await asyncio.sleep(self.interval)
+            self.update()
@@ -0,0 +1,37 @@
+import struct
+
+# Recordings are serialized ImageData messages back to back, each one preceded
+# by its length as a little-endian uint32
+_LENGTH = struct.Struct('<I')
+
+
+class RecordingWriter:
+    def __init__(self, path):
+        self.file = open(path, 'ab')
+
+    def write(self, serialized_image):
+        self.file.write(_LENGTH.pack(len(serialized_image)))
+        self.file.write(serialized_image)
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+# Yields the serialized messages of a recording, a record cut short by a crash is ignored
+def read_recording(path):
+    with open(path, 'rb') as file:
+        while True:
+            header = file.read(_LENGTH.size)
+            if len(header) < _LENGTH.size:
+                return
+            (length,) = _LENGTH.unpack(header)
+            serialized_image = file.read(length)
+            if len(serialized_image) < length:
+                return
+            yield serialized_image
@@ -0,0 +1,154 @@
+import time
+import argparse
+import numpy as np
+
+from common import image_pb2
+import thermal
+from delta_codec import DeltaDecoder
+from export import open_frames
+from archive import ARCHIVE_SUFFIX, ArchiveReader
+from recording import read_recording
+
+
+# Decodes a recording frame by frame, yields (image_data, frame) with frame None
+# for deltas that can't be rebuilt because frames before them are missing
+def replay_frames(path, sensor=None):
+    decoder = DeltaDecoder()
+    for serialized_image in read_recording(path):
+        image_data = image_pb2.ImageData.FromString(serialized_image)
+        if sensor is not None and image_data.sensor_id != sensor:
+            continue
+        yield image_data, decoder.decode(image_data)
+
+
+# .npy files are written by export.py, anything else is an image_client.py --record recording
+def is_export(path):
+    return path.endswith('.npy')
+
+
+# .mlxa archives are written by export.py too, they keep every frame's sensor id
+def is_archive(path):
+    return path.endswith(ARCHIVE_SUFFIX)
+
+
+# (identifier, frame) of every frame that can be shown, in capture order.
+# .npy exports hold a single sensor's frames already, sensor filters recordings
+# and archives. Archives are decoded a chunk at a time.
+def timed_frames(path, sensor=None):
+    if is_archive(path):
+        with ArchiveReader(path) as archive:
+            for batch in archive.batches(sensor=sensor):
+                yield from zip(batch.identifiers, batch.temperatures())
+        return
+
+    if is_export(path):
+        exported = open_frames(path)
+        for index in range(len(exported)):
+            yield exported['identifier'][index], exported['frame'][index]
+        return
+
+    for image_data, frame in replay_frames(path, sensor):
+        if frame is not None:
+            yield image_data.identifier, frame
+
+
+# The rebuilt frames of a recording or export as one (N, 24, 32) batch with
+# their identifiers. .npy exports are memory-mapped rather than read.
+def load_frames(path, sensor=None):
+    if is_archive(path):
+        with ArchiveReader(path) as archive:
+            return archive.load(sensor=sensor)
+
+    if is_export(path):
+        exported = open_frames(path)
+        return exported['identifier'], exported['frame']
+
+    identifiers = []
+    frames = []
+    for image_data, frame in replay_frames(path, sensor):
+        if frame is not None:
+            identifiers.append(image_data.identifier)
+            frames.append(frame)
+    if not frames:
+        return np.empty(0), np.empty((0,) + thermal.MLX_SHAPE, dtype=np.float32)
+    return np.array(identifiers), np.stack(frames)
+
+
+# Shows a recording or export in the training client's window, speed 2 plays
+# twice as fast as it was captured, 0 as fast as frames can be drawn
+def show(path, sensor=None, speed=1.0):
+    import training_client
+
+    frames = timed_frames(path, sensor)
+    start = time.monotonic()
+    start_identifier = None
+
+    # shows one frame and schedules the next one at its time on the Tk thread
+    def show_next(frame=None):
+        nonlocal start_identifier
+        if frame is not None:
+            training_client.update_img(frame)
+        for identifier, frame in frames:
+            if start_identifier is None:
+                start_identifier = identifier
+            due = start + (identifier - start_identifier) / speed if speed > 0 else 0.0
+            delay = max(0, int((due - time.monotonic()) * 1000))
+            training_client.root.after(delay, show_next, frame)
+            return
+
+    training_client.root.after(0, show_next)
+    training_client.root.mainloop()
+
+
+# Prints how many frames could be rebuilt and the bytes per frame of each encoding
+def stats(path, sensor=None):
+    if is_export(path) or is_archive(path):
+        identifiers, frames = load_frames(path, sensor)
+        print(f'Frames exported: {len(frames)}')
+        if len(frames):
+            print(f'Captured over {identifiers[-1] - identifiers[0]:.1f}s')
+            print_temperatures(frames)
+        return
+
+    frames = []
+    missed = 0
+    payload_bytes = {}
+    for image_data, frame in replay_frames(path, sensor):
+        encoding = image_pb2.PixelEncoding.Name(image_data.encoding)
+        count, size = payload_bytes.get(encoding, (0, 0))
+        payload_bytes[encoding] = (count + 1, size + image_data.ByteSize())
+        if frame is None:
+            missed += 1
+        else:
+            frames.append(frame)
+
+    print(f'Frames rebuilt: {len(frames)}, waiting on a keyframe: {missed}')
+    for encoding, (count, size) in sorted(payload_bytes.items()):
+        print(f'{encoding:<16} {count:>8} messages {size / count:>10.0f} bytes/message')
+
+    if frames:
+        print_temperatures(np.stack(frames))
+
+
+# The whole recording in one pass over a (N, 24, 32) batch
+def print_temperatures(frames):
+    low, high = thermal.frame_range(frames)
+    print(f'Temperatures: coldest {low.min():.1f}, hottest {high.max():.1f}, '
+          f'mean frame range {np.mean(high - low):.1f} (celsius)')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Replay frames recorded with image_client.py --record or export.py')
+    parser.add_argument('recording',
+                        help='File written by image_client.py --record, or a .npy or .mlxa from export.py')
+    parser.add_argument('--sensor', help='Only replay frames from this sensor id')
+    parser.add_argument('--speed', type=float, default=1.0,
+                        help='Playback speed relative to capture, 0 plays as fast as possible')
+    parser.add_argument('--stats', action='store_true', help='Print decoding statistics instead of showing frames')
+
+    args = parser.parse_args()
+
+    if args.stats:
+        stats(args.recording, sensor=args.sensor)
+    else:
+        show(args.recording, sensor=args.sensor, speed=args.speed)
@@ -0,0 +1,102 @@
+import math
+import time
+import random
+import logging
+import numpy as np
+
+from capture_pipeline import REFRESH_RATES, frame_period
+
+MLX_ADDRESS = 0x33  # default I2C address of the mlx90640
+FRAME_SHAPE = (24, 32)
+SYNTHETIC_MODES = ('scene', 'uniform')
+
+
+# An MLX90640 on an I2C bus. The hardware libraries are only imported here so
+# the rest of the pipeline also runs on machines without a camera.
+class MLXSource:
+    def __init__(self, sensor_id, bus=None, address=MLX_ADDRESS, refresh_rate='4'):
+        import adafruit_mlx90640
+
+        self.sensor_id = sensor_id
+        if bus is None:
+            # the Pi's default I2C pins
+            import board
+            import busio
+            i2c = busio.I2C(board.SCL, board.SDA)
+        else:
+            # other buses by number, e.g. ones added with dtoverlay=i2c-gpio
+            from adafruit_extended_bus import ExtendedI2C
+            i2c = ExtendedI2C(bus)
+
+        self.mlx = adafruit_mlx90640.MLX90640(i2c, address=address)
+        logging.info(f"MLX {sensor_id} addr detected on I2C {[hex(i) for i in self.mlx.serial_number]}")
+
+        # if using higher refresh rates yields a 'too many retries' exception,
+        # try decreasing this value to work with certain pi/camera combinations
+        self.mlx.refresh_rate = REFRESH_RATES[refresh_rate]
+
+    @property
+    def refresh_rate(self):
+        return self.mlx.refresh_rate
+
+    @refresh_rate.setter
+    def refresh_rate(self, rate):
+        self.mlx.refresh_rate = rate
+
+    def read_frame(self, frame):
+        self.mlx.getFrame(frame)
+
+
+# Stand-in camera for load testing the pipeline without hardware. 'uniform' is
+# the old random.uniform noise, 'scene' is a warm blob drifting over a room
+# temperature background, so consecutive frames are correlated like real ones.
+# With bus_limit, a refresh rate name like '8', reads at faster rates fail half
+# of the time with the ValueError of a camera whose bus can't keep up, after
+# taking as long as a frame.
+class SyntheticSource:
+    def __init__(self, sensor_id, refresh_rate='4', mode='scene', seed=None, bus_limit=None):
+        if mode not in SYNTHETIC_MODES:
+            raise ValueError(f'Unknown synthetic mode: {mode}')
+        self.sensor_id = sensor_id
+        self.refresh_rate = REFRESH_RATES[refresh_rate]
+        self.bus_limit = REFRESH_RATES[bus_limit] if bus_limit else None
+        self.mode = mode
+        self._random = random.Random(seed)
+        self._rng = np.random.default_rng(seed)
+        self._rows, self._cols = np.mgrid[0:FRAME_SHAPE[0], 0:FRAME_SHAPE[1]]
+        self._t = self._random.uniform(0, 1000)
+
+    def read_frame(self, frame):
+        if self.bus_limit is not None and self.refresh_rate > self.bus_limit and self._random.random() < 0.5:
+            time.sleep(frame_period(self.refresh_rate))
+            raise ValueError('Too many retries')
+        if self.mode == 'uniform':
+            for f in range(len(frame)):
+                frame[f] = self._random.uniform(0.0, 100.0)
+            return
+
+        self._t += 1
+        center_row = 11.5 + 7 * math.sin(self._t / 40)
+        center_col = 15.5 + 11 * math.cos(self._t / 55)
+        distance = (self._rows - center_row) ** 2 + (self._cols - center_col) ** 2
+        scene = 22 + 12 * np.exp(-distance / 18) + self._rng.normal(0, 0.15, FRAME_SHAPE)
+        frame[:] = scene.ravel().tolist()
+
+
+# Parses a --sensor spec of the form NAME[:BUS[:ADDRESS[:RATE]]], for example
+# 'left:3:0x33:8'. An empty BUS means the default board.SCL/board.SDA pins.
+def parse_sensor_spec(spec, default_rate='4'):
+    parts = spec.split(':')
+    if not parts[0] or len(parts) > 4:
+        raise ValueError(f'Invalid sensor spec {spec!r}, expected NAME[:BUS[:ADDRESS[:RATE]]]')
+    parts += [''] * (4 - len(parts))
+    name, bus, address, rate = parts
+
+    if rate and rate not in REFRESH_RATES:
+        raise ValueError(f'Invalid refresh rate {rate!r} in sensor spec {spec!r}')
+    return {
+        'sensor_id': name,
+        'bus': int(bus) if bus else None,
+        'address': int(address, 0) if address else MLX_ADDRESS,
+        'refresh_rate': rate or default_rate,
+    }
@@ -0,0 +1,315 @@
+import mmap
+import time
+import zlib
+import struct
+import asyncio
+import logging
+import threading
+import collections
+import grpc
+
+from common import generic_pb2
+from db_stub import InsertRequest
+
+# File header: magic, version, size of the record area, head and tail
+# positions and the number of records dropped to make room. Positions count
+# bytes ever written, their offset in the record area is position % size.
+_HEADER = struct.Struct('<8sIIQQQQ')
+_MAGIC = b'MLXSPOOL'
+_VERSION = 1
+_DATA_START = 4096  # records start on the second page
+
+# Record: payload length, crc32 of the payload, identifier, payload. A length
+# of 0 (or less room than a record header) means the records carry on at the
+# start of the record area.
+_RECORD = struct.Struct('<IId')
+
+# Codes the spool sender keeps retrying through, the frames wait in the spool
+SPOOL_RETRY_CODES = (grpc.StatusCode.UNAVAILABLE, grpc.StatusCode.DEADLINE_EXCEEDED,
+                     grpc.StatusCode.RESOURCE_EXHAUSTED)
+
+
+# A fixed size memory-mapped ring file of serialized frames. Frames are
+# appended at the tail and stay in the file until ack() moves the head past
+# them, so frames that were being sent when the process died are sent again
+# after a restart. The file never grows: when it is full the oldest frames are
+# dropped to make room, which keeps the footprint bounded on an SD card.
+class Spool:
+    def __init__(self, path, size=64 << 20, sync_interval=1.0):
+        if size < 4 * _RECORD.size:
+            raise ValueError('spool size is too small')
+        self.path = path
+        self.sync_interval = sync_interval
+        self._cond = threading.Condition()
+        self._closed = False
+        self._last_sync = time.monotonic()
+
+        with open(path, 'a+b') as file:
+            existing = file.seek(0, 2)
+            if existing and existing != _DATA_START + size:
+                raise ValueError(f'{path} is a {existing - _DATA_START} byte spool, not {size}')
+            file.truncate(_DATA_START + size)
+            self._map = mmap.mmap(file.fileno(), _DATA_START + size)
+
+        magic, version, stored_size, self.head, self.tail, self.dropped, _ = _HEADER.unpack_from(self._map, 0)
+        if magic != _MAGIC:
+            self.size = size
+            self.head = self.tail = self.dropped = 0
+            self._write_header()
+        elif version != _VERSION or stored_size != size:
+            raise ValueError(f'{path} is not a version {_VERSION} spool of {size} bytes')
+        else:
+            self.size = size
+            self._recover()
+
+    # Bytes waiting to be sent
+    @property
+    def backlog(self):
+        return self.tail - self.head
+
+    def _write_header(self):
+        _HEADER.pack_into(self._map, 0, _MAGIC, _VERSION, self.size, self.head, self.tail, self.dropped, 0)
+
+    # A crash can leave a record half written after the last one the header
+    # points past. Check every record and cut the spool at the first bad one.
+    def _recover(self):
+        position = self.head
+        while position < self.tail:
+            record = self._read(position)
+            if record is None:
+                logging.warning(f'{self.path}: dropping {self.tail - position} bytes after a damaged record')
+                self.tail = position
+                self._write_header()
+                break
+            position = record[0]
+
+    # Position of the record at or after position, skipping the wrap padding
+    def _skip_padding(self, position):
+        offset = position % self.size
+        if self.size - offset < _RECORD.size:
+            return position + self.size - offset
+        length = _RECORD.unpack_from(self._map, _DATA_START + offset)[0]
+        if length == 0:
+            return position + self.size - offset
+        return position
+
+    # (next position, identifier, payload) of the record at position, None if it is damaged
+    def _read(self, position):
+        position = self._skip_padding(position)
+        if position >= self.tail:
+            return None
+        start = _DATA_START + position % self.size
+        length, crc, identifier = _RECORD.unpack_from(self._map, start)
+        end = start + _RECORD.size + length
+        if end > _DATA_START + self.size or position + _RECORD.size + length > self.tail:
+            return None
+        payload = self._map[start + _RECORD.size:end]
+        if zlib.crc32(payload) != crc:
+            return None
+        return position + _RECORD.size + length, identifier, payload
+
+    # Adds a frame at the tail, dropping the oldest frames when the spool is full
+    def append(self, identifier, payload):
+        needed = _RECORD.size + len(payload)
+        if needed > self.size // 2:
+            raise ValueError(f'{len(payload)} byte frame does not fit a {self.size} byte spool')
+
+        with self._cond:
+            if self._closed:
+                raise RuntimeError('append() on a closed Spool')
+
+            # a record never straddles the end of the file, pad to the start instead
+            offset = self.tail % self.size
+            padding = self.size - offset if self.size - offset < needed else 0
+            while self.tail + padding + needed - self.head > self.size:
+                record = self._read(self.head)
+                self.head = record[0] if record is not None else self.tail
+                self.dropped += 1
+
+            if padding:
+                if padding >= _RECORD.size:
+                    _RECORD.pack_into(self._map, _DATA_START + offset, 0, 0, 0.0)
+                self.tail += padding
+
+            start = _DATA_START + self.tail % self.size
+            _RECORD.pack_into(self._map, start, len(payload), zlib.crc32(payload), identifier)
+            self._map[start + _RECORD.size:start + needed] = payload
+            # the tail only moves past a record once it is completely written
+            self.tail += needed
+            self._write_header()
+            self._cond.notify_all()
+
+    # Waits for a frame, then up to max_wait seconds for max_items of them.
+    # A backlog bigger than max_items (after an outage) is handed out in bulk,
+    # up to max_bytes at once. Frames stay in the spool until ack(end).
+    # Returns (end, [(identifier, payload), ...]), an empty list once the spool
+    # is closed and empty.
+    def peek_batch(self, max_items, max_wait, max_bytes=1 << 20):
+        with self._cond:
+            while self.head == self.tail and not self._closed:
+                self._cond.wait()
+
+            deadline = time.monotonic() + max_wait
+            while not self._closed and self._count(max_items) < max_items:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+
+            records = []
+            size = 0
+            position = self.head
+            while position < self.tail:
+                record = self._read(position)
+                if record is None:
+                    break
+                next_position, identifier, payload = record
+                if len(records) >= max_items and size + len(payload) > max_bytes:
+                    break
+                records.append((identifier, payload))
+                size += len(payload)
+                position = next_position
+            return position, records
+
+    # Number of records waiting, counting at most upto of them
+    def _count(self, upto):
+        count = 0
+        position = self.head
+        while position < self.tail and count < upto:
+            record = self._read(position)
+            if record is None:
+                break
+            position = record[0]
+            count += 1
+        return count
+
+    # The frames before end were delivered and can be overwritten
+    def ack(self, end):
+        with self._cond:
+            if end > self.head:
+                self.head = end
+                self._write_header()
+            if time.monotonic() - self._last_sync >= self.sync_interval:
+                # survive a power cut too, not just a crash of this process
+                self._map.flush()
+                self._last_sync = time.monotonic()
+
+    # Wakes peek_batch, what is still spooled is sent on the next start
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def release(self):
+        self._map.flush()
+        self._map.close()
+
+
+# Store-and-forward sender. Frames are serialized on the capture threads and
+# appended to a Spool, one worker drains it with multi-protobuf Inserts. Sends
+# that fail while the server is unreachable are retried with backoff for as
+# long as it takes, and a frame is only removed from the spool once its Insert
+# succeeded, so every frame is delivered at least once. The server keeps one
+# row per identifier, a resent frame comes back as DUPLICATE_ENTRY and counts
+# as delivered. The last max_acked identifiers the server acknowledged in this
+# run are remembered, and records with one of those are acked again without
+# sending them.
+class SpoolSender:
+    def __init__(self, client, spool, keyspace='imageKeyspace', batch_size=8, batch_interval=1.0,
+                 backlog_bytes=1 << 20, serialize=None, type_url='ImageData', max_acked=4096):
+        if batch_size < 1:
+            raise ValueError('batch_size must be at least 1')
+        self.client = client
+        self.spool = spool
+        self.keyspace = keyspace
+        self.batch_size = batch_size
+        self.batch_interval = batch_interval
+        self.backlog_bytes = backlog_bytes
+        self.serialize = serialize
+        self.type_url = type_url
+        self.frames_sent = 0
+        self.batches_sent = 0
+        self.duplicates = 0
+        self.skipped = 0
+        self.failed_sends = 0
+        self._acked = set()
+        self._acked_order = collections.deque(maxlen=max_acked)
+        self._lock = threading.Lock()
+        self._stopping = False
+
+    @property
+    def dropped(self):
+        return self.spool.dropped
+
+    # How full the spool is, from 0 to 1
+    @property
+    def queue_fill(self):
+        return self.spool.backlog / self.spool.size
+
+    # Called from the capture threads, serialize runs under a lock so stateful
+    # encoders and recordings see one frame at a time
+    def submit(self, item):
+        with self._lock:
+            identifier, serialized_image = self.serialize(item)
+            self.spool.append(identifier, serialized_image)
+
+    # Sends what is already spooled if the server is up and returns from run(),
+    # anything left is sent after the next start
+    def stop(self):
+        self._stopping = True
+        self.spool.close()
+
+    def _remember(self, identifier):
+        if len(self._acked_order) == self._acked_order.maxlen:
+            self._acked.discard(self._acked_order[0])
+        self._acked_order.append(identifier)
+        self._acked.add(identifier)
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        request = InsertRequest(self.keyspace, self.type_url)
+        attempt = 0
+        while True:
+            end, records = await loop.run_in_executor(None, self.spool.peek_batch, self.batch_size,
+                                                      self.batch_interval, self.backlog_bytes)
+            if not records:
+                return
+
+            request.clear()
+            identifiers = []
+            for identifier, payload in records:
+                if identifier in self._acked:
+                    self.skipped += 1
+                    continue
+                identifiers.append(identifier)
+                request.add(payload)
+            if not identifiers:
+                self.spool.ack(end)
+                continue
+            try:
+                response = await self.client.insert_encoded(request)
+            except grpc.RpcError as e:
+                if e.code() not in SPOOL_RETRY_CODES:
+                    raise
+                self.failed_sends += 1
+                if self._stopping:
+                    logging.info(f'Server unreachable, leaving {self.spool.backlog} bytes in {self.spool.path}')
+                    return
+                delay = self.client.retry_delay(attempt)
+                logging.warning(f'{e.code().name}, keeping {self.spool.backlog} bytes spooled, '
+                                f'retrying in {delay:.1f}s')
+                await asyncio.sleep(delay)
+                attempt += 1
+                continue
+
+            attempt = 0
+            if response.status == generic_pb2.DUPLICATE_ENTRY:
+                self.duplicates += len(response.errs)
+            elif response.status == generic_pb2.FAILED:
+                logging.warning(f'Insert of {len(identifiers)} spooled frames failed: {response.errs[:1]}')
+            self.spool.ack(end)
+            for identifier in identifiers:
+                self._remember(identifier)
+            self.frames_sent += len(identifiers)
+            self.batches_sent += 1
+            logging.debug('Sent batch of %d spooled frames (%d total)', len(identifiers), self.frames_sent)
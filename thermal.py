@@ -0,0 +1,97 @@
+import numpy as np
+
+import frame_codec
+
+MLX_SHAPE = frame_codec.MLX_SHAPE
+
+# Colormap anchor colors from coldest to hottest, interpolated into 256 entry tables
+COLORMAPS = {
+    'gray': [(0, 0, 0), (255, 255, 255)],
+    'inferno': [(0, 0, 4), (31, 12, 72), (85, 15, 109), (136, 34, 106), (186, 54, 85),
+                (227, 89, 51), (249, 140, 10), (249, 201, 50), (252, 255, 164)],
+}
+
+# The processing stages shared by the viewers and offline tools. Every stage
+# takes a single (24, 32) frame or a (N, 24, 32) batch, works on the last two
+# axes only and writes into out when one is passed, so a caller can keep its
+# buffers for the whole run. out may be the input array itself.
+
+
+# Flat getFrame/decoded values as (24, 32) for one frame or (N, 24, 32) for several
+def as_frames(values, shape=MLX_SHAPE):
+    values = np.asarray(values)
+    if values.size == shape[0] * shape[1]:
+        return values.reshape(shape)
+    return values.reshape((-1,) + tuple(shape))
+
+
+def celsius_to_fahrenheit(frames, out=None):
+    out = np.multiply(frames, 1.8, out=out)
+    return np.add(out, 32, out=out)
+
+
+# The mlx90640 sees the scene mirrored, mirror flips it left to right and flip
+# upside down for cameras mounted the other way round. Without out this returns
+# a view, nothing is copied.
+def orient(frames, out=None, mirror=True, flip=False):
+    view = frames
+    if mirror:
+        view = view[..., ::-1]
+    if flip:
+        view = view[..., ::-1, :]
+    if out is None:
+        return view
+    # copyto buffers the overlap itself when out is frames
+    np.copyto(out, view, casting='unsafe')
+    return out
+
+
+# Coldest and hottest temperature of each frame, as arrays that broadcast
+# against the frames (shape (N, 1, 1) for a batch)
+def frame_range(frames, low=None, high=None):
+    low = np.min(frames, axis=(-2, -1), keepdims=True, out=low)
+    high = np.max(frames, axis=(-2, -1), keepdims=True, out=high)
+    return low, high
+
+
+# Spreads each frame over [0, levels - 1], from its own coldest to hottest
+# pixel unless a fixed low/high range is given. Frames without any range to
+# spread come out all 0.
+def normalize(frames, out=None, low=None, high=None, levels=256):
+    if low is None or high is None:
+        frame_low, frame_high = frame_range(frames)
+        low = frame_low if low is None else low
+        high = frame_high if high is None else high
+
+    span = np.subtract(high, low, dtype=np.float32)
+    scale = np.divide(levels - 1, span, out=np.zeros_like(span), where=span > 0)
+    out = np.subtract(frames, low, out=out, casting='unsafe')
+    return np.multiply(out, scale, out=out, casting='unsafe')
+
+
+# 256x4 RGBA lookup table for a colormap
+def colormap_lut(name='gray'):
+    anchors = np.array(COLORMAPS[name], dtype=np.float64)
+    positions = np.linspace(0, 255, len(anchors))
+    lut = np.empty((256, 4), dtype=np.uint8)
+    for channel in range(3):
+        lut[:, channel] = np.rint(np.interp(np.arange(256), positions, anchors[:, channel]))
+    lut[:, 3] = 255
+    return lut
+
+
+# Looks normalized frames up in a colormap_lut, giving (..., 24, 32, 4) RGBA.
+# np.take wants intp indices, anything else is converted on every call, so
+# callers that colormap often pass an intp index buffer in.
+def colormap(levels, lut, out=None, index=None):
+    if index is None:
+        index = np.empty(levels.shape, dtype=np.intp)
+    np.copyto(index, levels, casting='unsafe')
+    if out is None:
+        out = np.empty(levels.shape + (4,), dtype=np.uint8)
+
+    # colors are moved around as one uint32 per RGBA pixel. mode='clip' writes
+    # straight into out, the default mode buffers it first
+    lut32 = np.ascontiguousarray(lut).view(np.uint32).ravel()
+    np.take(lut32, index, out=out.view(np.uint32).reshape(levels.shape), mode='clip')
+    return out
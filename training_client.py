@@ -1,4 +1,3 @@
-import sys
 import grpc
 import argparse
 import os
@@ -6,99 +5,394 @@ from PIL import Image, ImageTk # This is Pillow from Ubuntu Dockerfile
 import numpy as np
 import tkinter as tk
 import time
-
-# Change directory to Routes so we can import the protobufs
-current_directory = sys.path[0]
-routes_directory = current_directory + '/common'
-sys.path.insert(1, routes_directory)
+import math
+import asyncio
+import logging
+import threading
 
 # get grpc / proto definitions
 from google.protobuf import any_pb2
-import image_pb2
-import image_pb2_grpc
-import generic_pb2
-import generic_pb2_grpc
+from common import image_pb2
+from common import image_pb2_grpc
+import frame_codec
+from aio_client import AsyncDBClient, RETRY_CODES
+import channels
+from delta_codec import DeltaDecoder
+from frame_cache import FrameCache, peek_identifier
+from frame_renderer import FrameRenderer, COLORMAPS, INTERPOLATIONS
+from frame_slot import LatestFrameSlot
+from metrics import Metrics, report
 
 def on_close():
+    global window_open
+    window_open = False
     root.destroy()
 
-# Create a Tkinter window
+# Create a Tkinter window, every camera gets a tile in it
 root = tk.Tk()
 root.title("Thermal Image Viewer")
-# Create a Tkinter Label to display the image
-label = tk.Label(root)
-label.pack()
 root.protocol("WM_DELETE_WINDOW", on_close) # to help not break stuff
+window_open = True
+# the arrow keys step through the cached frames, End goes back to live frames
+root.bind('<Left>', lambda event: scrub(-1))
+root.bind('<Right>', lambda event: scrub(1))
+root.bind('<End>', lambda event: go_live())
 
-# very bad global counter for now to go through data
-counter = 1
+# how often the Tk thread looks for newly rendered frames
+DRAW_INTERVAL_MS = 15
 
-def run(server_address='localhost', server_port=50051):
-    # Connect to the gRPC server
-    try:
-        with grpc.insecure_channel(f'{server_address}:{server_port}') as channel:
-            # Create a stub (client)
-            stub = generic_pb2_grpc.DBGenericStub(channel)
-
-            global counter
-            
-            # just run select queries
-            while True:
-                request = generic_pb2.protobuf_select_request(
-                    keyspace='imagekeyspace',
-                    table = 'imagedata',
-                    column = 'identifier',
-                    constraint = 'MAX'
-                )
-                response = stub.Select(request)
-                if(response != ''):
-                    # go through protobufs in the response
-                    for serial_msg in response.protobufs:
-                        image_data = image_pb2.ImageData() # conver to our proto class
-                        image_data.ParseFromString(serial_msg) # can use these fields from proto image_data.data or image_data.identifier
-                        
-                        frame = [float(j) for j in image_data.data.split(',')]
-                        
-                        update_img(frame)
-                        root.update_idletasks()
-                        root.update()   
-                        
-                        # close if the window disappears
-                        if not root.winfo_exists():
-                            break      
-                
-                time.sleep(.2)
-                #print(f'Server Response: {response}')
-    except grpc.RpcError as e:
+# identifier of the newest frame received from each sensor, anything at or before it has been decoded already.
+# A broken Subscribe resumes from the oldest of them, so no camera's rows are skipped.
+last_identifiers = {}
+# only show frames from these sensor_ids when several cameras upload to the same table
+sensor_filter = None
+# rebuilds keyframe/delta streams, the other encodings pass straight through
+decoder = DeltaDecoder()
+# Tile of each camera by sensor_id, in the order they first sent a frame
+tiles = {}
+tile_size = (600, 400)
+colormap_name = 'gray'
+interpolation_name = 'nearest'
+# Select, decode, render, draw and glass-to-glass (capture to shown) timings
+metrics = Metrics()
+# decoded frames and their rendered images, repeated rows are shown from here
+cache = FrameCache()
+# identifier of the cached frame shown while scrubbing back, None while showing live frames
+scrub_identifier = None
+# what stopped the network thread, shown once the window is closed
+network_error = None
+
+# One camera's stream. The network thread decodes its frames into frames,
+# the tile's render thread colormaps the newest one into images and the Tk
+# thread pastes the newest image into the tile's label. Each stage only picks
+# up the newest frame of the one before it, so a slow stage drops frames
+# instead of holding the others up.
+class Tile:
+    def __init__(self, sensor_id):
+        self.sensor_id = sensor_id
+        self.renderer = FrameRenderer(size=tile_size, colormap=colormap_name, interpolation=interpolation_name)
+        self.frames = LatestFrameSlot(lambda: np.empty(frame_codec.MLX_SHAPE, dtype=np.float32))
+        self.images = LatestFrameSlot(self.renderer.blank)
+        self.label = None  # created on the Tk thread
+        self.photo = None
+        self.shown = 0  # version of images last drawn
+        self._stop = threading.Event()
+
+    def start(self):
+        threading.Thread(target=self._render, name=f'render-{self.sensor_id}', daemon=True).start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def _render(self):
+        seen = 0
+        while not self._stop.is_set():
+            latest = self.frames.wait(seen, timeout=0.5)
+            if latest is None:
+                continue
+            seen, frame, identifier = latest
+            start = time.perf_counter()
+            rgba = self.renderer.render(frame, out=self.images.back())
+            cache.put(identifier, self.sensor_id, frame, rgba)
+            self.images.publish(identifier)
+            metrics.since('render', start)
+
+    # Pastes rgba into the label's PhotoImage, on the Tk thread
+    def draw(self, rgba):
+        image = Image.frombuffer('RGBA', tile_size, rgba, 'raw', 'RGBA', 0, 1)
+        if self.photo is None:
+            self.photo = ImageTk.PhotoImage(image)
+            self.label.configure(image=self.photo)
+        else:
+            self.photo.paste(image)
+
+def run(server_address='localhost', server_port=50051, mode='subscribe', max_in_flight=4, timeout=10.0,
+        sensor=None, colormap='gray', stats_interval=10.0, prometheus_file=None, prometheus_port=None,
+        cache_frames=256, cache_mb=64, size=(600, 400), channel_factory=None, interpolation='nearest'):
+    global sensor_filter, colormap_name, interpolation_name, tile_size, cache
+    # one sensor_id or a list of them, each gets a tile in this order
+    sensor_filter = [sensor] if isinstance(sensor, str) else sensor
+    colormap_name = colormap
+    interpolation_name = interpolation
+    tile_size = size
+    cache = FrameCache(max_frames=cache_frames, max_bytes=cache_mb << 20)
+    for sensor_id in sensor_filter or []:
+        tile_for(sensor_id)
+    if prometheus_port:
+        metrics.serve_prometheus(prometheus_port)
+
+    # The RPCs and decoding run on their own thread and event loop, Tk keeps
+    # the main thread and only draws what is ready, so a slow Select never
+    # makes the window stutter
+    client = AsyncDBClient(server_address, server_port, max_in_flight=max_in_flight, timeout=timeout,
+                           metrics=metrics, channels=channel_factory)
+    loop = asyncio.new_event_loop()
+    fetch = loop.create_task(view(client, mode, stats_interval, prometheus_file))
+    network = threading.Thread(target=run_network, args=(loop, fetch), name='network', daemon=True)
+    network.start()
+
+    root.after(0, draw_tiles)
+    root.mainloop()
+
+    loop.call_soon_threadsafe(fetch.cancel)
+    network.join()
+    loop.close()
+    for tile in tiles.values():
+        tile.stop()
+
+    e = network_error
+    if isinstance(e, grpc.RpcError):
         print(f'Error communicating with gRPC server: {e}')
         print(f'Code: {e.code()}')
         print(f'Details: {e.details()}')
         print(f'Trailers: {e.trailing_metadata()}')
+    elif e is not None:
+        raise e
+
+def run_network(loop, fetch):
+    global network_error
+    asyncio.set_event_loop(loop)
+    try:
+        loop.run_until_complete(fetch)
+    except asyncio.CancelledError:
+        pass
+    except Exception as e:
+        network_error = e
+    finally:
+        # like asyncio.run, cancel the calls still in flight
+        pending = asyncio.all_tasks(loop)
+        for task in pending:
+            task.cancel()
+        loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+
+# Fetches frames until cancelled, with a summary line every stats_interval
+async def view(client, mode, stats_interval=10.0, prometheus_file=None):
+    async with client:
+        stats = asyncio.create_task(report(metrics, stats_interval, prometheus_file, extra=cache_counts))
+        try:
+            await fetch_frames(client, mode)
+        finally:
+            stats.cancel()
+
+async def fetch_frames(client, mode):
+    if mode == 'subscribe':
+        try:
+            await subscribe(client)
+            return
+        except grpc.RpcError as e:
+            # older servers only have the unary calls
+            if e.code() != grpc.StatusCode.UNIMPLEMENTED:
+                raise
+            print('Server does not support Subscribe, falling back to polling')
+
+    await poll(client)
 
-def update_img(frame):
-    thermal_data = np.array(frame).reshape((24, 32))
+# Lets the server push every new row as it is inserted, resubscribing if the
+# stream breaks from the last frame shown of the camera that is furthest
+# behind. show_frames drops the rows the other cameras already showed.
+async def subscribe(client):
+    attempt = 0
+    while True:
+        since_identifier = min(last_identifiers.values(), default=0.0)
+        try:
+            async for response in client.subscribe('imagekeyspace', 'imagedata', since_identifier=since_identifier):
+                attempt = 0
+                show_frames(response.protobufs)
+        except grpc.RpcError as e:
+            if e.code() not in RETRY_CODES or attempt >= client.retries:
+                raise
+            await asyncio.sleep(client.retry_delay(attempt))
+            attempt += 1
 
-    # Normalize the data to be in the range [0, 255] for displaying
-    normalized_data = ((thermal_data - np.min(thermal_data)) / (np.max(thermal_data) - np.min(thermal_data)) * 255).astype('uint8')
+# Selects the latest frame every .2s. A slow answer doesn't hold up the next
+# Select, up to max_in_flight of them are pipelined
+async def poll(client):
+    loop = asyncio.get_running_loop()
+    in_flight = set()
+    while True:
+        next_poll = loop.time() + .2
+        if len(in_flight) < client.max_in_flight:
+            select = client.select('imagekeyspace', 'imagedata', column='identifier', constraint='MAX')
+            in_flight.add(asyncio.ensure_future(select))
 
-    # Create a Pillow Image from the NumPy array
-    thermal_image = Image.fromarray(normalized_data, mode='L')  # 'L' mode is for grayscale
-    thermal_image = thermal_image.resize((600, 400))
+        # show answers as they arrive until it is time for the next Select
+        remaining = next_poll - loop.time()
+        while remaining > 0:
+            if not in_flight:
+                await asyncio.sleep(remaining)
+                break
+            done, in_flight = await asyncio.wait(in_flight, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                show_frames(task.result().protobufs)
+            remaining = next_poll - loop.time()
 
+def cache_counts():
+    return (f'Frames cached: {len(cache)} ({cache.nbytes / 1e6:.1f} MB), hits: {cache.hits}, '
+            f'misses: {cache.misses}, evicted: {cache.evictions}')
 
-    photo = ImageTk.PhotoImage(thermal_image)
+# The tile of sensor_id, its render thread is started unless it only gets
+# frames through update_img
+def tile_for(sensor_id, start=True):
+    tile = tiles.get(sensor_id)
+    if tile is None:
+        tile = Tile(sensor_id)
+        if start:
+            tile.start()
+        tiles[sensor_id] = tile
+    return tile
 
-    # Update the image displayed in the Tkinter Label
-    label.configure(image=photo)
-    label.image = photo  # Keep a reference to prevent garbage collection
+# Decodes the serialized ImageData rows in order into their tiles, on the network thread
+def show_frames(protobufs):
+    # go through protobufs in the response
+    for serial_msg in protobufs:
+        start = time.perf_counter()
+        # MAX polling keeps returning the same row and a resubscribe resends
+        # some, rows shown before are skipped without parsing them
+        identifier = peek_identifier(serial_msg)
+        if identifier is not None and cache.get(identifier) is not None:
+            continue
+
+        image_data = image_pb2.ImageData() # conver to our proto class
+        image_data.ParseFromString(serial_msg) # can use these fields from proto image_data.data or image_data.identifier
+
+        sensor_id = image_data.sensor_id
+        if sensor_filter is not None and sensor_id not in sensor_filter:
+            continue
+
+        # rows older than the newest frame of their camera have missed their turn
+        if image_data.identifier <= last_identifiers.get(sensor_id, 0.0):
+            continue
+        last_identifiers[sensor_id] = image_data.identifier
+
+        # the window may close while an RPC is still in flight
+        if not window_open:
+            return
+
+        # binary pixels, a keyframe/delta stream or the legacy comma-joined
+        # data string, into a buffer the render thread isn't reading
+        tile = tile_for(sensor_id)
+        frame = decoder.decode(image_data, out=tile.frames.back())
+        if frame is None:
+            # a stats-only heartbeat from an --edge-filter camera, or a delta
+            # whose previous frame never reached us, wait for the next keyframe
+            continue
+        tile.frames.publish(image_data.identifier)
+        metrics.since('decode', start)
+
+# Grids the tiles in a square, new cameras are added as they show up
+def layout():
+    columns = math.ceil(math.sqrt(len(tiles)))
+    for index, tile in enumerate(list(tiles.values())):
+        if tile.label is None:
+            tile.label = tk.Label(root)
+        tile.label.grid(row=index // columns, column=index % columns)
+
+# Pastes the newest rendered frame of every tile, Tk calls it again every DRAW_INTERVAL_MS
+def draw_tiles(reschedule=True):
+    if not window_open:
+        return
+    if network_error is not None:
+        on_close()
+        return
+
+    if any(tile.label is None for tile in list(tiles.values())):
+        layout()
+    if scrub_identifier is None:
+        for tile in list(tiles.values()):
+            latest = tile.images.acquire(tile.shown)
+            if latest is None:
+                continue
+            tile.shown, rgba, identifier = latest
+            start = time.perf_counter()
+            tile.draw(rgba)
+            metrics.since('draw', start)
+            if identifier is not None:
+                # the identifier is the capture time on the camera's clock
+                metrics.observe('glass_to_glass', time.time() - identifier)
+            metrics.count('frames')
+
+    if reschedule:
+        root.after(DRAW_INTERVAL_MS, draw_tiles)
+
+# Normalizes, colormaps and upscales the frame into sensor_id's tile and
+# shows it right away, for callers on the Tk thread like replay.py
+def update_img(frame, sensor_id=''):
+    tile = tile_for(sensor_id, start=False)
+    tile.renderer.render(frame, out=tile.images.back())
+    tile.images.publish()
+    draw_tiles(reschedule=False)
+
+# Shows the cached frames before (step -1) or after (step 1) the ones on
+# screen. Stepping past the newest one goes back to live frames.
+def scrub(step):
+    global scrub_identifier
+    current = scrub_identifier
+    if current is None:
+        newest = cache.latest()
+        if newest is None:
+            return
+        current = newest.identifier
+
+    entry = cache.before(current) if step < 0 else cache.after(current)
+    if entry is None:
+        if step > 0:
+            go_live()
+        return
+    scrub_identifier = entry.identifier
+
+    # every tile shows its camera's frame from that moment
+    for tile in list(tiles.values()):
+        cached = cache.latest(scrub_identifier, tile.sensor_id)
+        if cached is not None and tile.label is not None:
+            tile.draw(cached.image)
+
+def go_live():
+    global scrub_identifier
+    scrub_identifier = None
+    # draw the newest frames again even if nothing new arrived
+    for tile in list(tiles.values()):
+        tile.shown = 0
+
+# WIDTHxHEIGHT of each tile
+def parse_size(value):
+    width, height = value.lower().split('x')
+    return int(width), int(height)
 
 if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+
     # Use argparse to handle command-line arguments
     parser = argparse.ArgumentParser(description='Training gRPC Client')
     parser.add_argument('--address', default='localhost', help='Address of the gRPC server')
     parser.add_argument('--port', type=int, default=50051, help='Port number for the gRPC server')
+    parser.add_argument('--mode', choices=['subscribe', 'poll'], default='subscribe',
+                        help='Stream new frames with Subscribe or poll Select for the latest one '
+                             '(polling only shows the keyframes of delta encoded frames)')
+    parser.add_argument('--max-in-flight', type=int, default=4, help='Most Select calls in flight at once')
+    parser.add_argument('--timeout', type=float, default=10.0, help='Deadline in seconds for each Select')
+    parser.add_argument('--sensor', action='append',
+                        help='Only show frames from this sensor id, repeat to tile several cameras '
+                             '(default: a tile for every camera)')
+    parser.add_argument('--tile-size', type=parse_size, default=(600, 400), metavar='WIDTHxHEIGHT',
+                        help='Size of each camera tile in pixels')
+    parser.add_argument('--colormap', choices=list(COLORMAPS), default='gray', help='Colors for the temperatures')
+    parser.add_argument('--interpolation', choices=INTERPOLATIONS, default='nearest',
+                        help='How frames are upscaled to the tile, keeping their aspect ratio')
+    parser.add_argument('--stats-interval', type=float, default=10.0, help='Seconds between stage timing summary lines')
+    parser.add_argument('--prometheus-file', metavar='PATH',
+                        help='Rewrite this file with the stage timings in Prometheus text format every summary')
+    parser.add_argument('--prometheus-port', type=int, help='Serve the stage timings for Prometheus on this port')
+    parser.add_argument('--cache-frames', type=int, default=256,
+                        help='Most decoded frames kept to skip repeated rows and scrub back with the arrow keys')
+    parser.add_argument('--cache-mb', type=int, default=64, help='Most memory in MiB the kept frames can take')
+    channels.add_arguments(parser)
 
     args = parser.parse_args()
 
     # Runs the program with the provided arguments
-    run(server_address=args.address, server_port=args.port)
\ No newline at end of file
+    run(server_address=args.address, server_port=args.port, mode=args.mode, max_in_flight=args.max_in_flight,
+        timeout=args.timeout, sensor=args.sensor, colormap=args.colormap, stats_interval=args.stats_interval,
+        prometheus_file=args.prometheus_file, prometheus_port=args.prometheus_port, cache_frames=args.cache_frames,
+        cache_mb=args.cache_mb, size=args.tile_size, channel_factory=channels.from_arguments(args),
+        interpolation=args.interpolation)
\ No newline at end of file
@@ -0,0 +1,171 @@
+import time
+import signal
+import asyncio
+import logging
+
+from common import image_pb2
+import frame_codec
+from batch_sender import BatchSender
+from capture_pipeline import CaptureWorker, frame_period
+from sources import MLXSource, SyntheticSource, parse_sensor_spec
+from delta_codec import DeltaEncoder
+import edge_filter as edge
+from recording import RecordingWriter
+from spool import Spool, SpoolSender
+from metrics import Metrics, report
+from rate_control import RateController
+
+
+# Returns pack(image_message, sensor_id, frame) for an --encoding choice
+def frame_packer(encoding='float32', keyframe_interval=30, compression='zlib'):
+    if encoding != 'delta':
+        return lambda image_message, sensor_id, frame: frame_codec.encode_frame(
+            image_message, frame, encoding=frame_codec.ENCODINGS[encoding])
+
+    # every sensor is its own keyframe/delta stream
+    encoders = {}
+
+    def pack(image_message, sensor_id, frame):
+        if sensor_id not in encoders:
+            encoders[sensor_id] = DeltaEncoder(keyframe_interval, compression=compression)
+        encoders[sensor_id].encode(image_message, frame)
+
+    return pack
+
+
+# One source per --sensor spec plus any synthetic ones. With neither, a single
+# mlx90640 on the default I2C pins like before.
+def open_sources(sensors=None, synthetic=0, synthetic_mode='scene', refresh_rate='4'):
+    sources = [MLXSource(**parse_sensor_spec(spec, refresh_rate)) for spec in sensors or []]
+    sources += [SyntheticSource(f'synthetic{i}', refresh_rate=refresh_rate, mode=synthetic_mode)
+                for i in range(synthetic)]
+    if not sources:
+        sources.append(MLXSource('mlx0', refresh_rate=refresh_rate))
+    return sources
+
+
+# Captures from every source until SIGINT/SIGTERM and sends the frames with
+# client, through a BatchSender or, with spool, a SpoolSender. With
+# edge_filter, a function returning a new edge_filter.EdgeFilter, every camera
+# only sends full frames on events and heartbeats in between. With
+# rate_control, a dict of rate_control.RateController settings, the refresh
+# rates and batches follow what the cameras and the server keep up with.
+async def upload(client, sources, pack=None, batch_size=8, batch_interval=1.0, queue_size=256,
+                 overflow='drop-oldest', senders=1, record=None, stats_interval=10.0, spool=None, spool_size=64,
+                 metrics=None, prometheus_file=None, edge_filter=None, rate_control=None):
+    pack = pack or frame_packer()
+    # getFrame and serialize timings, Insert is timed by the client when it shares these
+    metrics = metrics or client.metrics or Metrics()
+
+    # keep a local copy of everything sent for replay.py
+    recorder = RecordingWriter(record) if record else None
+
+    # edge_filter.EdgeFilter of each camera by sensor_id
+    filters = {}
+
+    # Turns a captured (identifier, sensor_id, frame) into (identifier, serialized ImageData).
+    # Edge filtered items also carry the frame's statistics, their frame is None for heartbeats.
+    def serialize(item):
+        start = time.perf_counter()
+        identifier, sensor_id, frame = item[:3]
+
+        # Create an instance of the ImageData message
+        image_message = image_pb2.ImageData()
+        image_message.identifier = identifier
+        image_message.sensor_id = sensor_id
+
+        if len(item) > 3:
+            stats = image_message.stats
+            stats.min, stats.max, stats.mean, stats.hot_pixels = item[3]
+        if frame is None:
+            image_message.encoding = image_pb2.STATS_ONLY
+        else:
+            # pack the temperatures into the pixels field ('text' keeps the old comma-joined string)
+            pack(image_message, sensor_id, frame)
+
+        # Serialize the ImageData message to bytes
+        serialized_image = image_message.SerializeToString()
+        metrics.since('serialize', start)
+        if sensor_id in filters:
+            if frame is None:
+                filters[sensor_id].heartbeat_bytes += len(serialized_image)
+            else:
+                filters[sensor_id].frame_bytes += len(serialized_image)
+        if recorder is not None:
+            recorder.write(serialized_image)
+        return identifier, serialized_image
+
+    # Runs on the sender workers so capture only has to copy the frame, the
+    # sender wraps the serialized ImageData in its Insert request
+    def encode(item):
+        return serialize(item)[1]
+
+    # Connect to the gRPC server, every sensor shares the channel and the sender
+    async with client:
+        if spool:
+            # Frames are kept on disk until their Insert succeeds, so they survive
+            # server outages and restarts of this client
+            sender = SpoolSender(client, Spool(spool, size=spool_size << 20), keyspace="imageKeyspace",
+                                 batch_size=batch_size, batch_interval=batch_interval, serialize=serialize)
+        else:
+            # Frames wait in a bounded ring and are sent together as one multi-protobuf Insert
+            sender = BatchSender(client, keyspace="imageKeyspace", batch_size=batch_size,
+                                 batch_interval=batch_interval, max_queue=queue_size, overflow=overflow,
+                                 workers=senders, encode=encode)
+
+        # Hands frames to the sender, or to the camera's edge filter first
+        def capture_submit(source):
+            if edge_filter is None:
+                return sender.submit
+            filters[source.sensor_id] = edge_filter()
+            return filters[source.sensor_id].filtered(sender.submit)
+
+        # This aquires thermal images from each sensor on its own thread
+        captures = [CaptureWorker(source.read_frame, capture_submit(source), period=frame_period(source.refresh_rate),
+                                  sensor_id=source.sensor_id, metrics=metrics)
+                    for source in sources]
+        for capture in captures:
+            capture.start()
+
+        tasks = []
+        if rate_control is not None:
+            # its rates and batch sizes show up in the summary as gauges
+            controller = RateController(sources, captures, sender, metrics, **rate_control)
+            tasks.append(asyncio.create_task(controller.run()))
+
+        # Ctrl-C stops capturing and lets the senders flush what is still queued
+        def shutdown():
+            for capture in captures:
+                capture.stop(wait=False)
+            sender.stop()
+
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, shutdown)
+
+        def counts():
+            captured = ', '.join(f'{capture.sensor_id}: {capture.captured}' for capture in captures)
+            read_errors = sum(capture.read_errors for capture in captures)
+            line = (f'Frames captured: {captured}, sent: {sender.frames_sent}, '
+                    f'dropped: {sender.dropped}, read errors: {read_errors}')
+            return f'{line} | {edge.summary(filters.values())}' if filters else line
+
+        # one summary line every stats_interval instead of a log line per frame
+        tasks.append(asyncio.create_task(report(metrics, stats_interval, prometheus_file, extra=counts)))
+        try:
+            await sender.run()
+        finally:
+            for task in tasks:
+                task.cancel()
+            shutdown()
+            if filters:
+                logging.info(edge.summary(filters.values()))
+            if spool:
+                # no capture thread may still be appending when the map is closed
+                for capture in captures:
+                    capture.stop()
+                sender.spool.release()
+            if recorder is not None:
+                recorder.close()
+            for sig in (signal.SIGINT, signal.SIGTERM):
+                loop.remove_signal_handler(sig)
@@ -0,0 +1,118 @@
+import numpy as np
+
+
+def _triangle(x):
+    return np.maximum(0.0, 1.0 - np.abs(x))
+
+
+# Keys' cubic convolution with a = -0.5, like PIL's BICUBIC
+def _cubic(x, a=-0.5):
+    x = np.abs(x)
+    near = ((a + 2) * x - (a + 3)) * x * x + 1
+    far = ((x - 5) * x + 8) * x * a - 4 * a
+    return np.where(x <= 1, near, np.where(x < 2, far, 0.0))
+
+
+def _lanczos3(x):
+    return np.where(np.abs(x) < 3, np.sinc(x) * np.sinc(x / 3), 0.0)
+
+
+# Interpolation kernels by name: (function, support in input pixels)
+KERNELS = {
+    'bilinear': (_triangle, 1),
+    'bicubic': (_cubic, 2),
+    'lanczos': (_lanczos3, 3),
+}
+
+
+# The (n_out, n_in) matrix that resamples n_in samples to n_out with kernel.
+# Samples sit at pixel centers like in PIL, so the output covers exactly the
+# input's extent, and the kernel is widened when shrinking so every input
+# pixel counts. With align_corners the first and last output samples sit on
+# the first and last input samples instead, like ndimage.zoom. Taps past the
+# edges are left out and the others reweighted to sum to 1, like PIL does.
+def interpolation_matrix(n_in, n_out, kernel='bilinear', align_corners=False):
+    function, support = KERNELS[kernel]
+    if align_corners:
+        centers = np.arange(n_out) * (n_in - 1) / max(n_out - 1, 1)
+        stretch = 1.0
+    else:
+        centers = (np.arange(n_out) + 0.5) * n_in / n_out - 0.5
+        stretch = max(1.0, n_in / n_out)
+
+    matrix = function((np.arange(n_in)[None, :] - centers[:, None]) / stretch)
+    matrix /= matrix.sum(axis=1, keepdims=True)
+    return matrix.astype(np.float32)
+
+
+# Bilinear interpolation matrix taking n_in samples to n_out, sampled like
+# ndimage.zoom: the first and last output samples sit on the first and last input
+def bilinear_matrix(n_in, n_out):
+    return interpolation_matrix(n_in, n_out, 'bilinear', align_corners=True)
+
+
+# The largest (height, width) with the aspect ratio of shape that fits in a
+# (width, height) size, the mlx90640's 4:3 in a 600x400 window is 533x400
+def fit(shape, size):
+    height, width = shape
+    out_width, out_height = size
+    scale = min(out_width / width, out_height / height)
+    return max(1, round(height * scale)), max(1, round(width * scale))
+
+
+# Resizes frames to out_shape with two matrix multiplies, columns then rows.
+# The interpolation matrices are worked out once for the sensor and output
+# shape, where ndimage.zoom and PIL work their weights out again for every
+# frame. Takes a single (height, width) frame or a (N, height, width) batch.
+#
+#   upscaler = Upscaler((24, 32), fit((24, 32), (600, 400)), kernel='bicubic')
+#   image = upscaler.apply(frame)
+class Upscaler:
+    def __init__(self, shape, out_shape, kernel='bilinear', align_corners=False):
+        height, width = shape
+        out_height, out_width = out_shape
+        self.shape = tuple(shape)
+        self.out_shape = tuple(out_shape)
+        self.kernel = kernel
+        self.rows = interpolation_matrix(height, out_height, kernel, align_corners)
+        self.cols_t = np.ascontiguousarray(interpolation_matrix(width, out_width, kernel, align_corners).T)
+        # columns first, the larger second multiply then only sums over the 24 rows
+        self._partial = np.empty((height, out_width), dtype=np.float32)
+
+    def apply(self, frames, out=None):
+        batch = np.shape(frames)[:-2]
+        if out is None:
+            out = np.empty(batch + self.out_shape, dtype=np.float32)
+        if self._partial.shape[:-2] != batch:
+            self._partial = np.empty(batch + self._partial.shape[-2:], dtype=np.float32)
+        np.matmul(frames, self.cols_t, out=self._partial)
+        return np.matmul(self.rows, self._partial, out=out)
+
+
+# Upscales frames by an integer factor, sampled like ndimage.zoom(frames, factor, order=1)
+class BilinearUpscaler(Upscaler):
+    def __init__(self, shape, factor):
+        height, width = shape
+        super().__init__(shape, (height * factor, width * factor), 'bilinear', align_corners=True)
+
+
+# Nearest neighbour upscaling to any out_shape. Works on anything frame shaped,
+# temperatures or colormapped RGBA viewed as uint32.
+class NearestUpscaler:
+    def __init__(self, shape, out_shape):
+        height, width = shape
+        out_height, out_width = out_shape
+        self.out_shape = tuple(out_shape)
+
+        # which frame pixel each output pixel shows, sampled at pixel centers
+        rows = ((np.arange(out_height) + 0.5) * height / out_height).astype(np.intp)
+        cols = ((np.arange(out_width) + 0.5) * width / out_width).astype(np.intp)
+        self._index = (rows[:, None] * width + cols[None, :]).ravel()
+
+    def apply(self, frames, out=None):
+        batch = frames.shape[:-2]
+        flat = frames.reshape(batch + (-1,))
+        if out is None:
+            out = np.empty(batch + self.out_shape, dtype=frames.dtype)
+        np.take(flat, self._index, axis=-1, out=out.reshape(batch + (-1,)), mode='clip')
+        return out